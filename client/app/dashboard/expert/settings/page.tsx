@@ -87,11 +87,14 @@ export default function ExpertSettings() {
     try {
       setChangingPassword(true)
 
-      await axios.post("/api/experts/change-password", {
+      const response = await axios.post("/api/experts/change-password", {
         current_password: currentPassword,
         new_password: newPassword,
       })
 
+      // The change revokes every earlier token, this one included
+      localStorage.setItem("token", response.data.access_token)
+
       toast({
         title: "Success",
         description: "Your password has been changed successfully",
@@ -2,7 +2,7 @@
 
 import type React from "react"
 
-import { useState, useEffect, useCallback } from "react"
+import { useState, useEffect, useCallback, useMemo } from "react"
 import { useRouter } from "next/navigation"
 import axios from "@/lib/axios"
 import { useToast } from "@/hooks/use-toast"
@@ -32,10 +32,29 @@ type Expert = {
   completed_sessions: number
 }
 
+type ExpertFacets = {
+  total: number
+  languages: Record<string, number>
+  specialties: Record<string, number>
+}
+
+// Ensure all experts have the required fields
+const processExpert = (expert: any): Expert => ({
+  ...expert,
+  specialty: expert.specialty || "General Tutoring",
+  tags: expert.tags || [],
+  bio: expert.bio || `Experienced tutor specializing in ${expert.specialty || 'various subjects'}.`,
+  languages: expert.languages || ["English"],
+  experience_years: expert.experience_years || 0,
+  completed_sessions: expert.completed_sessions || 0,
+})
+
 export default function FindTutors() {
   const [experts, setExperts] = useState<Expert[]>([])
   const [filteredExperts, setFilteredExperts] = useState<Expert[]>([])
   const [loading, setLoading] = useState(true)
+  const [loadingMore, setLoadingMore] = useState(false)
+  const [nextCursor, setNextCursor] = useState<string | null>(null)
   const [searchTerm, setSearchTerm] = useState("")
   const [nameSearch, setNameSearch] = useState("")
   const [priceRange, setPriceRange] = useState([0, 100])
@@ -63,39 +82,34 @@ export default function FindTutors() {
     debouncedSearch(value)
   }
 
+  // Filters shared by the search, its next pages and the facet counts
+  const searchParams = useMemo(
+    () => ({
+      specialty: selectedSpecialty && selectedSpecialty !== "any" ? selectedSpecialty : undefined,
+      min_rate: priceRange[0] > 0 ? priceRange[0] : undefined,
+      max_rate: priceRange[1] < 100 ? priceRange[1] : undefined,
+      min_rating: minRating > 0 ? minRating : undefined,
+      language: selectedLanguage && selectedLanguage !== "any" ? selectedLanguage : undefined,
+    }),
+    [selectedSpecialty, priceRange, minRating, selectedLanguage],
+  )
+
   useEffect(() => {
     const fetchExperts = async () => {
       try {
         setLoading(true)
-        const response = await axios.get("/api/students/experts", {
-          params: {
-            specialty: selectedSpecialty || undefined,
-            min_rate: priceRange[0] > 0 ? priceRange[0] : undefined,
-            max_rate: priceRange[1] < 100 ? priceRange[1] : undefined,
-            min_rating: minRating > 0 ? minRating : undefined,
-            language: selectedLanguage || undefined,
-          },
-        })
-        
-        // Ensure all experts have the required fields
-        const processedExperts = response.data.map((expert: any) => ({
-          ...expert,
-          specialty: expert.specialty || "General Tutoring",
-          tags: expert.tags || [],
-          bio: expert.bio || `Experienced tutor specializing in ${expert.specialty || 'various subjects'}.`,
-          languages: expert.languages || ["English"],
-          experience_years: expert.experience_years || 0,
-          completed_sessions: expert.completed_sessions || 0,
-        }))
-        
-        setExperts(processedExperts)
-
-        // Extract unique languages and specialties
-        const languages = Array.from(new Set(processedExperts.flatMap((expert: Expert) => expert.languages || [])))
-        const specialties = Array.from(new Set(processedExperts.map((expert: Expert) => expert.specialty)))
-
-        setAvailableLanguages(languages as string[])
-        setAvailableSpecialties(specialties as string[])
+        const [response, facetsResponse] = await Promise.all([
+          axios.get("/api/students/experts", { params: searchParams }),
+          axios.get<ExpertFacets>("/api/students/experts/facets", { params: searchParams }),
+        ])
+
+        // Results come a page at a time; the cursor fetches the next one
+        setExperts(response.data.map(processExpert))
+        setNextCursor(response.headers["x-next-cursor"] || null)
+
+        // Each facet ignores its own filter, so the dropdowns keep every choice
+        setAvailableLanguages(Object.keys(facetsResponse.data.languages))
+        setAvailableSpecialties(Object.keys(facetsResponse.data.specialties))
 
         // Fetch bookmarked experts
         const bookmarksResponse = await axios.get("/api/students/bookmarks")
@@ -109,6 +123,7 @@ export default function FindTutors() {
         })
         // Set empty arrays to prevent further errors
         setExperts([])
+        setNextCursor(null)
         setAvailableLanguages([])
         setAvailableSpecialties([])
       } finally {
@@ -117,7 +132,28 @@ export default function FindTutors() {
     }
 
     fetchExperts()
-  }, [toast, selectedSpecialty, priceRange, minRating, selectedLanguage])
+  }, [toast, searchParams])
+
+  const loadMore = async () => {
+    if (!nextCursor) return
+    try {
+      setLoadingMore(true)
+      const response = await axios.get("/api/students/experts", {
+        params: { ...searchParams, cursor: nextCursor },
+      })
+      setExperts((current) => [...current, ...response.data.map(processExpert)])
+      setNextCursor(response.headers["x-next-cursor"] || null)
+    } catch (error) {
+      console.error("Error fetching more experts:", error)
+      toast({
+        title: "Error",
+        description: "Failed to load more tutors",
+        variant: "destructive",
+      })
+    } finally {
+      setLoadingMore(false)
+    }
+  }
 
   // Filter experts based on name search
   useEffect(() => {
@@ -418,6 +454,19 @@ export default function FindTutors() {
             ))}
           </div>
         )}
+
+        {!loading && nextCursor && (
+          <div className="mt-8 flex justify-center">
+            <Button
+              variant="outline"
+              className="border-[#ffc6a8] text-deep-cocoa hover:bg-[#fff2e7] hover:cursor-pointer"
+              onClick={loadMore}
+              disabled={loadingMore}
+            >
+              {loadingMore ? "Loading..." : "Load more tutors"}
+            </Button>
+          </div>
+        )}
       </div>
     </div>
   )
@@ -211,11 +211,14 @@ export default function SettingsPage() {
     try {
       setLoading(true)
 
-      await axios.put("/api/students/change-password", {
+      const response = await axios.put("/api/students/change-password", {
         current_password: passwordData.current_password,
         new_password: passwordData.new_password,
       })
 
+      // The change revokes every earlier token, this one included
+      localStorage.setItem("token", response.data.access_token)
+
       setPasswordData({
         current_password: "",
         new_password: "",
@@ -28,6 +28,8 @@ export default function ExpertsTab() {
   const { toast } = useToast()
   const [loading, setLoading] = useState(true)
   const [experts, setExperts] = useState<Expert[]>([])
+  const [nextCursor, setNextCursor] = useState<string | null>(null)
+  const [loadingMore, setLoadingMore] = useState(false)
   const [favoriteExperts, setFavoriteExperts] = useState<Expert[]>([])
 
   useEffect(() => {
@@ -38,13 +40,11 @@ export default function ExpertsTab() {
     try {
       setLoading(true)
       
-      // Fetch experts the student has had sessions with
-      const response = await axios.get("/api/students/experts")
+      // Fetch experts the student has had sessions with, highest rated first
+      const response = await axios.get("/api/students/experts", { params: { sort: "rating" } })
       
-      // Sort by rating (highest first)
-      const sortedExperts = response.data.sort((a: Expert, b: Expert) => b.rating - a.rating)
-      
-      setExperts(sortedExperts)
+      setExperts(response.data)
+      setNextCursor(response.headers["x-next-cursor"] || null)
       
       // Fetch bookmarked/favorite experts
       try {
@@ -67,6 +67,27 @@ export default function ExpertsTab() {
     }
   }
 
+  const loadMore = async () => {
+    if (!nextCursor) return
+    try {
+      setLoadingMore(true)
+      const response = await axios.get("/api/students/experts", {
+        params: { sort: "rating", cursor: nextCursor },
+      })
+      setExperts((current) => [...current, ...response.data])
+      setNextCursor(response.headers["x-next-cursor"] || null)
+    } catch (error) {
+      console.error("Error fetching more experts:", error)
+      toast({
+        title: "Error",
+        description: "Failed to load more experts",
+        variant: "destructive",
+      })
+    } finally {
+      setLoadingMore(false)
+    }
+  }
+
   const handleFindExperts = () => {
     router.push("/dashboard/student/find-tutors")
   }
@@ -229,6 +250,18 @@ export default function ExpertsTab() {
         {experts.length > 0 ? (
           <div className="space-y-4">
             {experts.map(renderExpertCard)}
+            {nextCursor && (
+              <div className="flex justify-center">
+                <Button
+                  variant="outline"
+                  className="border-[#ffc6a8] text-deep-cocoa hover:bg-[#fff2e7]"
+                  onClick={loadMore}
+                  disabled={loadingMore}
+                >
+                  {loadingMore ? "Loading..." : "Load more"}
+                </Button>
+              </div>
+            )}
           </div>
         ) : (
           renderEmptyState()
@@ -0,0 +1,157 @@
+"""
+Cold-data archive for messages and sessions.
+
+Old messages and finished sessions are moved into `messages_archive` and
+`sessions_archive` so the hot collections only hold recent data. Read paths
+use the helpers below to fall through to the archive when a caller pages past
+what the hot collection holds.
+
+Usage (from the server directory):
+    python -m app.db.archive [--batch-size 500]
+"""
+import os
+import argparse
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+from pymongo import ReplaceOne
+
+from .mongo import db
+
+logger = logging.getLogger(__name__)
+
+# Archive configuration
+MESSAGE_ARCHIVE_AFTER_DAYS = int(os.getenv("MESSAGE_ARCHIVE_AFTER_DAYS", 365))
+SESSION_ARCHIVE_AFTER_DAYS = int(os.getenv("SESSION_ARCHIVE_AFTER_DAYS", 180))
+ARCHIVED_SESSION_STATUSES = ["completed", "cancelled"]
+DEFAULT_BATCH_SIZE = 500
+# Largest page of conversation messages
+MESSAGE_PAGE_MAX_LIMIT = int(os.getenv("MESSAGE_PAGE_MAX_LIMIT", 200))
+
+messages_archive = db.messages_archive
+sessions_archive = db.sessions_archive
+
+
+def message_cutoff() -> datetime:
+    """Messages sent before this time belong in the archive"""
+    return datetime.now(timezone.utc) - timedelta(days=MESSAGE_ARCHIVE_AFTER_DAYS)
+
+
+def session_cutoff() -> datetime:
+    """Finished sessions dated before this time belong in the archive"""
+    return datetime.now(timezone.utc) - timedelta(days=SESSION_ARCHIVE_AFTER_DAYS)
+
+
+def _move_batches(source, target, query: dict, batch_size: int) -> int:
+    """
+    Move documents matching `query` from `source` to `target`.
+
+    Each batch is upserted into the archive before it is deleted from the hot
+    collection, so an interrupted run leaves at most one batch present in both
+    collections and the next run finishes moving it.
+    """
+    moved = 0
+    while True:
+        batch = list(source.find(query).sort("_id", 1).limit(batch_size))
+        if not batch:
+            break
+
+        target.bulk_write(
+            [ReplaceOne({"_id": doc["_id"]}, doc, upsert=True) for doc in batch],
+            ordered=False
+        )
+        source.delete_many({"_id": {"$in": [doc["_id"] for doc in batch]}})
+
+        moved += len(batch)
+        logger.info(f"Archived {moved} documents from {source.name}")
+
+    return moved
+
+
+def archive_messages(batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """Move messages older than MESSAGE_ARCHIVE_AFTER_DAYS to the archive"""
+    return _move_batches(db.messages, messages_archive, {"timestamp": {"$lt": message_cutoff()}}, batch_size)
+
+
+def archive_sessions(batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """Move completed or cancelled sessions older than SESSION_ARCHIVE_AFTER_DAYS to the archive"""
+    query = {
+        "status": {"$in": ARCHIVED_SESSION_STATUSES},
+        "date": {"$lt": session_cutoff()}
+    }
+    return _move_batches(db.sessions, sessions_archive, query, batch_size)
+
+
+def find_session(query: dict) -> Optional[dict]:
+    """Find a single session, falling back to the archive"""
+    return db.sessions.find_one(query) or sessions_archive.find_one(query)
+
+
+def find_sessions(query: dict, since: Optional[datetime] = None) -> List[dict]:
+    """
+    Find sessions sorted by date (newest first).
+
+    The archive is only queried when `since` reaches back past the session
+    archive cutoff.
+    """
+    sessions = list(db.sessions.find(query).sort("date", -1))
+    if since is not None and since < session_cutoff():
+        sessions.extend(sessions_archive.find(query).sort("date", -1))
+    return sessions
+
+
+def find_messages_page(query: dict, limit: int, before: Optional[datetime] = None) -> List[dict]:
+    """
+    Get the latest `limit` messages sent before `before`, oldest first.
+
+    The archive is only read when the hot collection runs out of messages
+    for the requested page.
+
+    Raises:
+        ValueError: If limit is below 1
+    """
+    if limit < 1:
+        raise ValueError("limit must be >= 1")
+
+    if before is not None:
+        query = {**query, "timestamp": {"$lt": before}}
+
+    messages = list(db.messages.find(query).sort("timestamp", -1).limit(limit))
+    if len(messages) < limit:
+        archive_query = query
+        if messages:
+            archive_query = {**query, "timestamp": {"$lt": messages[-1]["timestamp"]}}
+        messages.extend(
+            messages_archive.find(archive_query).sort("timestamp", -1).limit(limit - len(messages))
+        )
+
+    messages.reverse()
+    return messages
+
+
+def delete_sessions(query: dict) -> int:
+    """Delete matching sessions from the hot collection and the archive"""
+    return db.sessions.delete_many(query).deleted_count + sessions_archive.delete_many(query).deleted_count
+
+
+def delete_messages(query: dict) -> int:
+    """Delete matching messages from the hot collection and the archive"""
+    return db.messages.delete_many(query).deleted_count + messages_archive.delete_many(query).deleted_count
+
+
+def run(batch_size: int = DEFAULT_BATCH_SIZE) -> dict:
+    """Archive old messages and finished sessions"""
+    return {
+        "messages": archive_messages(batch_size),
+        "sessions": archive_sessions(batch_size)
+    }
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    parser = argparse.ArgumentParser(description="Move cold messages and sessions to the archive")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    print(run(batch_size=args.batch_size))
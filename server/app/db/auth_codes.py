@@ -0,0 +1,67 @@
+from datetime import datetime, timezone
+from typing import Optional
+from bson import ObjectId
+
+from .mongo import db
+
+# Code purposes
+VERIFICATION = "verification"
+PASSWORD_RESET = "password_reset"
+
+
+def issue_code(email: str, purpose: str, code: str, expires_at: datetime,
+               role: str, user_id: ObjectId, first_name: str = "") -> None:
+    """
+    Store a verification or password reset code, replacing any previous code
+    with the same purpose for this email.
+
+    Documents are removed by the TTL index on `expires_at` once they expire.
+
+    Args:
+        email (str): User email
+        purpose (str): VERIFICATION or PASSWORD_RESET
+        code (str): The generated code
+        expires_at (datetime): Expiry time of the code
+        role (str): student or expert
+        user_id (ObjectId): `_id` of the user document
+        first_name (str): Used to address resent emails without loading the user
+    """
+    db.auth_codes.update_one(
+        {"email": email, "purpose": purpose},
+        {
+            "$set": {
+                "code": code,
+                "expires_at": expires_at,
+                "role": role,
+                "user_id": user_id,
+                "first_name": first_name,
+                "created_at": datetime.now(timezone.utc)
+            }
+        },
+        upsert=True
+    )
+
+
+def find_code(email: str, purpose: str) -> Optional[dict]:
+    """Get the active code document for an email, if any"""
+    return db.auth_codes.find_one({"email": email, "purpose": purpose})
+
+
+def delete_code(email: str, purpose: str) -> None:
+    """Remove a code once it has been used"""
+    db.auth_codes.delete_one({"email": email, "purpose": purpose})
+
+
+def is_expired(code_doc: dict) -> bool:
+    """
+    Check the expiry of a code document.
+
+    The TTL monitor only runs about once a minute, so expired codes can still
+    be returned by a lookup for a short while.
+    """
+    expires = code_doc.get("expires_at")
+    if not expires:
+        return False
+    if expires.tzinfo is None:
+        expires = expires.replace(tzinfo=timezone.utc)
+    return expires < datetime.now(timezone.utc)
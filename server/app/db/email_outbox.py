@@ -0,0 +1,163 @@
+"""
+Durable outbox for outgoing email.
+
+Request handlers insert fully rendered messages and return; the delivery
+workers in app/utils/mailer.py claim them in batches, send them and record
+the outcome. A claim is a lease: if a worker dies mid-delivery the messages
+become claimable again once `locked_until` has passed. Failed deliveries
+are retried with exponential backoff until EMAIL_MAX_ATTEMPTS is reached.
+
+Delivered and permanently failed messages are removed by the TTL index on
+`expire_at`.
+"""
+import os
+import uuid
+import random
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+from bson import ObjectId
+
+from .mongo import db
+
+# Message states
+PENDING = "pending"
+SENDING = "sending"
+SENT = "sent"
+FAILED = "failed"
+
+# Outbox configuration
+EMAIL_MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", 8))
+EMAIL_RETRY_BASE_SECONDS = float(os.getenv("EMAIL_RETRY_BASE_SECONDS", 30))
+EMAIL_RETRY_MAX_SECONDS = float(os.getenv("EMAIL_RETRY_MAX_SECONDS", 3600))
+EMAIL_LEASE_SECONDS = int(os.getenv("EMAIL_LEASE_SECONDS", 120))
+EMAIL_SENT_RETENTION_DAYS = int(os.getenv("EMAIL_SENT_RETENTION_DAYS", 7))
+EMAIL_FAILED_RETENTION_DAYS = int(os.getenv("EMAIL_FAILED_RETENTION_DAYS", 30))
+
+outbox = db.email_outbox
+
+
+def new_message(to_email: str, subject: str, html: str, template: Optional[str] = None) -> dict:
+    """Build an outbox document ready for delivery"""
+    now = datetime.now(timezone.utc)
+    return {
+        "to": to_email,
+        "subject": subject,
+        "html": html,
+        "template": template,
+        "status": PENDING,
+        "attempts": 0,
+        "next_attempt_at": now,
+        "created_at": now
+    }
+
+
+def enqueue(message: dict) -> ObjectId:
+    """Insert one message; returns once the write is acknowledged"""
+    return outbox.insert_one(message).inserted_id
+
+
+def enqueue_many(messages: List[dict]) -> List[ObjectId]:
+    """Insert many messages in one round trip"""
+    if not messages:
+        return []
+    return outbox.insert_many(messages, ordered=False).inserted_ids
+
+
+def _claimable(now: datetime) -> dict:
+    return {"$or": [
+        {"status": PENDING, "next_attempt_at": {"$lte": now}},
+        # Lease of a crashed worker ran out
+        {"status": SENDING, "locked_until": {"$lte": now}}
+    ]}
+
+
+def claim_batch(worker_id: str, limit: int) -> List[dict]:
+    """
+    Lease up to `limit` messages that are due for delivery
+
+    Takes three round trips whatever the batch size: find the due ids,
+    lease the ones still claimable under a unique claim id, read them back.
+
+    Args:
+        worker_id (str): Identifies the claiming worker in the documents
+        limit (int): Maximum number of messages
+
+    Returns:
+        list: The claimed messages, oldest due first
+    """
+    now = datetime.now(timezone.utc)
+    due = [
+        doc["_id"] for doc in
+        outbox.find(_claimable(now), {"_id": 1}).sort("next_attempt_at", 1).limit(limit)
+    ]
+    if not due:
+        return []
+
+    claim_id = f"{worker_id}:{uuid.uuid4().hex}"
+    outbox.update_many(
+        {"_id": {"$in": due}, **_claimable(now)},
+        {"$set": {
+            "status": SENDING,
+            "locked_by": claim_id,
+            "locked_until": now + timedelta(seconds=EMAIL_LEASE_SECONDS)
+        }}
+    )
+    return list(outbox.find({"_id": {"$in": due}, "locked_by": claim_id}).sort("next_attempt_at", 1))
+
+
+def mark_sent(message_ids: List[ObjectId]) -> None:
+    """Record delivered messages"""
+    if not message_ids:
+        return
+    now = datetime.now(timezone.utc)
+    outbox.update_many(
+        {"_id": {"$in": message_ids}},
+        {
+            "$set": {
+                "status": SENT,
+                "sent_at": now,
+                "expire_at": now + timedelta(days=EMAIL_SENT_RETENTION_DAYS)
+            },
+            "$inc": {"attempts": 1},
+            "$unset": {"locked_by": "", "locked_until": ""}
+        }
+    )
+
+
+def retry_delay(attempts: int) -> float:
+    """Exponential backoff with jitter, in seconds"""
+    delay = min(EMAIL_RETRY_MAX_SECONDS, EMAIL_RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+    return delay * random.uniform(0.8, 1.2)
+
+
+def mark_failed(message: dict, error: str) -> str:
+    """
+    Record a failed delivery and schedule a retry
+
+    Returns:
+        str: PENDING if the message will be retried, FAILED if it gave up
+    """
+    now = datetime.now(timezone.utc)
+    attempts = message.get("attempts", 0) + 1
+    update = {
+        "attempts": attempts,
+        "last_error": error,
+        "last_attempt_at": now
+    }
+    if attempts >= EMAIL_MAX_ATTEMPTS:
+        update["status"] = FAILED
+        update["expire_at"] = now + timedelta(days=EMAIL_FAILED_RETENTION_DAYS)
+    else:
+        update["status"] = PENDING
+        update["next_attempt_at"] = now + timedelta(seconds=retry_delay(attempts))
+
+    outbox.update_one(
+        {"_id": message["_id"]},
+        {"$set": update, "$unset": {"locked_by": "", "locked_until": ""}}
+    )
+    return update["status"]
+
+
+def pending_count() -> int:
+    """Messages waiting for delivery (including retries that are not due yet)"""
+    return outbox.count_documents({"status": {"$in": [PENDING, SENDING]}})
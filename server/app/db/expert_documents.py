@@ -0,0 +1,97 @@
+"""
+Defaults of expert documents, applied when experts are written.
+
+Read paths return stored expert documents as they are, so every expert has
+to carry the fields the response models need. register_expert,
+update_expert_profile and mark_profile_completed fill in missing or empty
+fields with the defaults below; documents written before that are
+backfilled by migrations/normalize_experts.py.
+"""
+from datetime import datetime, timezone
+
+from .mongo import db
+
+DEFAULT_SPECIALTY = "General Tutoring"
+DEFAULT_LANGUAGES = ("English",)
+DEFAULT_EXPERIENCE_YEARS = 1
+DEFAULT_EDUCATION = "Bachelor's Degree"
+
+# Fields of an ExpertSearchResult, safe to project since every expert has them
+SEARCH_RESULT_PROJECTION = {
+    "first_name": 1, "last_name": 1, "profile_image": 1, "specialty": 1,
+    "hourly_rate": 1, "rating": 1, "tags": 1, "bio": 1, "languages": 1,
+    "experience_years": 1, "completed_sessions": 1
+}
+
+# Experts with at least one field that needs a default
+NEEDS_DEFAULTS = {"$or": [
+    {"specialty": {"$in": [None, ""]}},
+    {"tags": None},
+    {"bio": {"$in": [None, ""]}},
+    {"languages": {"$in": [None, []]}},
+    {"experience_years": None},
+    {"completed_sessions": None},
+    {"education": {"$in": [None, ""]}}
+]}
+DEFAULTED_FIELDS = ("specialty", "tags", "bio", "languages", "experience_years", "completed_sessions", "education")
+
+
+def default_bio(specialty: str) -> str:
+    return f"Experienced tutor specializing in {specialty}."
+
+
+def expert_defaults(expert: dict) -> dict:
+    """
+    Get the defaults an expert document lacks
+
+    Args:
+        expert (dict): Expert document (or the DEFAULTED_FIELDS of it)
+
+    Returns:
+        dict: Missing or empty fields and their default value
+    """
+    defaults = {}
+    specialty = expert.get("specialty")
+    if not specialty:
+        specialty = defaults["specialty"] = DEFAULT_SPECIALTY
+    if expert.get("tags") is None:
+        defaults["tags"] = []
+    if not expert.get("bio"):
+        defaults["bio"] = default_bio(specialty)
+    if not expert.get("languages"):
+        defaults["languages"] = list(DEFAULT_LANGUAGES)
+    if expert.get("experience_years") is None:
+        defaults["experience_years"] = DEFAULT_EXPERIENCE_YEARS
+    if expert.get("completed_sessions") is None:
+        defaults["completed_sessions"] = 0
+    if not expert.get("education"):
+        defaults["education"] = DEFAULT_EDUCATION
+    return defaults
+
+
+def defaults_update(expert: dict, defaults: dict) -> tuple:
+    """
+    Filter and update storing `defaults` on an expert
+
+    The filter matches the values the defaults were computed from, so a
+    concurrent write of one of the fields is not overwritten.
+    """
+    match = {"_id": expert["_id"], **{field: expert.get(field) for field in defaults}}
+    return match, {"$set": {**defaults, "updated_at": datetime.now(timezone.utc)}}
+
+
+def fill_expert_defaults(expert: dict) -> dict:
+    """
+    Store the defaults a freshly written expert document lacks
+
+    Args:
+        expert (dict): Expert document as stored
+
+    Returns:
+        dict: The document with the defaults applied
+    """
+    defaults = expert_defaults(expert)
+    if defaults:
+        db.experts.update_one(*defaults_update(expert, defaults))
+        expert.update(defaults)
+    return expert
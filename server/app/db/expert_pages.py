@@ -0,0 +1,61 @@
+"""
+Sort orders and keyset cursors for expert search.
+
+Pages are ordered by a sort key with `_id` as tie-breaker and continue from
+an opaque cursor holding the key of the last expert on the previous page.
+Experts added or updated between two requests never make later pages
+repeat or skip entries (an expert whose rating changes simply moves to its
+new position). Pages are cut by the search index in expert_search.py.
+
+Cursors are base64url encoded JSON: {"s": sort, "v": last value, "id": last _id}.
+"""
+import os
+import json
+import base64
+import binascii
+from typing import Any, Tuple
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ASCENDING, DESCENDING
+
+# Page sizes
+EXPERT_SEARCH_DEFAULT_LIMIT = int(os.getenv("EXPERT_SEARCH_DEFAULT_LIMIT", 20))
+EXPERT_SEARCH_MAX_LIMIT = int(os.getenv("EXPERT_SEARCH_MAX_LIMIT", 100))
+
+RELEVANCE = "relevance"
+
+# Sort name -> (field, direction)
+SORT_ORDERS = {
+    "rating": ("rating", DESCENDING),
+    "hourly_rate": ("hourly_rate", ASCENDING),
+    "completed_sessions": ("completed_sessions", DESCENDING),
+}
+SORT_NAMES = (*SORT_ORDERS, RELEVANCE)
+
+
+class InvalidCursor(ValueError):
+    """The cursor was not issued for this sort order"""
+
+
+def encode_cursor(sort: str, value: Any, expert_id: ObjectId) -> str:
+    payload = json.dumps({"s": sort, "v": value, "id": str(expert_id)}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str) -> Tuple[Any, ObjectId]:
+    """
+    Read the position stored in a cursor
+
+    Raises:
+        InvalidCursor: If the cursor is malformed or belongs to another sort
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if payload["s"] != sort:
+            raise InvalidCursor("Cursor belongs to a different sort order")
+        return payload["v"], ObjectId(payload["id"])
+    except (ValueError, KeyError, TypeError, InvalidId, binascii.Error) as e:
+        if isinstance(e, InvalidCursor):
+            raise
+        raise InvalidCursor("Malformed cursor") from e
@@ -0,0 +1,979 @@
+"""
+In-process search index over the expert catalog.
+
+Each worker keeps every searchable (approved and verified) expert in
+memory and answers find-tutors searches from it. MongoDB is only asked for
+the documents of the page being returned.
+
+Text search (`q`) and the specialty filter use an inverted index of the
+specialty, tags and bio:
+
+  - terms are lowercased words; the last characters of a term may be left
+    out ("math" finds "mathematics"), prefix matches score lower than exact
+    ones
+  - every query term has to match (AND), matches are ranked by tf-idf with
+    specialty weighted above tags and tags above bio
+  - postings are arrays of document numbers and tf-idf weights, turned into
+    dicts with dict(zip()) at query time so only the intersection of the
+    terms is scored in Python
+
+Fuzzy text search (`fuzzy=True`) tolerates typos ("pyhton", "calculas").
+It looks query terms up in a trigram index over the terms of specialty,
+tags and names: every term is split into the three-letter pieces of
+"  term " and terms sharing enough pieces with a query term (Jaccard
+similarity of the trigram sets, at least EXPERT_FUZZY_MIN_SIMILARITY)
+match it. The vocabulary is small next to the catalog, so matching terms
+costs microseconds; documents are then scored from the postings of the
+matched terms weighted by their similarity, and ranked like exact matches.
+
+Filters, sort orders and facet counts use bitmaps, Python ints with bit n
+set for document n, so set operations run in C:
+
+  - every tag, language and specialty term has a bitmap; filters are ANDs
+    and ORs of them
+  - hourly_rate, rating and completed_sessions are kept as arrays sorted by
+    (value, _id) with a prefix bitmap every SORTED_BLOCK positions. A range
+    filter is two binary searches, one bitmap XOR and at most
+    2 * SORTED_BLOCK bit sets. A refresh inserts and removes the changed
+    experts at their binary-searched positions and patches the prefix
+    bitmaps past them instead of sorting again
+  - a page walks the sorted array from the cursor and keeps matching
+    experts or, when few experts match, picks the page from the matches
+    with a heap
+  - autocomplete suggestions are every tag and specialty (and each word
+    start inside them) in one sorted array, weighted by the number of live
+    experts carrying the value; the array is rebuilt on the first lookup
+    after the index changed
+  - facet counts are popcounts of the matches ANDed with each value
+    bitmap; rate buckets are ranges of the sorted hourly rates. Counts are
+    cached per normalized filter set until the index changes
+
+Document numbers never change: an updated expert is appended under a new
+number and the old one is cleared from the `alive` bitmap. Every
+EXPERT_SEARCH_REFRESH_SECONDS the index loads the experts whose
+`updated_at` changed since the last refresh, so writes to search fields
+must set `updated_at`. Every EXPERT_SEARCH_REBUILD_SECONDS, or once a
+quarter of the numbers are dead, it is rebuilt from scratch; this drops
+deleted experts and recomputes idf. Refreshes run on a background thread
+and the new state is published under a lock held only for the swap.
+"""
+import os
+import re
+import copy
+import math
+import time
+import bisect
+import heapq
+import operator
+import logging
+import threading
+from array import array
+from collections import OrderedDict, defaultdict
+from datetime import datetime, timedelta, timezone
+from itertools import chain, islice, repeat
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+from bson import ObjectId
+from pymongo import ASCENDING
+
+from .mongo import db
+from .expert_pages import SORT_ORDERS, RELEVANCE, encode_cursor, decode_cursor
+
+logger = logging.getLogger(__name__)
+
+# Search index configuration
+EXPERT_SEARCH_REFRESH_SECONDS = float(os.getenv("EXPERT_SEARCH_REFRESH_SECONDS", 5))
+EXPERT_SEARCH_REBUILD_SECONDS = float(os.getenv("EXPERT_SEARCH_REBUILD_SECONDS", 3600))
+EXPERT_SEARCH_REFRESH_OVERLAP_SECONDS = float(os.getenv("EXPERT_SEARCH_REFRESH_OVERLAP_SECONDS", 5))
+EXPERT_SEARCH_MAX_EXPANSIONS = int(os.getenv("EXPERT_SEARCH_MAX_EXPANSIONS", 50))
+EXPERT_FUZZY_MIN_SIMILARITY = float(os.getenv("EXPERT_FUZZY_MIN_SIMILARITY", 0.25))
+EXPERT_FUZZY_MAX_TERMS = int(os.getenv("EXPERT_FUZZY_MAX_TERMS", 10))
+EXPERT_FACETS_CACHE_SIZE = int(os.getenv("EXPERT_FACETS_CACHE_SIZE", 1024))
+# Upper bounds of the hourly rate buckets; the last bucket is open ended
+EXPERT_FACETS_RATE_BUCKETS = [
+    float(bound) for bound in os.getenv("EXPERT_FACETS_RATE_BUCKETS", "25,50,75,100").split(",")
+]
+
+SEARCHABLE = {"is_approved": True, "is_verified": True}
+SEARCH_PROJECTION = {
+    "specialty": 1, "tags": 1, "bio": 1, "languages": 1, "first_name": 1, "last_name": 1,
+    "hourly_rate": 1, "rating": 1, "completed_sessions": 1,
+    "is_approved": 1, "is_verified": 1, "updated_at": 1
+}
+FIELD_WEIGHTS = {"specialty": 3.0, "tags": 2.0, "bio": 1.0}
+FUZZY_FIELD_WEIGHTS = {"specialty": 3.0, "tags": 2.0, "first_name": 2.0, "last_name": 2.0}
+PREFIX_MATCH_WEIGHT = 0.5
+
+SORTED_FIELDS = ("hourly_rate", "rating", "completed_sessions")
+SORTED_BLOCK = 512
+# Past this many changed experts in one refresh, sorting again is cheaper
+# than patching the sorted arrays one expert at a time
+SORTED_MAX_PATCHES = 256
+# Missing numbers sort first, like null in MongoDB
+MISSING = float("-inf")
+
+TOKEN_RE = re.compile(r"[a-z0-9+#]+")
+STOP_WORDS = frozenset(
+    "a an and are as at be by for from has have i in is it of on or our the "
+    "their this to was we with you your".split()
+)
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Split text into lowercase search terms"""
+    if not text:
+        return []
+    return [token for token in TOKEN_RE.findall(text.lower()) if token not in STOP_WORDS]
+
+
+def _rounded(value: Optional[float]) -> Optional[float]:
+    return None if value is None else round(float(value), 2)
+
+
+def canonical_query(filters: dict, q: Optional[str]) -> Tuple[dict, Optional[str], tuple]:
+    """
+    Write a search so that searches selecting the same experts look alike
+
+    Specialty and text become their sorted terms, tags are sorted and
+    deduplicated and numeric bounds are rounded to cents.
+
+    Args:
+        filters (dict): specialty, tags, language, min_rate, max_rate and min_rating
+        q (str): Text search
+
+    Returns:
+        tuple: Canonical filters, canonical text and a hashable key of both
+    """
+    specialty_terms = tuple(sorted(set(tokenize(filters.get("specialty")))))
+    tags = tuple(sorted(set(filters.get("tags") or ())))
+    terms = tuple(sorted(set(tokenize(q))))
+    canonical = {
+        "specialty": " ".join(specialty_terms) or None,
+        "tags": list(tags) or None,
+        "language": filters.get("language") or None,
+        "min_rate": _rounded(filters.get("min_rate")),
+        "max_rate": _rounded(filters.get("max_rate")),
+        "min_rating": _rounded(filters.get("min_rating"))
+    }
+    key = (
+        specialty_terms, tags, canonical["language"],
+        canonical["min_rate"], canonical["max_rate"], canonical["min_rating"], terms
+    )
+    return canonical, " ".join(terms) or None, key
+
+
+def _bitmap(doc_nos: Iterable[int], size: int) -> int:
+    """Bitmap with the bits of `doc_nos` set"""
+    buffer = bytearray((size + 7) // 8)
+    for doc_no in doc_nos:
+        buffer[doc_no >> 3] |= 1 << (doc_no & 7)
+    return int.from_bytes(buffer, "little")
+
+
+def _doc_nos(bitmap: int) -> List[int]:
+    """Numbers of the set bits, in ascending order"""
+    bits = bin(bitmap)[:1:-1]
+    doc_nos = []
+    doc_no = bits.find("1")
+    while doc_no != -1:
+        doc_nos.append(doc_no)
+        doc_no = bits.find("1", doc_no + 1)
+    return doc_nos
+
+
+def _number(value) -> float:
+    try:
+        return MISSING if value is None else float(value)
+    except (TypeError, ValueError):
+        return MISSING
+
+
+def _expand(term: str, vocabulary: List[str]) -> List[str]:
+    """The term itself and up to EXPERT_SEARCH_MAX_EXPANSIONS longer terms it is a prefix of"""
+    start = bisect.bisect_left(vocabulary, term)
+    matches = []
+    for candidate in vocabulary[start:start + EXPERT_SEARCH_MAX_EXPANSIONS + 1]:
+        if not candidate.startswith(term):
+            break
+        matches.append(candidate)
+    return matches
+
+
+def trigrams(term: str) -> set:
+    """Three-letter pieces of a term, padded so short terms and word starts count"""
+    padded = f"  {term} "
+    return {padded[index:index + 3] for index in range(len(padded) - 2)}
+
+
+def _field_terms(expert: dict, weights: Dict[str, float]) -> Dict[str, float]:
+    term_weights = defaultdict(float)
+    for field, weight in weights.items():
+        value = expert.get(field)
+        text = " ".join(value) if isinstance(value, list) else value
+        for term in tokenize(text):
+            term_weights[term] += weight
+    return term_weights
+
+
+def _index_terms(expert: dict) -> Tuple[Dict[str, float], set, Dict[str, float]]:
+    """Weighted text terms, specialty terms and weighted fuzzy terms of an expert"""
+    return (
+        _field_terms(expert, FIELD_WEIGHTS),
+        set(tokenize(expert.get("specialty"))),
+        _field_terms(expert, FUZZY_FIELD_WEIGHTS)
+    )
+
+
+class _SortedField:
+    """Live experts ordered by one numeric field, then _id"""
+
+    def __init__(self, values: array, by_id: List[int], size: int):
+        # Stable sort: experts with equal values stay in _id order
+        order = sorted(by_id, key=values.__getitem__)
+        self.order = array("I", order)
+        self.keys = array("d", (values[doc_no] for doc_no in order))
+        self.first_present = bisect.bisect_right(self.keys, MISSING)
+        self.size = size
+
+        # prefix[b] has the bits of order[:b * SORTED_BLOCK]
+        buffer = bytearray((size + 7) // 8)
+        self.prefix = [0]
+        for position, doc_no in enumerate(order, 1):
+            buffer[doc_no >> 3] |= 1 << (doc_no & 7)
+            if position % SORTED_BLOCK == 0:
+                self.prefix.append(int.from_bytes(buffer, "little"))
+
+    def _positions(self, start: int, end: int) -> int:
+        """Bitmap of order[start:end]"""
+        first_block = -(-start // SORTED_BLOCK)
+        last_block = end // SORTED_BLOCK
+        if first_block >= last_block:
+            return _bitmap(self.order[start:end], self.size)
+        edges = chain(
+            self.order[start:first_block * SORTED_BLOCK],
+            self.order[last_block * SORTED_BLOCK:end]
+        )
+        return (self.prefix[last_block] ^ self.prefix[first_block]) | _bitmap(edges, self.size)
+
+    def bounds(self, low: Optional[float], high: Optional[float]) -> Tuple[int, int]:
+        """Positions [start, end) of the experts with low <= value <= high"""
+        if low is None and high is None:
+            return 0, len(self.order)
+        start = bisect.bisect_left(self.keys, low) if low is not None else self.first_present
+        end = bisect.bisect_right(self.keys, high) if high is not None else len(self.order)
+        return start, max(start, end)
+
+    def range(self, low: Optional[float], high: Optional[float]) -> int:
+        """Bitmap of experts with low <= value <= high (missing values never match)"""
+        return self._positions(*self.bounds(low, high))
+
+    def bucket(self, low: float, high: Optional[float]) -> int:
+        """Bitmap of experts with low <= value < high"""
+        start = bisect.bisect_left(self.keys, low)
+        end = bisect.bisect_left(self.keys, high) if high is not None else len(self.order)
+        return self._positions(start, max(start, end))
+
+    def position(self, value: float, id_bytes: bytes, ids: List[bytes], inclusive: bool) -> int:
+        """First position whose (value, _id) is >= (inclusive) or > the given key"""
+        low = bisect.bisect_left(self.keys, value)
+        high = bisect.bisect_right(self.keys, value)
+        while low < high:
+            middle = (low + high) // 2
+            current = ids[self.order[middle]]
+            if current < id_bytes or (current == id_bytes and not inclusive):
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def patched(self, removed: List[int], added: List[int], values: array, ids: List[bytes],
+                size: int) -> "_SortedField":
+        """
+        Copy with `removed` taken out of and `added` put into the sort order
+
+        Each change moves the experts after it by one position, so every
+        prefix bitmap past it swaps one bit in and one bit out.
+        """
+        field = copy.copy(self)
+        field.order = array("I", self.order)
+        field.keys = array("d", self.keys)
+        field.prefix = list(self.prefix)
+        field.size = size
+        order, prefix = field.order, field.prefix
+
+        for doc_no in removed:
+            position = field.position(values[doc_no], ids[doc_no], ids, inclusive=True)
+            del order[position]
+            del field.keys[position]
+            # prefix[b] loses doc_no and gains the expert moved back into its last slot
+            for block in range(position // SORTED_BLOCK + 1, len(prefix)):
+                end = block * SORTED_BLOCK
+                if end > len(order):
+                    # No longer a full block
+                    del prefix[block:]
+                    break
+                prefix[block] ^= (1 << doc_no) | (1 << order[end - 1])
+
+        for doc_no in added:
+            position = field.position(values[doc_no], ids[doc_no], ids, inclusive=True)
+            order.insert(position, doc_no)
+            field.keys.insert(position, values[doc_no])
+            # prefix[b] gains doc_no and loses the expert moved out of its last slot
+            for block in range(position // SORTED_BLOCK + 1, len(prefix)):
+                prefix[block] ^= (1 << doc_no) | (1 << order[block * SORTED_BLOCK])
+            if len(order) % SORTED_BLOCK == 0:
+                start = (len(prefix) - 1) * SORTED_BLOCK
+                prefix.append(prefix[-1] | _bitmap(order[start:], size))
+
+        field.first_present = bisect.bisect_right(field.keys, MISSING)
+        return field
+
+
+class _State:
+    """Documents and structures of one build, extended by incremental refreshes"""
+
+    def __init__(self):
+        self.ids: List[ObjectId] = []
+        # _id.binary of every document, which compares like the _id
+        self.id_bytes: List[bytes] = []
+        self.positions: Dict[ObjectId, int] = {}
+        self.updated: Dict[ObjectId, Optional[datetime]] = {}
+        self.alive = 0
+        self.postings: Dict[str, Tuple[array, array]] = {}
+        self.vocabulary: List[str] = []
+        self.fuzzy_postings: Dict[str, Tuple[array, array]] = {}
+        self.fuzzy_terms: List[str] = []
+        self.fuzzy_sizes = array("I")
+        self.trigrams: Dict[str, array] = {}
+        self.specialty: Dict[str, int] = {}
+        self.specialty_vocabulary: List[str] = []
+        self.specialties: Dict[str, int] = {}
+        self.tags: Dict[str, int] = {}
+        self.languages: Dict[str, int] = {}
+        self.values: Dict[str, array] = {field: array("d") for field in SORTED_FIELDS}
+        self.sorted: Dict[str, _SortedField] = {}
+        self.built_at = time.monotonic()
+        self.since: Optional[datetime] = None
+
+    @property
+    def size(self) -> int:
+        return len(self.ids)
+
+    @property
+    def live(self) -> int:
+        return len(self.positions)
+
+
+class _Suggestions:
+    """Tags and specialties sorted by lowercase text, for prefix lookups"""
+
+    def __init__(self, state: _State):
+        entries = []
+        for kind, bitmaps in (("specialty", state.specialties), ("tag", state.tags)):
+            for value, bitmap in bitmaps.items():
+                count = (bitmap & state.alive).bit_count()
+                if not count:
+                    continue
+                # "alg" completes "Linear Algebra" as well as "Algebra"
+                words = value.lower().split()
+                for start in range(len(words)):
+                    entries.append((" ".join(words[start:]), -count, value, kind))
+        entries.sort()
+        self.keys = [entry[0] for entry in entries]
+        self.entries = [(-count, value, kind) for _, count, value, kind in entries]
+        self.values = len({(kind, value) for _, _, value, kind in entries})
+
+    def lookup(self, prefix: str, limit: int) -> List[dict]:
+        start = bisect.bisect_left(self.keys, prefix)
+        end = bisect.bisect_left(self.keys, prefix + "\uffff", start)
+        best = {}
+        for count, value, kind in self.entries[start:end]:
+            best[(kind, value)] = count
+        top = heapq.nsmallest(limit, best.items(), key=lambda item: (-item[1], item[0][1], item[0][0]))
+        return [{"value": value, "kind": kind, "count": count} for (kind, value), count in top]
+
+
+class SearchPage(NamedTuple):
+    experts: List[Tuple[ObjectId, Optional[float]]]
+    next_cursor: Optional[str]
+    total: int
+
+
+class ExpertSearchIndex:
+    """Per-worker search index of searchable experts"""
+
+    def __init__(self, refresh_seconds: float = EXPERT_SEARCH_REFRESH_SECONDS,
+                 rebuild_seconds: float = EXPERT_SEARCH_REBUILD_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self.rebuild_seconds = rebuild_seconds
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._state: Optional[_State] = None
+        self._refreshed_at = 0.0
+        self._refreshing = False
+        self.builds = 0
+        self.last_build_ms = None
+        self.refreshes = 0
+        self.last_refresh_ms = None
+        self.searches = 0
+        # Facet counts per normalized filter set, valid for one index version
+        self._version = 0
+        self._facets_cache: "OrderedDict[tuple, dict]" = OrderedDict()
+        self._facets_version = 0
+        self.facets_hits = 0
+        self.facets_misses = 0
+        self._suggestions: Optional[_Suggestions] = None
+        self._suggestions_version = None
+
+    # Building and refreshing
+
+    def build(self) -> None:
+        """Load every searchable expert and replace the index"""
+        started = time.perf_counter()
+        since = datetime.now(timezone.utc) - timedelta(seconds=EXPERT_SEARCH_REFRESH_OVERLAP_SECONDS)
+        state = _State()
+        weighted = defaultdict(lambda: (array("I"), array("f")))
+        fuzzy_weighted = defaultdict(lambda: (array("I"), array("f")))
+        specialty = defaultdict(list)
+        specialties = defaultdict(list)
+        tags = defaultdict(list)
+        languages = defaultdict(list)
+
+        for doc_no, expert in enumerate(db.experts.find(SEARCHABLE, SEARCH_PROJECTION)):
+            state.ids.append(expert["_id"])
+            state.id_bytes.append(expert["_id"].binary)
+            state.positions[expert["_id"]] = doc_no
+            state.updated[expert["_id"]] = expert.get("updated_at")
+            term_weights, specialty_terms, fuzzy_weights = _index_terms(expert)
+            for term, weight in term_weights.items():
+                docs, weights = weighted[term]
+                docs.append(doc_no)
+                weights.append(weight)
+            for term, weight in fuzzy_weights.items():
+                docs, weights = fuzzy_weighted[term]
+                docs.append(doc_no)
+                weights.append(weight)
+            for term in specialty_terms:
+                specialty[term].append(doc_no)
+            if expert.get("specialty"):
+                specialties[expert["specialty"]].append(doc_no)
+            for tag in set(expert.get("tags") or []):
+                tags[tag].append(doc_no)
+            for language in set(expert.get("languages") or []):
+                languages[language].append(doc_no)
+            for field in SORTED_FIELDS:
+                state.values[field].append(_number(expert.get(field)))
+
+        size = state.size
+        for term, (docs, weights) in weighted.items():
+            idf = math.log(1 + size / len(docs))
+            state.postings[term] = (docs, array("f", (weight * idf for weight in weights)))
+        state.vocabulary = sorted(state.postings)
+        for term, (docs, weights) in fuzzy_weighted.items():
+            idf = math.log(1 + size / len(docs))
+            state.fuzzy_postings[term] = (docs, array("f", (weight * idf for weight in weights)))
+            self._add_fuzzy_term(state, term)
+        state.specialty = {term: _bitmap(docs, size) for term, docs in specialty.items()}
+        state.specialty_vocabulary = sorted(state.specialty)
+        state.specialties = {value: _bitmap(docs, size) for value, docs in specialties.items()}
+        state.tags = {tag: _bitmap(docs, size) for tag, docs in tags.items()}
+        state.languages = {language: _bitmap(docs, size) for language, docs in languages.items()}
+        state.alive = (1 << size) - 1
+        by_id = sorted(range(size), key=state.id_bytes.__getitem__)
+        state.sorted = {field: _SortedField(state.values[field], by_id, size) for field in SORTED_FIELDS}
+        state.since = since
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self._state = state
+            self._version += 1
+            self._refreshed_at = time.monotonic()
+            self.builds += 1
+            self.last_build_ms = round(elapsed_ms, 1)
+        logger.info(f"Built expert search index: {size} experts, {len(state.postings)} terms in {elapsed_ms:.0f} ms")
+
+    def refresh(self) -> int:
+        """
+        Apply experts whose `updated_at` changed since the last refresh
+
+        Returns:
+            int: Number of experts added, updated or removed
+        """
+        started = time.perf_counter()
+        state = self._state
+        since = datetime.now(timezone.utc) - timedelta(seconds=EXPERT_SEARCH_REFRESH_OVERLAP_SECONDS)
+        changed = []
+        added = []
+        for expert in db.experts.find({"updated_at": {"$gte": state.since}}, SEARCH_PROJECTION):
+            searchable = bool(expert.get("is_approved") and expert.get("is_verified"))
+            if expert["_id"] in state.positions:
+                if state.updated[expert["_id"]] == expert.get("updated_at"):
+                    # Seen by the previous refresh (the windows overlap)
+                    continue
+            elif not searchable:
+                continue
+            changed.append(expert)
+            if searchable:
+                added.append(expert)
+
+        # Only this thread writes: the new experts get the next numbers
+        removed = [state.positions[expert["_id"]] for expert in changed if expert["_id"] in state.positions]
+        size = state.size + len(added)
+        alive = state.alive
+        if removed:
+            alive &= ~_bitmap(removed, state.size)
+        alive |= ((1 << len(added)) - 1) << state.size
+
+        # Sort orders are patched beside the live ones and swapped in with the documents
+        ids = state.id_bytes + [expert["_id"].binary for expert in added]
+        new = list(range(state.size, size))
+        values = {field: array("d", state.values[field]) for field in SORTED_FIELDS}
+        for expert in added:
+            for field in SORTED_FIELDS:
+                values[field].append(_number(expert.get(field)))
+        sorted_fields = state.sorted
+        if len(removed) + len(added) > SORTED_MAX_PATCHES:
+            by_id = sorted(_doc_nos(alive), key=ids.__getitem__)
+            sorted_fields = {field: _SortedField(values[field], by_id, size) for field in SORTED_FIELDS}
+        elif changed:
+            sorted_fields = {
+                field: state.sorted[field].patched(removed, new, values[field], ids, size)
+                for field in SORTED_FIELDS
+            }
+
+        with self._lock:
+            for expert in changed:
+                state.positions.pop(expert["_id"], None)
+                state.updated.pop(expert["_id"], None)
+            for expert in added:
+                self._append(state, expert)
+            state.alive = alive
+            state.sorted = sorted_fields
+            state.since = since
+            if changed:
+                self._version += 1
+            self._refreshed_at = time.monotonic()
+            self.refreshes += 1
+            self.last_refresh_ms = round((time.perf_counter() - started) * 1000, 1)
+        return len(changed)
+
+    def _append(self, state: _State, expert: dict) -> None:
+        """Add an expert under the next document number (caller holds the lock)"""
+        doc_no = state.size
+        bit = 1 << doc_no
+        state.ids.append(expert["_id"])
+        state.id_bytes.append(expert["_id"].binary)
+        state.positions[expert["_id"]] = doc_no
+        state.updated[expert["_id"]] = expert.get("updated_at")
+
+        term_weights, specialty_terms, fuzzy_weights = _index_terms(expert)
+        for term, weight in term_weights.items():
+            if term not in state.postings:
+                state.postings[term] = (array("I"), array("f"))
+                bisect.insort(state.vocabulary, term)
+            docs, weights = state.postings[term]
+            docs.append(doc_no)
+            weights.append(weight * math.log(1 + state.live / len(docs)))
+        for term, weight in fuzzy_weights.items():
+            if term not in state.fuzzy_postings:
+                state.fuzzy_postings[term] = (array("I"), array("f"))
+                self._add_fuzzy_term(state, term)
+            docs, weights = state.fuzzy_postings[term]
+            docs.append(doc_no)
+            weights.append(weight * math.log(1 + state.live / len(docs)))
+        for term in specialty_terms:
+            if term not in state.specialty:
+                bisect.insort(state.specialty_vocabulary, term)
+            state.specialty[term] = state.specialty.get(term, 0) | bit
+        if expert.get("specialty"):
+            state.specialties[expert["specialty"]] = state.specialties.get(expert["specialty"], 0) | bit
+        for tag in set(expert.get("tags") or []):
+            state.tags[tag] = state.tags.get(tag, 0) | bit
+        for language in set(expert.get("languages") or []):
+            state.languages[language] = state.languages.get(language, 0) | bit
+        for field in SORTED_FIELDS:
+            state.values[field].append(_number(expert.get(field)))
+
+    def _add_fuzzy_term(self, state: _State, term: str) -> None:
+        """Add a term to the trigram index"""
+        term_id = len(state.fuzzy_terms)
+        grams = trigrams(term)
+        state.fuzzy_terms.append(term)
+        state.fuzzy_sizes.append(len(grams))
+        for gram in grams:
+            if gram not in state.trigrams:
+                state.trigrams[gram] = array("I")
+            state.trigrams[gram].append(term_id)
+
+    def _refresh_in_background(self):
+        try:
+            state = self._state
+            dead = state.size - state.live
+            if time.monotonic() - state.built_at > self.rebuild_seconds or dead * 4 > state.size:
+                self.build()
+            else:
+                self.refresh()
+        except Exception as e:
+            logger.error(f"Failed to refresh expert search index: {str(e)}")
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def start(self):
+        """Build the index in the background (called at startup)"""
+        threading.Thread(target=self._current, name="expert-search-index", daemon=True).start()
+
+    def _current(self) -> _State:
+        """The current index, building it on first use and refreshing it when due"""
+        with self._lock:
+            state = self._state
+            due = (
+                state is not None and not self._refreshing
+                and time.monotonic() - self._refreshed_at > self.refresh_seconds
+            )
+            if due:
+                self._refreshing = True
+
+        if state is None:
+            with self._build_lock:
+                if self._state is None:
+                    self.build()
+            return self._state
+        if due:
+            threading.Thread(target=self._refresh_in_background, name="expert-search-index", daemon=True).start()
+        return state
+
+    @property
+    def version(self) -> int:
+        """Changes whenever the searchable catalog may have changed"""
+        return self._version
+
+    def expert_changed(self) -> None:
+        """
+        Note a write to an expert made by this worker
+
+        Results cached for the current version are dropped at once and the
+        next search refreshes the index. Writes made by other workers change
+        the version when a refresh applies them.
+        """
+        with self._lock:
+            self._version += 1
+            self._refreshed_at = 0.0
+
+    # Searching
+
+    def _similar_terms(self, state: _State, term: str) -> List[Tuple[str, float]]:
+        """Up to EXPERT_FUZZY_MAX_TERMS fuzzy terms similar to `term`, least similar first"""
+        grams = trigrams(term)
+        shared = defaultdict(int)
+        for gram in grams:
+            for term_id in state.trigrams.get(gram, ()):
+                shared[term_id] += 1
+        sizes = state.fuzzy_sizes
+        similar = []
+        for term_id, count in shared.items():
+            similarity = count / (len(grams) + sizes[term_id] - count)
+            if similarity >= EXPERT_FUZZY_MIN_SIMILARITY:
+                similar.append((similarity, state.fuzzy_terms[term_id]))
+        return [(match, similarity) for similarity, match in sorted(heapq.nlargest(EXPERT_FUZZY_MAX_TERMS, similar))]
+
+    def _scores(self, state: _State, text: str, fuzzy: bool = False) -> Dict[int, float]:
+        """Relevance of every document matching all terms of `text`"""
+        postings = state.fuzzy_postings if fuzzy else state.postings
+        scores = None
+        for term in dict.fromkeys(tokenize(text)):
+            if fuzzy:
+                # A document scores its most similar term
+                matches = self._similar_terms(state, term)
+            else:
+                # A document scores its exact match, or else its (discounted) prefix match
+                matches = [
+                    (match, 1.0 if match == term else PREFIX_MATCH_WEIGHT)
+                    for match in reversed(_expand(term, state.vocabulary))
+                ]
+            term_scores = {}
+            for match, factor in matches:
+                docs, weights = postings[match]
+                if factor != 1.0:
+                    weights = map(operator.mul, weights, repeat(factor))
+                term_scores.update(zip(docs, weights))
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {doc_no: scores[doc_no] + term_scores[doc_no] for doc_no in scores.keys() & term_scores.keys()}
+            if not scores:
+                break
+        return scores or {}
+
+    def _matching(self, state: _State, specialty: Optional[str] = None, tags: Optional[List[str]] = None,
+                  language: Optional[str] = None, min_rate: Optional[float] = None,
+                  max_rate: Optional[float] = None, min_rating: Optional[float] = None) -> int:
+        """Bitmap of live experts passing the filters"""
+        result = state.alive
+        for term in tokenize(specialty):
+            term_bitmap = 0
+            for match in _expand(term, state.specialty_vocabulary):
+                term_bitmap |= state.specialty[match]
+            result &= term_bitmap
+        if tags:
+            tag_bitmap = 0
+            for tag in tags:
+                tag_bitmap |= state.tags.get(tag, 0)
+            result &= tag_bitmap
+        if language:
+            result &= state.languages.get(language, 0)
+        if result and (min_rate is not None or max_rate is not None):
+            result &= state.sorted["hourly_rate"].range(min_rate, max_rate)
+        if result and min_rating is not None:
+            result &= state.sorted["rating"].range(min_rating, None)
+        return result
+
+    def _relevance_page(self, state: _State, scores: Dict[int, float], candidates: List[int],
+                        limit: int, cursor: Optional[str]) -> Tuple[List[int], Optional[str]]:
+        ids = state.ids
+        id_bytes = state.id_bytes
+        if cursor:
+            value, last_id = decode_cursor(cursor, RELEVANCE)
+            last_id = last_id.binary
+            candidates = [
+                doc_no for doc_no in candidates
+                if scores[doc_no] < value or (scores[doc_no] == value and id_bytes[doc_no] < last_id)
+            ]
+
+        # Rank by score alone, then take the experts tied with the last one
+        # by _id; text matches often tie by the thousand
+        page = candidates
+        top_scores = heapq.nlargest(limit + 1, map(scores.__getitem__, candidates))
+        if len(top_scores) > limit:
+            threshold = top_scores[-1]
+            above = [doc_no for doc_no in candidates if scores[doc_no] > threshold]
+            tied = [doc_no for doc_no in candidates if scores[doc_no] == threshold]
+            # Near sorted already (numbers mostly follow _id), so sorting beats a heap
+            tied.sort(key=id_bytes.__getitem__)
+            page = above + tied[len(above) - limit - 1:]
+        page = sorted(page, key=lambda doc_no: (scores[doc_no], id_bytes[doc_no]), reverse=True)
+        if len(page) <= limit:
+            return page, None
+        page = page[:limit]
+        return page, encode_cursor(RELEVANCE, scores[page[-1]], ids[page[-1]])
+
+    def _sorted_page(self, state: _State, sort: str, result: int, span: Tuple[int, int],
+                     limit: int, cursor: Optional[str]) -> Tuple[List[int], Optional[str]]:
+        field, direction = SORT_ORDERS[sort]
+        ids = state.ids
+        id_bytes = state.id_bytes
+        values = state.values[field]
+        sorted_field = state.sorted[field]
+        ascending = direction == ASCENDING
+
+        position = None
+        if cursor:
+            value, last_id = decode_cursor(cursor, sort)
+            position = (_number(value), last_id.binary)
+
+        # Only positions within `span` can match a range filter on the sort field
+        start, end = span
+        count = result.bit_count()
+        if count * count * 3 >= (limit + 1) * (end - start):
+            # Many matches: walk the sort order from the cursor and keep matches
+            members = result.to_bytes((state.size + 7) // 8, "little")
+            order = sorted_field.order
+            if ascending:
+                if position:
+                    start = max(start, sorted_field.position(*position, id_bytes, inclusive=False))
+                walk = islice(order, start, end)
+            else:
+                if position:
+                    end = min(end, sorted_field.position(*position, id_bytes, inclusive=True))
+                walk = (order[index] for index in range(end - 1, start - 1, -1))
+            page = []
+            for doc_no in walk:
+                if members[doc_no >> 3] >> (doc_no & 7) & 1:
+                    page.append(doc_no)
+                    if len(page) > limit:
+                        break
+        else:
+            # Few matches: pick the page from them directly
+            def key(doc_no):
+                return values[doc_no], id_bytes[doc_no]
+
+            candidates = _doc_nos(result)
+            if position:
+                if ascending:
+                    candidates = [doc_no for doc_no in candidates if key(doc_no) > position]
+                else:
+                    candidates = [doc_no for doc_no in candidates if key(doc_no) < position]
+            pick = heapq.nsmallest if ascending else heapq.nlargest
+            page = pick(limit + 1, candidates, key=key)
+
+        if len(page) <= limit:
+            return page, None
+        page = page[:limit]
+        last_value = values[page[-1]]
+        return page, encode_cursor(sort, None if last_value == MISSING else last_value, ids[page[-1]])
+
+    def find_page(self, filters: dict, q: Optional[str], sort: str, limit: int,
+                  cursor: Optional[str] = None, fuzzy: bool = False) -> SearchPage:
+        """
+        Get one page of matching experts
+
+        Args:
+            filters (dict): specialty, tags, language, min_rate, max_rate and min_rating
+            q (str): Text search, required for the relevance sort
+            sort (str): One of SORT_ORDERS or RELEVANCE
+            limit (int): Page size
+            cursor (str): Cursor returned with the previous page
+            fuzzy (bool): Match `q` against specialty, tags and names with
+                typo tolerance instead of exact and prefix terms
+
+        Returns:
+            SearchPage: (_id, relevance) pairs of the page, the next cursor
+            and the number of matches
+
+        Raises:
+            InvalidCursor: If the cursor does not belong to this sort order
+        """
+        state = self._current()
+        with self._lock:
+            self.searches += 1
+            result = self._matching(state, **filters)
+            scores = self._scores(state, q, fuzzy) if q else None
+            if sort == RELEVANCE:
+                scores = scores or {}
+                # Rank the text matches without building their bitmap. Postings
+                # keep the numbers of updated and removed experts, so even an
+                # unfiltered search checks every match against `result`
+                members = result.to_bytes((state.size + 7) // 8, "little")
+                candidates = [doc_no for doc_no in scores if members[doc_no >> 3] >> (doc_no & 7) & 1]
+                page, next_cursor = self._relevance_page(state, scores, candidates, limit, cursor)
+                experts = [(state.ids[doc_no], scores[doc_no]) for doc_no in page]
+                return SearchPage(experts, next_cursor, len(candidates))
+
+            if scores is not None:
+                result &= _bitmap(scores, state.size)
+            field = SORT_ORDERS[sort][0]
+            if field == "hourly_rate":
+                span = state.sorted[field].bounds(filters.get("min_rate"), filters.get("max_rate"))
+            elif field == "rating":
+                span = state.sorted[field].bounds(filters.get("min_rating"), None)
+            else:
+                span = (0, len(state.sorted[field].order))
+            page, next_cursor = self._sorted_page(state, sort, result, span, limit, cursor)
+
+            experts = [(state.ids[doc_no], scores[doc_no] if scores else None) for doc_no in page]
+            return SearchPage(experts, next_cursor, result.bit_count())
+
+    def _count_facets(self, state: _State, filters: dict, q: Optional[str], fuzzy: bool = False) -> dict:
+        """
+        Count the matches per facet value
+
+        Each facet is counted with every filter except its own, so the
+        counts tell how many experts a click on another value would show.
+        """
+        matches = state.alive
+        if q:
+            matches = _bitmap(self._scores(state, q, fuzzy), state.size)
+
+        def without(*names):
+            return matches & self._matching(state, **{
+                name: value for name, value in filters.items() if name not in names
+            })
+
+        def counts(bitmaps: Dict[str, int], base: int) -> Dict[str, int]:
+            found = {value: count for value, bitmap in bitmaps.items() if (count := (base & bitmap).bit_count())}
+            return dict(sorted(found.items(), key=lambda item: (-item[1], item[0])))
+
+        rates = state.sorted["hourly_rate"]
+        rate_base = without("min_rate", "max_rate")
+        rate_buckets = []
+        for low, high in zip([0.0] + EXPERT_FACETS_RATE_BUCKETS, EXPERT_FACETS_RATE_BUCKETS + [None]):
+            rate_buckets.append({
+                "min_rate": low,
+                "max_rate": high,
+                "count": (rate_base & rates.bucket(low, high)).bit_count()
+            })
+
+        return {
+            "total": without().bit_count(),
+            "tags": counts(state.tags, without("tags")),
+            "languages": counts(state.languages, without("language")),
+            "specialties": counts(state.specialties, without("specialty")),
+            "rate_buckets": rate_buckets
+        }
+
+    def facets(self, filters: dict, q: Optional[str] = None, fuzzy: bool = False) -> dict:
+        """
+        Count matching experts per tag, language, specialty and rate bucket
+
+        Args:
+            filters (dict): specialty, tags, language, min_rate, max_rate and min_rating
+            q (str): Text search
+            fuzzy (bool): Match `q` tolerating typos, as find_page does
+
+        Returns:
+            dict: total, tags, languages and specialties ({value: count}, most
+            common first) and rate_buckets ([{min_rate, max_rate, count}])
+        """
+        state = self._current()
+        # Filters that select the same experts share one cache entry
+        filters, q, key = canonical_query(filters, q)
+        key = (key, fuzzy)
+        with self._lock:
+            if self._facets_version != self._version:
+                self._facets_cache.clear()
+                self._facets_version = self._version
+            cached = self._facets_cache.get(key)
+            if cached is not None:
+                self._facets_cache.move_to_end(key)
+                self.facets_hits += 1
+                return cached
+
+            self.facets_misses += 1
+            result = self._count_facets(state, filters, q, fuzzy)
+            self._facets_cache[key] = result
+            if len(self._facets_cache) > EXPERT_FACETS_CACHE_SIZE:
+                self._facets_cache.popitem(last=False)
+            return result
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[dict]:
+        """
+        Complete a prefix to tags and specialties, most common first
+
+        Args:
+            prefix (str): Start of a tag or specialty, or of a word in it
+            limit (int): Maximum number of suggestions
+
+        Returns:
+            list: {"value", "kind" (tag or specialty), "count"} per suggestion
+        """
+        self._current()
+        with self._lock:
+            if self._suggestions is None or self._suggestions_version != self._version:
+                self._suggestions = _Suggestions(self._state)
+                self._suggestions_version = self._version
+            suggestions = self._suggestions
+        return suggestions.lookup(" ".join(prefix.lower().split()), limit)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            state = self._state
+            return {
+                "experts": state.live if state else 0,
+                "dead_documents": state.size - state.live if state else 0,
+                "terms": len(state.postings) if state else 0,
+                "fuzzy_terms": len(state.fuzzy_terms) if state else 0,
+                "tags": len(state.tags) if state else 0,
+                "languages": len(state.languages) if state else 0,
+                "builds": self.builds,
+                "last_build_ms": self.last_build_ms,
+                "refreshes": self.refreshes,
+                "last_refresh_ms": self.last_refresh_ms,
+                "seconds_since_refresh": round(time.monotonic() - self._refreshed_at, 1) if state else None,
+                "searches": self.searches,
+                "suggestions": self._suggestions.values if self._suggestions else 0,
+                "facets_cached": len(self._facets_cache),
+                "facets_hits": self.facets_hits,
+                "facets_misses": self.facets_misses
+            }
+
+
+expert_search_index = ExpertSearchIndex()
@@ -0,0 +1,88 @@
+"""
+Request-scoped identity map.
+
+Documents loaded by `_id` are remembered for the rest of the request, so a
+handler (and the helpers it calls) can ask for the same session, expert or
+student several times while only the first call reaches MongoDB. Writes made
+through `update_by_id` return the updated document and refresh the cached
+copy, so no re-fetch is needed after an update.
+
+Outside a request (scripts, background jobs) every call goes to the database.
+"""
+from copy import deepcopy
+from contextvars import ContextVar
+from typing import Optional
+from pymongo import ReturnDocument
+
+from .mongo import db
+from .ids import to_object_id
+
+_identity_map: ContextVar[Optional[dict]] = ContextVar("identity_map", default=None)
+
+
+def start_identity_map() -> dict:
+    """Attach an empty identity map to the current request context"""
+    documents = {}
+    _identity_map.set(documents)
+    return documents
+
+
+def _remember(collection_name: str, doc: Optional[dict]) -> Optional[dict]:
+    documents = _identity_map.get()
+    if documents is not None and doc is not None:
+        documents[(collection_name, doc["_id"])] = doc
+    # Callers freely add and delete keys, hand out a copy
+    return deepcopy(doc) if doc is not None else None
+
+
+def get_by_id(collection_name: str, doc_id) -> Optional[dict]:
+    """
+    Get a document by `_id`, reusing a copy loaded earlier in the request
+
+    Args:
+        collection_name (str): Collection name
+        doc_id: ObjectId or hex string
+
+    Returns:
+        dict: The document, or None if it does not exist
+    """
+    doc_id = to_object_id(doc_id)
+    documents = _identity_map.get()
+    if documents is not None and (collection_name, doc_id) in documents:
+        return deepcopy(documents[(collection_name, doc_id)])
+
+    return _remember(collection_name, db[collection_name].find_one({"_id": doc_id}))
+
+
+def update_by_id(collection_name: str, doc_id, update: dict) -> Optional[dict]:
+    """
+    Apply an update by `_id` and return the updated document.
+
+    Uses a single findAndModify, replacing the usual update_one + find_one
+    pair, and refreshes the cached copy.
+
+    Returns:
+        dict: The updated document, or None if it does not exist
+    """
+    doc_id = to_object_id(doc_id)
+    doc = db[collection_name].find_one_and_update(
+        {"_id": doc_id},
+        update,
+        return_document=ReturnDocument.AFTER
+    )
+    if doc is None:
+        forget(collection_name, doc_id)
+    return _remember(collection_name, doc)
+
+
+def forget(collection_name: str, doc_id) -> None:
+    """Drop a cached document after a write made outside this module"""
+    documents = _identity_map.get()
+    if documents is not None:
+        documents.pop((collection_name, to_object_id(doc_id)), None)
+
+
+async def identity_map_middleware(request, call_next):
+    """Give every request its own identity map"""
+    start_identity_map()
+    return await call_next(request)
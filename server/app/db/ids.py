@@ -0,0 +1,63 @@
+from bson import ObjectId
+from bson.errors import InvalidId
+from typing import Any, Iterable, Optional
+
+# Reference fields that are being normalized from strings to ObjectIds.
+# See app/db/migrations/normalize_references.py
+REFERENCE_FIELDS = {
+    "sessions": ("student_id", "expert_id"),
+    "reviews": ("student_id", "expert_id", "session_id"),
+    "messages": ("conversation_id", "sender_id"),
+    "payments": ("student_id", "expert_id", "session_id"),
+}
+
+ALL_REFERENCE_FIELDS = {field for fields in REFERENCE_FIELDS.values() for field in fields}
+
+
+def to_object_id(value: Any) -> Optional[Any]:
+    """
+    Convert a reference to an ObjectId
+
+    Args:
+        value: ObjectId, hex string or None
+
+    Returns:
+        ObjectId if the value is a valid id, otherwise the value unchanged
+    """
+    if value is None or isinstance(value, ObjectId):
+        return value
+    try:
+        return ObjectId(value)
+    except (InvalidId, TypeError):
+        return value
+
+
+def ref_filter(value: Any) -> dict:
+    """
+    Build a query condition matching a reference stored either as a string
+    or as an ObjectId.
+
+    Used while the reference migration is in progress so reads see both
+    migrated and not-yet-migrated documents.
+
+    Args:
+        value: ObjectId or hex string
+
+    Returns:
+        dict: `$in` condition covering both representations
+    """
+    object_id = to_object_id(value)
+    if isinstance(object_id, ObjectId):
+        return {"$in": [object_id, str(object_id)]}
+    return {"$in": [value]}
+
+
+def stringify_refs(doc: dict, fields: Iterable[str] = ALL_REFERENCE_FIELDS) -> dict:
+    """
+    Convert ObjectId reference fields of a document to strings in place,
+    so documents can be returned through the existing response models
+    """
+    for field in fields:
+        if isinstance(doc.get(field), ObjectId):
+            doc[field] = str(doc[field])
+    return doc
@@ -0,0 +1,108 @@
+"""
+Add existing students and experts to the user directory.
+
+Walks each user collection in `_id` order and upserts directory entries in
+bulk batches. The last processed `_id` is stored in the `migrations`
+collection, so an interrupted run resumes where it stopped. Entries written
+by the auth routes in the meantime are refreshed, never duplicated.
+
+Usage (from the server directory):
+    python -m app.db.migrations.backfill_user_directory [--batch-size 500] [--restart]
+"""
+import argparse
+import logging
+from datetime import datetime, timezone
+from pymongo import UpdateOne
+
+from ..mongo import db
+
+logger = logging.getLogger(__name__)
+
+MIGRATION_NAME = "backfill_user_directory"
+DEFAULT_BATCH_SIZE = 500
+USER_COLLECTIONS = {"students": "student", "experts": "expert"}
+
+
+def _progress_id(collection_name: str) -> str:
+    return f"{MIGRATION_NAME}:{collection_name}"
+
+
+def backfill_collection(collection_name: str, role: str, batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """
+    Upsert directory entries for one user collection
+
+    Args:
+        collection_name (str): students or experts
+        role (str): Role recorded in the directory
+        batch_size (int): Number of users per bulk write
+
+    Returns:
+        int: Number of entries added
+    """
+    collection = db[collection_name]
+    progress = db.migrations.find_one({"_id": _progress_id(collection_name)}) or {}
+    if progress.get("completed"):
+        logger.info(f"{collection_name}: already backfilled")
+        return 0
+
+    last_id = progress.get("last_id")
+    added = 0
+
+    while True:
+        query = {"_id": {"$gt": last_id}} if last_id is not None else {}
+        batch = list(
+            collection.find(query, {"email": 1, "password": 1})
+            .sort("_id", 1)
+            .limit(batch_size)
+        )
+        if not batch:
+            break
+
+        operations = [
+            UpdateOne(
+                {"email": user["email"]},
+                {"$set": {"role": role, "user_id": user["_id"], "password": user.get("password")}},
+                upsert=True
+            )
+            for user in batch if user.get("email")
+        ]
+        if operations:
+            result = db.user_directory.bulk_write(operations, ordered=False)
+            added += result.upserted_count
+
+        last_id = batch[-1]["_id"]
+        db.migrations.update_one(
+            {"_id": _progress_id(collection_name)},
+            {"$set": {"last_id": last_id, "updated_at": datetime.now(timezone.utc)}},
+            upsert=True
+        )
+        logger.info(f"{collection_name}: backfilled batch up to {last_id} ({added} added)")
+
+    db.migrations.update_one(
+        {"_id": _progress_id(collection_name)},
+        {"$set": {"completed": True, "updated_at": datetime.now(timezone.utc)}},
+        upsert=True
+    )
+    return added
+
+
+def run(batch_size: int = DEFAULT_BATCH_SIZE, restart: bool = False) -> dict:
+    """Backfill the directory from students and experts"""
+    if restart:
+        db.migrations.delete_many({"_id": {"$regex": f"^{MIGRATION_NAME}:"}})
+
+    results = {}
+    for collection_name, role in USER_COLLECTIONS.items():
+        results[collection_name] = backfill_collection(collection_name, role, batch_size)
+    return results
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    parser = argparse.ArgumentParser(description="Add existing users to the user directory")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--restart", action="store_true", help="Ignore saved progress and start over")
+    args = parser.parse_args()
+
+    print(run(batch_size=args.batch_size, restart=args.restart))
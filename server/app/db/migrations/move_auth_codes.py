@@ -0,0 +1,88 @@
+"""
+Move verification and password reset codes off user documents.
+
+Unexpired codes are copied into the `auth_codes` collection (where a TTL
+index removes them on expiry) and the code fields are unset from every
+student and expert. Users are processed in `_id` order in bulk batches, so
+the migration can be interrupted and run again safely.
+
+Usage (from the server directory):
+    python -m app.db.migrations.move_auth_codes [--batch-size 500]
+"""
+import argparse
+import logging
+from datetime import datetime, timezone
+from pymongo import UpdateOne
+
+from ..mongo import db
+from ..auth_codes import VERIFICATION, PASSWORD_RESET, issue_code, is_expired
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 500
+
+# (purpose, code field, expiry field) as previously stored on user documents
+LEGACY_CODE_FIELDS = (
+    (VERIFICATION, "verification_code", "verification_code_expires"),
+    (PASSWORD_RESET, "reset_code", "reset_code_expires"),
+)
+
+
+def migrate_collection(collection_name: str, role: str, batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """
+    Move legacy codes of one user collection to `auth_codes`
+
+    Args:
+        collection_name (str): students or experts
+        role (str): Role stored with the moved codes
+        batch_size (int): Number of users per bulk write
+
+    Returns:
+        int: Number of codes moved
+    """
+    collection = db[collection_name]
+    fields = [field for _, code_field, expiry_field in LEGACY_CODE_FIELDS for field in (code_field, expiry_field)]
+    query = {"$or": [{field: {"$exists": True}} for field in fields]}
+    projection = {"email": 1, "first_name": 1, **{field: 1 for field in fields}}
+
+    moved = 0
+    while True:
+        # Processed users lose the fields, so every pass starts from the beginning
+        batch = list(collection.find(query, projection).sort("_id", 1).limit(batch_size))
+        if not batch:
+            break
+
+        operations = []
+        for user in batch:
+            for purpose, code_field, expiry_field in LEGACY_CODE_FIELDS:
+                code = user.get(code_field)
+                expires = user.get(expiry_field)
+                if not code or not expires or is_expired({"expires_at": expires}):
+                    continue
+                issue_code(user["email"], purpose, code, expires, role, user["_id"], user.get("first_name", ""))
+                moved += 1
+            operations.append(UpdateOne({"_id": user["_id"]}, {"$unset": {field: "" for field in fields}}))
+
+        collection.bulk_write(operations, ordered=False)
+        logger.info(f"{collection_name}: cleaned {len(operations)} users ({moved} codes moved)")
+
+    return moved
+
+
+def run(batch_size: int = DEFAULT_BATCH_SIZE) -> dict:
+    """Move legacy codes for students and experts"""
+    return {
+        "students": migrate_collection("students", "student", batch_size),
+        "experts": migrate_collection("experts", "expert", batch_size),
+        "finished_at": datetime.now(timezone.utc).isoformat()
+    }
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    parser = argparse.ArgumentParser(description="Move auth codes off user documents")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    print(run(batch_size=args.batch_size))
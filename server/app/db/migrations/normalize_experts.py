@@ -0,0 +1,92 @@
+"""
+Backfill the defaults of expert documents written before write-time
+normalization (see app/db/expert_documents.py).
+
+The migration walks the experts that lack a default in `_id` order and
+stores the missing fields in bulk batches. After every batch the last
+processed `_id` is stored in the `migrations` collection, so an interrupted
+run resumes where it stopped.
+
+Usage (from the server directory):
+    python -m app.db.migrations.normalize_experts [--batch-size 500] [--restart]
+"""
+import argparse
+import logging
+from datetime import datetime, timezone
+from pymongo import UpdateOne
+
+from ..mongo import db
+from ..expert_documents import NEEDS_DEFAULTS, DEFAULTED_FIELDS, expert_defaults, defaults_update
+
+logger = logging.getLogger(__name__)
+
+MIGRATION_NAME = "normalize_experts"
+DEFAULT_BATCH_SIZE = 500
+
+
+def run(batch_size: int = DEFAULT_BATCH_SIZE, restart: bool = False) -> int:
+    """
+    Store the missing defaults of every expert
+
+    Returns:
+        int: Number of experts modified
+    """
+    if restart:
+        db.migrations.delete_one({"_id": MIGRATION_NAME})
+
+    progress = db.migrations.find_one({"_id": MIGRATION_NAME}) or {}
+    if progress.get("completed"):
+        logger.info("experts: already normalized")
+        return 0
+
+    last_id = progress.get("last_id")
+    modified = 0
+
+    while True:
+        query = dict(NEEDS_DEFAULTS)
+        if last_id is not None:
+            query = {"$and": [NEEDS_DEFAULTS, {"_id": {"$gt": last_id}}]}
+
+        batch = list(
+            db.experts.find(query, {field: 1 for field in DEFAULTED_FIELDS})
+            .sort("_id", 1)
+            .limit(batch_size)
+        )
+        if not batch:
+            break
+
+        operations = []
+        for expert in batch:
+            defaults = expert_defaults(expert)
+            if defaults:
+                operations.append(UpdateOne(*defaults_update(expert, defaults)))
+
+        if operations:
+            result = db.experts.bulk_write(operations, ordered=False)
+            modified += result.modified_count
+
+        last_id = batch[-1]["_id"]
+        db.migrations.update_one(
+            {"_id": MIGRATION_NAME},
+            {"$set": {"last_id": last_id, "updated_at": datetime.now(timezone.utc)}},
+            upsert=True
+        )
+        logger.info(f"experts: normalized batch up to {last_id} ({modified} modified)")
+
+    db.migrations.update_one(
+        {"_id": MIGRATION_NAME},
+        {"$set": {"completed": True, "updated_at": datetime.now(timezone.utc)}},
+        upsert=True
+    )
+    return modified
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    parser = argparse.ArgumentParser(description="Store the defaults of existing expert documents")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--restart", action="store_true", help="Ignore saved progress and start over")
+    args = parser.parse_args()
+
+    print(run(batch_size=args.batch_size, restart=args.restart))
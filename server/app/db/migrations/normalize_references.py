@@ -0,0 +1,120 @@
+"""
+Rewrite string references (expert_id, student_id, ...) to ObjectIds.
+
+The migration walks each collection in `_id` order and applies the rewrites
+in bulk batches. After every batch the last processed `_id` is stored in the
+`migrations` collection, so an interrupted run resumes where it stopped.
+
+Usage (from the server directory):
+    python -m app.db.migrations.normalize_references [--batch-size 500] [--restart]
+"""
+import argparse
+import logging
+from datetime import datetime, timezone
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from ..mongo import db
+from ..ids import REFERENCE_FIELDS, to_object_id
+
+logger = logging.getLogger(__name__)
+
+MIGRATION_NAME = "normalize_references"
+DEFAULT_BATCH_SIZE = 500
+
+
+def _progress_id(collection_name: str) -> str:
+    return f"{MIGRATION_NAME}:{collection_name}"
+
+
+def migrate_collection(collection_name: str, fields, batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """
+    Convert string references of one collection to ObjectIds
+
+    Args:
+        collection_name (str): Collection to migrate
+        fields (tuple): Reference fields to convert
+        batch_size (int): Number of documents per bulk write
+
+    Returns:
+        int: Number of documents modified
+    """
+    collection = db[collection_name]
+    progress = db.migrations.find_one({"_id": _progress_id(collection_name)}) or {}
+    if progress.get("completed"):
+        logger.info(f"{collection_name}: already migrated")
+        return 0
+
+    last_id = progress.get("last_id")
+    modified = 0
+
+    # Only documents with at least one string reference need a rewrite
+    string_refs = {"$or": [{field: {"$type": "string"}} for field in fields]}
+
+    while True:
+        query = dict(string_refs)
+        if last_id is not None:
+            query = {"$and": [string_refs, {"_id": {"$gt": last_id}}]}
+
+        batch = list(
+            collection.find(query, {field: 1 for field in fields})
+            .sort("_id", 1)
+            .limit(batch_size)
+        )
+        if not batch:
+            break
+
+        operations = []
+        for doc in batch:
+            updates = {}
+            for field in fields:
+                value = doc.get(field)
+                if isinstance(value, str):
+                    converted = to_object_id(value)
+                    if isinstance(converted, ObjectId):
+                        updates[field] = converted
+            if updates:
+                # Match on the old value so a concurrent write is not overwritten
+                match = {"_id": doc["_id"], **{field: doc[field] for field in updates}}
+                operations.append(UpdateOne(match, {"$set": updates}))
+
+        if operations:
+            result = collection.bulk_write(operations, ordered=False)
+            modified += result.modified_count
+
+        last_id = batch[-1]["_id"]
+        db.migrations.update_one(
+            {"_id": _progress_id(collection_name)},
+            {"$set": {"last_id": last_id, "updated_at": datetime.now(timezone.utc)}},
+            upsert=True
+        )
+        logger.info(f"{collection_name}: migrated batch up to {last_id} ({modified} modified)")
+
+    db.migrations.update_one(
+        {"_id": _progress_id(collection_name)},
+        {"$set": {"completed": True, "updated_at": datetime.now(timezone.utc)}},
+        upsert=True
+    )
+    return modified
+
+
+def run(batch_size: int = DEFAULT_BATCH_SIZE, restart: bool = False) -> dict:
+    """Migrate every collection listed in REFERENCE_FIELDS"""
+    if restart:
+        db.migrations.delete_many({"_id": {"$regex": f"^{MIGRATION_NAME}:"}})
+
+    results = {}
+    for collection_name, fields in REFERENCE_FIELDS.items():
+        results[collection_name] = migrate_collection(collection_name, fields, batch_size)
+    return results
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    parser = argparse.ArgumentParser(description="Convert string references to ObjectIds")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--restart", action="store_true", help="Ignore saved progress and start over")
+    args = parser.parse_args()
+
+    print(run(batch_size=args.batch_size, restart=args.restart))
@@ -2,6 +2,7 @@ import os
 from pymongo import MongoClient
 from dotenv import load_dotenv
 import logging
+from .monitoring import query_monitor
 
 # Load environment variables from .env file
 load_dotenv()
@@ -18,7 +19,7 @@ if not MONGODB_URI or not MONGODB_DB:
 
 try:
     # Create a MongoClient and select the database
-    client = MongoClient(MONGODB_URI)
+    client = MongoClient(MONGODB_URI, event_listeners=[query_monitor])
     db = client[MONGODB_DB]
     
     # Test connection
@@ -30,6 +31,15 @@ try:
     db.students.create_index("email", unique=True)
     db.experts.create_index("email", unique=True)
     
+    # User directory: one entry per email across students and experts
+    db.user_directory.create_index("email", unique=True)
+    
+    # Shared rate limit counters expire two windows after they start
+    db.rate_limits.create_index("expires_at", expireAfterSeconds=0)
+    
+    # Expert search index refreshes load experts by updated_at
+    db.experts.create_index("updated_at")
+    
     # Verification token indexes
     db.students.create_index("verification_token")
     db.experts.create_index("verification_token")
@@ -43,6 +53,34 @@ try:
     db.sessions.create_index("student_id")
     db.sessions.create_index("date")
     
+    # Message indexes (timestamp is also used by the archive job)
+    db.messages.create_index([("conversation_id", 1), ("timestamp", -1)])
+    db.messages.create_index("timestamp")
+    
+    # Archive indexes
+    db.sessions_archive.create_index([("expert_id", 1), ("date", -1)])
+    db.sessions_archive.create_index([("student_id", 1), ("date", -1)])
+    db.messages_archive.create_index([("conversation_id", 1), ("timestamp", -1)])
+    
+    # Auth code indexes: one code per email and purpose, removed by MongoDB
+    # as soon as it expires
+    db.auth_codes.create_index([("email", 1), ("purpose", 1)], unique=True)
+    db.auth_codes.create_index("expires_at", expireAfterSeconds=0)
+    
+    # Revoked token indexes, entries are dropped once the tokens expire
+    db.revoked_tokens.create_index("expires_at", expireAfterSeconds=0)
+    db.revoked_tokens.create_index("created_at")
+    
+    # Email outbox: due messages are claimed in next_attempt_at order,
+    # delivered and failed messages are dropped after their retention
+    db.email_outbox.create_index([("status", 1), ("next_attempt_at", 1)])
+    db.email_outbox.create_index("expire_at", expireAfterSeconds=0)
+    
+    # Notification events: pending events are grouped per recipient by the
+    # digest job, digested events are dropped after their retention
+    db.notification_events.create_index([("digested_at", 1), ("created_at", 1)])
+    db.notification_events.create_index("expire_at", expireAfterSeconds=0)
+    
     # Review indexes
     db.reviews.create_index("expert_id")
     db.reviews.create_index("session_id", unique=True, sparse=True)
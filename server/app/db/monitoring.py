@@ -0,0 +1,181 @@
+import os
+import time
+import logging
+import threading
+from contextvars import ContextVar
+from collections import defaultdict
+from typing import Optional
+from pymongo import monitoring
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Number of `_id` lookups against one collection in a single request before
+# the request is flagged as a likely N+1 pattern
+REPEATED_LOOKUP_THRESHOLD = int(os.getenv("QUERY_REPEATED_LOOKUP_THRESHOLD", 3))
+
+# Return each request's database statistics as X-DB-* response headers
+QUERY_STATS_HEADERS = os.getenv("QUERY_STATS_HEADERS", "false").lower() == "true"
+
+# Commands that are not issued by application code (handshakes, heartbeats...)
+IGNORED_COMMANDS = {"hello", "ismaster", "isMaster", "ping", "saslStart", "saslContinue", "endSessions", "buildInfo"}
+
+
+class RequestQueryStats:
+    """Database commands issued while serving a single request"""
+
+    def __init__(self):
+        self.command_count = 0
+        self.total_duration_ms = 0.0
+        self.collections = defaultdict(int)
+        self.id_lookups = defaultdict(int)
+
+    def record(self, collection: str, duration_ms: float, by_id: bool):
+        self.command_count += 1
+        self.total_duration_ms += duration_ms
+        if collection:
+            self.collections[collection] += 1
+            if by_id:
+                self.id_lookups[collection] += 1
+
+    def repeated_lookups(self, threshold: int = REPEATED_LOOKUP_THRESHOLD) -> dict:
+        """Collections queried by `_id` more than `threshold` times"""
+        return {name: count for name, count in self.id_lookups.items() if count > threshold}
+
+    def to_dict(self) -> dict:
+        return {
+            "command_count": self.command_count,
+            "total_duration_ms": round(self.total_duration_ms, 3),
+            "collections": dict(self.collections),
+            "repeated_lookups": self.repeated_lookups()
+        }
+
+
+# Stats for the request currently being served (None outside a request)
+current_query_stats: ContextVar[Optional[RequestQueryStats]] = ContextVar("current_query_stats", default=None)
+
+
+def start_request_stats() -> RequestQueryStats:
+    """Attach a fresh stats collector to the current request context"""
+    stats = RequestQueryStats()
+    current_query_stats.set(stats)
+    return stats
+
+
+def _is_id_lookup(command_name: str, command: dict) -> bool:
+    """Check whether a command targets documents by `_id`"""
+    if command_name == "find":
+        query = command.get("filter") or {}
+    elif command_name in ("update", "delete"):
+        statements = command.get("updates") or command.get("deletes") or []
+        query = statements[0].get("q", {}) if len(statements) == 1 else {}
+    elif command_name == "findAndModify":
+        query = command.get("query") or {}
+    else:
+        return False
+    return "_id" in query
+
+
+class QueryMonitor(monitoring.CommandListener):
+    """
+    Command listener that attributes every MongoDB command to the current request
+    and keeps process-wide totals for the metrics endpoint
+    """
+
+    def __init__(self):
+        self._pending = {}
+        self._lock = threading.Lock()
+        self.totals = defaultdict(lambda: {"count": 0, "duration_ms": 0.0, "failures": 0})
+        self.requests = 0
+        self.flagged_requests = 0
+
+    def started(self, event):
+        if event.command_name in IGNORED_COMMANDS:
+            return
+        collection = event.command.get(event.command_name)
+        if not isinstance(collection, str):
+            collection = ""
+        by_id = _is_id_lookup(event.command_name, event.command)
+        with self._lock:
+            self._pending[(event.connection_id, event.request_id)] = (
+                current_query_stats.get(), event.command_name, collection, by_id
+            )
+
+    def succeeded(self, event):
+        self._finish(event, failed=False)
+
+    def failed(self, event):
+        self._finish(event, failed=True)
+
+    def _finish(self, event, failed: bool):
+        with self._lock:
+            pending = self._pending.pop((event.connection_id, event.request_id), None)
+            if pending is None:
+                return
+            stats, command_name, collection, by_id = pending
+            duration_ms = event.duration_micros / 1000
+            key = f"{collection}.{command_name}" if collection else command_name
+            self.totals[key]["count"] += 1
+            self.totals[key]["duration_ms"] += duration_ms
+            if failed:
+                self.totals[key]["failures"] += 1
+        if stats is not None:
+            stats.record(collection, duration_ms, by_id)
+
+    def finish_request(self, stats: RequestQueryStats, path: str):
+        """Account for a finished request and log repeated `_id` lookups"""
+        repeated = stats.repeated_lookups()
+        with self._lock:
+            self.requests += 1
+            if repeated:
+                self.flagged_requests += 1
+        if repeated:
+            logger.warning(f"Repeated _id lookups on {path}: {repeated}")
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            commands = {
+                key: {
+                    "count": value["count"],
+                    "duration_ms": round(value["duration_ms"], 3),
+                    "failures": value["failures"]
+                }
+                for key, value in self.totals.items()
+            }
+            return {
+                "requests": self.requests,
+                "flagged_requests": self.flagged_requests,
+                "repeated_lookup_threshold": REPEATED_LOOKUP_THRESHOLD,
+                "commands": commands
+            }
+
+
+query_monitor = QueryMonitor()
+
+
+async def query_stats_middleware(request, call_next):
+    """
+    Collect per-request database statistics.
+
+    With QUERY_STATS_HEADERS=true the numbers are also returned as response
+    headers so they show up directly in the browser's network tab.
+    """
+    stats = start_request_stats()
+    started = time.perf_counter()
+    response = await call_next(request)
+    query_monitor.finish_request(stats, request.url.path)
+
+    if QUERY_STATS_HEADERS:
+        response.headers["X-DB-Query-Count"] = str(stats.command_count)
+        response.headers["X-DB-Query-Time-Ms"] = f"{stats.total_duration_ms:.3f}"
+        response.headers["X-DB-Collections"] = ",".join(
+            f"{name}={count}" for name, count in stats.collections.items()
+        )
+        response.headers["X-Request-Time-Ms"] = f"{(time.perf_counter() - started) * 1000:.3f}"
+        repeated = stats.repeated_lookups()
+        if repeated:
+            response.headers["X-DB-Repeated-Lookups"] = ",".join(
+                f"{name}={count}" for name, count in repeated.items()
+            )
+
+    return response
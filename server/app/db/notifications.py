@@ -0,0 +1,104 @@
+"""
+Notification events waiting to be sent as a digest.
+
+Routes record an event per recipient (session booked, new message, new
+review) instead of emailing right away. The digest job in
+app/utils/digest.py groups pending events per recipient and sends one
+email per recipient once their digest window has passed.
+
+Digested events are removed by the TTL index on `expire_at`.
+"""
+import os
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+from bson import ObjectId
+
+from .mongo import db
+from .ids import to_object_id
+
+# Event kinds
+SESSION_BOOKED = "session_booked"
+NEW_MESSAGE = "new_message"
+NEW_REVIEW = "new_review"
+
+# Digest schedules and their window in seconds
+DIGEST_SCHEDULES = {
+    "instant": 0,
+    "hourly": 3600,
+    "daily": 86400
+}
+DEFAULT_DIGEST_SCHEDULE = os.getenv("NOTIFICATION_DIGEST_DEFAULT", "hourly")
+NOTIFICATION_RETENTION_DAYS = int(os.getenv("NOTIFICATION_RETENTION_DAYS", 7))
+
+notification_events = db.notification_events
+
+
+def record_event(recipient_role: str, recipient_id, kind: str, payload: dict) -> None:
+    """
+    Record a notification for the next digest of a user
+
+    Args:
+        recipient_role (str): student or expert
+        recipient_id: ObjectId or hex string of the recipient
+        kind (str): SESSION_BOOKED, NEW_MESSAGE or NEW_REVIEW
+        payload (dict): Details shown in the digest
+    """
+    notification_events.insert_one({
+        "recipient_role": recipient_role,
+        "recipient_id": to_object_id(recipient_id),
+        "kind": kind,
+        "payload": payload,
+        "created_at": datetime.now(timezone.utc),
+        "digested_at": None
+    })
+
+
+def pending_by_recipient(limit: Optional[int] = None) -> List[dict]:
+    """
+    Group undigested events per recipient, oldest group first
+
+    Returns:
+        list: {"_id": {"role", "recipient_id"}, "first_at", "events"} per recipient
+    """
+    pipeline = [
+        {"$match": {"digested_at": None}},
+        {"$sort": {"created_at": 1}},
+        {"$group": {
+            "_id": {"role": "$recipient_role", "recipient_id": "$recipient_id"},
+            "first_at": {"$first": "$created_at"},
+            "events": {"$push": {"_id": "$_id", "kind": "$kind", "payload": "$payload", "created_at": "$created_at"}}
+        }},
+        {"$sort": {"first_at": 1}}
+    ]
+    if limit is not None:
+        pipeline.append({"$limit": limit})
+    return list(notification_events.aggregate(pipeline, allowDiskUse=True))
+
+
+def mark_digested(event_ids: List[ObjectId]) -> None:
+    """Mark events as sent (or skipped) so they leave the pending set"""
+    if not event_ids:
+        return
+    now = datetime.now(timezone.utc)
+    notification_events.update_many(
+        {"_id": {"$in": event_ids}},
+        {"$set": {
+            "digested_at": now,
+            "expire_at": now + timedelta(days=NOTIFICATION_RETENTION_DAYS)
+        }}
+    )
+
+
+def digest_window(notification_settings: Optional[dict]) -> Optional[timedelta]:
+    """
+    Get the digest window of a user
+
+    Returns:
+        timedelta: How long events are collected, or None if the user turned
+        email notifications off
+    """
+    settings = notification_settings or {}
+    if not settings.get("email_notifications", True):
+        return None
+    schedule = settings.get("digest_schedule", DEFAULT_DIGEST_SCHEDULE)
+    return timedelta(seconds=DIGEST_SCHEDULES.get(schedule, DIGEST_SCHEDULES[DEFAULT_DIGEST_SCHEDULE]))
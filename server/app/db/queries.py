@@ -0,0 +1,97 @@
+import os
+from typing import List, Optional
+
+from .mongo import db
+from .ids import stringify_refs
+from .archive import sessions_archive
+
+# Largest page of GET /sessions
+SESSION_PAGE_MAX_LIMIT = int(os.getenv("SESSION_PAGE_MAX_LIMIT", 100))
+
+
+def _participant_lookup(collection: str, local_field: str, alias: str) -> dict:
+    """
+    $lookup stage joining a participant by `_id`.
+
+    `$convert` lets the join work for references stored either as strings or
+    as ObjectIds while the reference migration is in progress.
+    """
+    return {
+        "$lookup": {
+            "from": collection,
+            "let": {"ref": f"${local_field}"},
+            "pipeline": [
+                {"$match": {"$expr": {"$eq": [
+                    "$_id",
+                    {"$convert": {"input": "$$ref", "to": "objectId", "onError": None, "onNull": None}}
+                ]}}},
+                {"$project": {"first_name": 1, "last_name": 1, "profile_image": 1}}
+            ],
+            "as": alias
+        }
+    }
+
+
+def _aggregate_sessions(collection, query: dict, skip: int = 0, limit: Optional[int] = None) -> List[dict]:
+    pipeline = [
+        {"$match": query},
+        {"$sort": {"date": -1}},
+    ]
+    if skip:
+        pipeline.append({"$skip": skip})
+    if limit is not None:
+        pipeline.append({"$limit": limit})
+    pipeline += [
+        _participant_lookup("experts", "expert_id", "expert"),
+        _participant_lookup("students", "student_id", "student"),
+    ]
+
+    sessions = []
+    for session in collection.aggregate(pipeline):
+        session["id"] = str(session["_id"])
+        stringify_refs(session)
+
+        expert = session.pop("expert", [])
+        if expert:
+            session["expert_name"] = f"{expert[0]['first_name']} {expert[0]['last_name']}"
+            session["expert_profile_image"] = expert[0].get("profile_image")
+
+        student = session.pop("student", [])
+        if student:
+            session["student_name"] = f"{student[0]['first_name']} {student[0]['last_name']}"
+            session["student_profile_image"] = student[0].get("profile_image")
+
+        sessions.append(session)
+
+    return sessions
+
+
+def find_sessions_with_participants(query: dict, skip: int = 0, limit: Optional[int] = None) -> List[dict]:
+    """
+    Find sessions joined with their expert and student in one aggregation
+
+    Args:
+        query (dict): Session filter
+        skip (int): Number of sessions to skip
+        limit (int, optional): Page size. When a page reaches past the
+            sessions in the hot collection it is filled from the archive.
+
+    Returns:
+        list: Sessions sorted by date (newest first) with expert/student
+        names and profile images filled in
+
+    Raises:
+        ValueError: If skip is negative or limit is below 1
+    """
+    if skip < 0 or (limit is not None and limit < 1):
+        raise ValueError("skip must be >= 0 and limit >= 1")
+
+    sessions = _aggregate_sessions(db.sessions, query, skip, limit)
+    if limit is None or len(sessions) == limit:
+        return sessions
+
+    # The page runs past the recent sessions, continue in the archive
+    hot_count = len(sessions) + skip if sessions else db.sessions.count_documents(query)
+    archive_skip = max(0, skip - hot_count)
+    sessions.extend(_aggregate_sessions(sessions_archive, query, archive_skip, limit - len(sessions)))
+    return sessions
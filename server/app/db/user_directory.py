@@ -0,0 +1,124 @@
+"""
+Unified user directory.
+
+Maps every email to the role, `_id` and password hash of its student or
+expert document, so auth flows resolve a user with one indexed lookup
+instead of probing `students` and then `experts`. The unique email index
+also enforces email uniqueness across both collections.
+
+Entries are written by the auth and profile routes. Existing users are
+added by app/db/migrations/backfill_user_directory.py.
+"""
+import os
+from typing import Optional, Tuple
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+from .mongo import db
+
+# Until the backfill has run, fall back to the user collections on a miss
+USER_DIRECTORY_FALLBACK = os.getenv("USER_DIRECTORY_FALLBACK", "true").lower() == "true"
+
+
+def collection_for(role: str):
+    """Get the user collection for a role"""
+    return db.students if role == "student" else db.experts
+
+
+def add_entry(email: str, role: str, user_id: ObjectId, password: str) -> None:
+    """
+    Add a user to the directory
+
+    Raises:
+        pymongo.errors.DuplicateKeyError: If the email is already registered
+    """
+    db.user_directory.insert_one({
+        "email": email,
+        "role": role,
+        "user_id": user_id,
+        "password": password
+    })
+
+
+def upsert_entry(email: str, role: str, user_id: ObjectId, password: Optional[str]) -> None:
+    """Add or refresh a directory entry from a user document"""
+    db.user_directory.update_one(
+        {"email": email},
+        {"$set": {"role": role, "user_id": user_id, "password": password}},
+        upsert=True
+    )
+
+
+def set_password(email: str, password: str) -> None:
+    """Keep the directory password hash in sync with the user document"""
+    db.user_directory.update_one({"email": email}, {"$set": {"password": password}})
+
+
+def change_email(old_email: str, new_email: str) -> None:
+    """
+    Move a directory entry to a new email
+
+    Call it before writing the new email to the user document: the unique
+    email index rejects an email taken by any student or expert.
+
+    Raises:
+        pymongo.errors.DuplicateKeyError: If the new email is already registered
+    """
+    # Resolve both emails first so users not yet backfilled are accounted for
+    if lookup(new_email) is not None:
+        raise DuplicateKeyError(f"Email already registered: {new_email}")
+    lookup(old_email)
+    db.user_directory.update_one({"email": old_email}, {"$set": {"email": new_email}})
+
+
+def revert_email_change(old_email: str, new_email: str) -> None:
+    """Move a directory entry back after the user document kept `old_email`"""
+    db.user_directory.update_one({"email": new_email}, {"$set": {"email": old_email}})
+
+
+def remove_entry(email: str) -> None:
+    """Remove a user from the directory"""
+    db.user_directory.delete_one({"email": email})
+
+
+def lookup(email: str) -> Optional[dict]:
+    """
+    Get the directory entry for an email
+
+    Args:
+        email (str): User email
+
+    Returns:
+        dict: Entry with role, user_id and password, or None if not registered
+    """
+    entry = db.user_directory.find_one({"email": email})
+    if entry is not None or not USER_DIRECTORY_FALLBACK:
+        return entry
+
+    # Not backfilled yet: resolve from the user collections and remember it
+    for role, collection in (("student", db.students), ("expert", db.experts)):
+        user = collection.find_one({"email": email}, {"password": 1})
+        if user:
+            upsert_entry(email, role, user["_id"], user.get("password"))
+            return {"email": email, "role": role, "user_id": user["_id"], "password": user.get("password")}
+    return None
+
+
+def find_user(email: str, projection: Optional[dict] = None) -> Tuple[Optional[str], Optional[dict]]:
+    """
+    Resolve the user document for an email
+
+    Args:
+        email (str): User email
+        projection (dict, optional): Fields to load from the user document
+
+    Returns:
+        tuple: (role, user document), or (None, None) if not registered
+    """
+    entry = lookup(email)
+    if entry is None:
+        return None, None
+    user = collection_for(entry["role"]).find_one({"_id": entry["user_id"]}, projection)
+    if user is None:
+        return None, None
+    return entry["role"], user
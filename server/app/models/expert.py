@@ -55,6 +55,24 @@ class ExpertSearchResult(BaseModel):
     languages: List[str] = Field(default_factory=lambda: ["English"])
     experience_years: int = 0
     completed_sessions: int = 0
+    relevance: Optional[float] = None
+
+class RateBucketCount(BaseModel):
+    min_rate: float
+    max_rate: Optional[float] = None
+    count: int
+
+class ExpertFacets(BaseModel):
+    total: int
+    tags: Dict[str, int] = Field(default_factory=dict)
+    languages: Dict[str, int] = Field(default_factory=dict)
+    specialties: Dict[str, int] = Field(default_factory=dict)
+    rate_buckets: List[RateBucketCount] = Field(default_factory=list)
+
+class ExpertSuggestion(BaseModel):
+    value: str
+    kind: str
+    count: int
 
 class ExpertProfile(ExpertSearchResult):
     education: Optional[str] = "Bachelor's Degree"
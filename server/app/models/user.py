@@ -54,6 +54,13 @@ class TokenData(BaseModel):
     email: Optional[str] = None
     role: Optional[str] = None
     exp: Optional[datetime] = None
+    jti: Optional[str] = None
+    iat: Optional[float] = None
+    token_type: Optional[str] = None
+    user_id: Optional[str] = None
+    is_verified: Optional[bool] = None
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
 
 class Token(BaseModel):
     access_token: str
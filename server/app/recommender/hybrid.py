@@ -1,4 +1,5 @@
 from ..db.mongo import db
+from ..db.ids import ref_filter
 from statistics import mean
 from typing import List, Dict, Tuple
 from sklearn.feature_extraction.text import TfidfVectorizer
@@ -107,9 +108,9 @@ class Student:
         self.bio = doc.get("bio", "")
 
         # Dynamically build a tutor_id -> rating dictionary from reviews
-        review_docs = list(db.reviews.find({"student_id": self.id}))
+        review_docs = list(db.reviews.find({"student_id": ref_filter(self.id)}))
         self.ratings = {
-            review["expert_id"]: review["rating"]
+            str(review["expert_id"]): review["rating"]
             for review in review_docs
             if "rating" in review and "expert_id" in review
         }
@@ -128,7 +129,7 @@ class Tutor:
         self.sessions_completed = doc.get("completed_sessions", 0)
 
         # Load ratings from reviews collection
-        reviews = list(db.reviews.find({"expert_id": self.id}))
+        reviews = list(db.reviews.find({"expert_id": ref_filter(self.id)}))
         self.ratings = [review["rating"] for review in reviews if "rating" in review]
         self.avg_rating = round(mean(self.ratings), 2) if self.ratings else 0.0
 
@@ -6,35 +6,46 @@ from bson import ObjectId
 import os
 import logging
 import secrets
-import bcrypt
 import string
 import uuid
 import traceback
-import requests
 
 from ..models.user import UserCreate, Token, PasswordReset, VerifyEmail, ResetPassword, UserLogin
 from ..models.student import StudentCreate
 from ..models.expert import ExpertCreate
 from ..utils.hash import (
-    hash_password, 
-    verify_password, 
+    hash_password_async,
+    verify_password_async,
+    needs_rehash,
     generate_verification_code,
     get_verification_code_expiry,
     get_password_reset_code_expiry
 )
-from ..utils.JWTtoken import create_access_token, create_refresh_token, verify_token
+from ..utils.JWTtoken import (
+    create_access_token, create_refresh_token, verify_token, user_claims, REFRESH_TOKEN_TYPE
+)
 from ..utils.email import (
     send_verification_code_email, 
     send_password_reset_code_email,
     send_welcome_email
 )
-from ..utils.auth import get_current_user, get_current_active_user, get_current_user_from_cookie
+from ..utils.auth import (
+    get_current_user, get_current_active_user, get_current_user_from_cookie, invalidate_user, oauth2_scheme,
+    is_token_revoked
+)
+from ..utils.revocation import revocation_list, revoke_user_tokens
+from ..utils.oauth import oauth
+from ..utils.rate_limit import enforce_rate_limit, login_ip_limiter, login_email_limiter, email_ip_limiter, email_address_limiter
 from ..db.mongo import db
+from ..db.user_directory import lookup, find_user, collection_for, add_entry, remove_entry, set_password
+from ..db.expert_documents import expert_defaults
+from ..db.expert_search import expert_search_index
+from ..db.auth_codes import VERIFICATION, PASSWORD_RESET, issue_code, find_code, delete_code, is_expired
 from fastapi.responses import RedirectResponse, JSONResponse
-from authlib.integrations.starlette_client import OAuth
 from starlette.config import Config
 from starlette.middleware.sessions import SessionMiddleware
 from jose import jwt, ExpiredSignatureError, JWTError
+from pymongo.errors import DuplicateKeyError
 from dotenv import load_dotenv
 router = APIRouter(
     prefix="/api/auth",
@@ -51,18 +62,6 @@ ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 1440)
 # Setup logging
 logger = logging.getLogger(__name__)
 
-oauth = OAuth()
-oauth.register(
-    name="google",
-    client_id=os.getenv("GOOGLE_CLIENT_ID"),
-    client_secret=os.getenv("GOOGLE_CLIENT_SECRET"),
-    server_metadata_url="https://accounts.google.com/.well-known/openid-configuration",
-    client_kwargs={"scope": "openid email profile"},
-    authorize_params={"access_type": "offline", "prompt": "consent"},
-    authorize_state=os.getenv("FASTAPI_SECRET_KEY"),
-    # Make sure this matches the route you're handling callbacks on
-    redirect_uri=os.getenv("REDIRECT_URL", "http://127.0.0.1:8000/api/auth"),
-)
 # JWT Configurations
 SECRET_KEY = os.getenv("JWT_SECRET_KEY")
 ALGORITHM = "HS256"
@@ -74,7 +73,19 @@ async def register_student(student: UserCreate):
     """
     try:
         # Check if email already exists
-        if db.students.find_one({"email": student.email}) or db.experts.find_one({"email": student.email}):
+        if lookup(student.email):
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Email already registered"
+            )
+        
+        # Reserve the email in the user directory; the unique index rejects
+        # concurrent registrations of the same email
+        student_id = ObjectId()
+        password_hash = await hash_password_async(student.password)
+        try:
+            add_entry(student.email, "student", student_id, password_hash)
+        except DuplicateKeyError:
             raise HTTPException(
                 status_code=status.HTTP_409_CONFLICT,
                 detail="Email already registered"
@@ -85,20 +96,34 @@ async def register_student(student: UserCreate):
         
         # Prepare student data
         student_data = {
+            "_id": student_id,
             "email": student.email,
             "first_name": student.first_name,
             "last_name": student.last_name,
-            "password": hash_password(student.password),
+            "password": password_hash,
             "role": "student",
             "is_verified": False,
-            "verification_code": verification_code,
-            "verification_code_expires": get_verification_code_expiry(),
             "created_at": datetime.now(timezone.utc),
             "receive_updates": student.receive_updates
         }
         
         # Insert student into database
-        result = db.students.insert_one(student_data)
+        try:
+            result = db.students.insert_one(student_data)
+        except Exception:
+            remove_entry(student.email)
+            raise
+        
+        # Store the verification code
+        issue_code(
+            student.email,
+            VERIFICATION,
+            verification_code,
+            get_verification_code_expiry(),
+            "student",
+            result.inserted_id,
+            student.first_name
+        )
         
         # Send verification email
         send_verification_code_email(
@@ -130,7 +155,19 @@ async def register_expert(expert: UserCreate):
     """
     try:
         # Check if email already exists
-        if db.students.find_one({"email": expert.email}) or db.experts.find_one({"email": expert.email}):
+        if lookup(expert.email):
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Email already registered"
+            )
+        
+        # Reserve the email in the user directory; the unique index rejects
+        # concurrent registrations of the same email
+        expert_id = ObjectId()
+        password_hash = await hash_password_async(expert.password)
+        try:
+            add_entry(expert.email, "expert", expert_id, password_hash)
+        except DuplicateKeyError:
             raise HTTPException(
                 status_code=status.HTTP_409_CONFLICT,
                 detail="Email already registered"
@@ -141,16 +178,15 @@ async def register_expert(expert: UserCreate):
         
         # Prepare expert data
         expert_data = {
+            "_id": expert_id,
             "email": expert.email,
             "first_name": expert.first_name,
             "last_name": expert.last_name,
-            "password": hash_password(expert.password),
+            "password": password_hash,
             "role": "expert",
             "is_verified": False,
             "is_approved": False,
             "approval_status": "pending",
-            "verification_code": verification_code,
-            "verification_code_expires": get_verification_code_expiry(),
             "created_at": datetime.now(timezone.utc),
             "specialty": expert.specialty if hasattr(expert, 'specialty') else None,
             "hourly_rate": 45.0,  # Default hourly rate
@@ -158,9 +194,25 @@ async def register_expert(expert: UserCreate):
             "reviews_count": 0,
             "receive_updates": expert.receive_updates
         }
+        expert_data.update(expert_defaults(expert_data))
         
         # Insert expert into database
-        result = db.experts.insert_one(expert_data)
+        try:
+            result = db.experts.insert_one(expert_data)
+        except Exception:
+            remove_entry(expert.email)
+            raise
+        
+        # Store the verification code
+        issue_code(
+            expert.email,
+            VERIFICATION,
+            verification_code,
+            get_verification_code_expiry(),
+            "expert",
+            result.inserted_id,
+            expert.first_name
+        )
         
         # Send verification email
         send_verification_code_email(
@@ -191,57 +243,56 @@ async def verify_email(verify_data: VerifyEmail):
     Verify email with verification code
     """
     try:
-        # Check if user exists in students collection
-        user = db.students.find_one({"email": verify_data.email})
-        collection = db.students
-        role = "student"
+        # Look up the pending verification code
+        code_doc = find_code(verify_data.email, VERIFICATION)
         
-        # If not found in students, check experts
-        if not user:
-            user = db.experts.find_one({"email": verify_data.email})
-            collection = db.experts
-            role = "expert"
-        
-        if not user:
+        if not code_doc:
+            # No pending code: the user is either unknown or already verified
+            _, user = find_user(verify_data.email, {"is_verified": 1})
+            if not user:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="User not found"
+                )
+            if user.get("is_verified", False):
+                return {"message": "Email already verified"}
             raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="User not found"
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Verification code expired"
             )
         
-        # Check if already verified
-        if user.get("is_verified", False):
-            return {"message": "Email already verified"}
-        
         # Check verification code
-        if user.get("verification_code") != verify_data.verification_code:
+        if code_doc.get("code") != verify_data.verification_code:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Invalid verification code"
             )
         
         # Check if code is expired
-        expires = user.get("verification_code_expires")
-        if expires:
-            # Ensure both datetimes are timezone-aware
-            now = datetime.now(timezone.utc)
-            # If expires doesn't have timezone info, add UTC timezone
-            if expires.tzinfo is None:
-                expires = expires.replace(tzinfo=timezone.utc)
-                
-            if expires < now:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Verification code expired"
-                )
+        if is_expired(code_doc):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Verification code expired"
+            )
         
         # Update user as verified
-        collection.update_one(
-            {"_id": user["_id"]},
-            {
-                "$set": {"is_verified": True},
-                "$unset": {"verification_code": "", "verification_code_expires": ""}
-            }
+        role = code_doc["role"]
+        collection = db.students if role == "student" else db.experts
+        user = collection.find_one_and_update(
+            {"_id": code_doc["user_id"]},
+            {"$set": {"is_verified": True, "updated_at": datetime.now(timezone.utc)}},
+            projection={"first_name": 1, "last_name": 1}
         )
+        delete_code(verify_data.email, VERIFICATION)
+        invalidate_user(role, verify_data.email)
+        if role == "expert":
+            expert_search_index.expert_changed()
+        
+        if not user:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="User not found"
+            )
         
         # Send welcome email
         send_welcome_email(
@@ -262,48 +313,54 @@ async def verify_email(verify_data: VerifyEmail):
         )
 
 @router.post("/resend-verification", response_model=dict)
-async def resend_verification(email_data: PasswordReset):
+async def resend_verification(email_data: PasswordReset, request: Request):
     """
     Resend verification code
     """
+    enforce_rate_limit(request, email_data.email, email_ip_limiter, email_address_limiter)
     try:
-        # Check if user exists in students collection
-        user = db.students.find_one({"email": email_data.email})
-        collection = db.students
-        
-        # If not found in students, check experts
-        if not user:
-            user = db.experts.find_one({"email": email_data.email})
-            collection = db.experts
-        
-        if not user:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="User not found"
-            )
-        
-        # Check if already verified
-        if user.get("is_verified", False):
-            return {"message": "Email already verified"}
+        # A pending code means the user exists and is not verified yet
+        code_doc = find_code(email_data.email, VERIFICATION)
+        
+        if code_doc:
+            role = code_doc["role"]
+            user_id = code_doc["user_id"]
+            first_name = code_doc.get("first_name", "")
+        else:
+            # The previous code expired, resolve the user from the directory
+            role, user = find_user(email_data.email, {"first_name": 1, "is_verified": 1})
+            
+            if not user:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="User not found"
+                )
+            
+            # Check if already verified
+            if user.get("is_verified", False):
+                return {"message": "Email already verified"}
+            
+            user_id = user["_id"]
+            first_name = user["first_name"]
         
         # Generate new verification code
         verification_code = generate_verification_code()
         
-        # Update user with new verification code
-        collection.update_one(
-            {"_id": user["_id"]},
-            {
-                "$set": {
-                    "verification_code": verification_code,
-                    "verification_code_expires": get_verification_code_expiry()
-                }
-            }
+        # Store the new verification code
+        issue_code(
+            email_data.email,
+            VERIFICATION,
+            verification_code,
+            get_verification_code_expiry(),
+            role,
+            user_id,
+            first_name
         )
         
         # Send verification email
         send_verification_code_email(
             email_data.email,
-            user["first_name"],
+            first_name,
             verification_code
         )
         
@@ -321,60 +378,54 @@ async def resend_verification(email_data: PasswordReset):
             detail=f"An error occurred while resending verification code: {str(e)}"
         )
 
-@router.post("/login", response_model=Token)
-async def login(response: Response, form_data: OAuth2PasswordRequestForm = Depends()):
-    # Find user in database
-    student = db.students.find_one({"email": form_data.username})
-    if student and verify_password(form_data.password, student["password"]):
-        user_data = {
-            "sub": student["email"],
-            "role": "student"
-        }
-        access_token = create_access_token(user_data)
-        
-        # Set cookie
-        response.set_cookie(
-            key="access_token",
-            value=access_token,
-            httponly=True,
-            max_age=7 * 24 * 60 * 60,  # 7 days
-            path="/",
-            samesite="lax",
-            secure=False  # Set to True in production with HTTPS
+async def upgrade_password_hash(collection, user: dict, password: str):
+    """
+    Re-hash a password created with an outdated bcrypt cost.
+
+    Only possible right after a successful login, while the plain password
+    is known.
+    """
+    if needs_rehash(user["password"]):
+        password_hash = await hash_password_async(password)
+        result = collection.update_one(
+            {"_id": user["_id"], "password": user["password"]},
+            {"$set": {"password": password_hash}}
         )
-        
-        return {
-            "access_token": access_token,
-            "token_type": "bearer",
-            "role": "student",
-            "is_verified": student.get("is_verified", False)
-        }
+        if result.modified_count:
+            set_password(user["email"], password_hash)
+
+@router.post("/login", response_model=Token)
+async def login(request: Request, response: Response, form_data: OAuth2PasswordRequestForm = Depends()):
+    enforce_rate_limit(request, form_data.username, login_ip_limiter, login_email_limiter)
     
-    expert = db.experts.find_one({"email": form_data.username})
-    if expert and verify_password(form_data.password, expert["password"]):
-        user_data = {
-            "sub": expert["email"],
-            "role": "expert"
-        }
-        access_token = create_access_token(user_data)
-        
-        # Set cookie
-        response.set_cookie(
-            key="access_token",
-            value=access_token,
-            httponly=True,
-            max_age=7 * 24 * 60 * 60,  # 7 days
-            path="/",
-            samesite="lax",
-            secure=False  # Set to True in production with HTTPS
-        )
-        
-        return {
-            "access_token": access_token,
-            "token_type": "bearer",
-            "role": "expert",
-            "is_verified": expert.get("is_verified", False)
-        }
+    # Resolve the user from the directory
+    entry = lookup(form_data.username)
+    if entry and entry.get("password") and await verify_password_async(form_data.password, entry["password"]):
+        role = entry["role"]
+        collection = collection_for(role)
+        user = collection.find_one({"_id": entry["user_id"]})
+        if user:
+            await upgrade_password_hash(collection, user, form_data.password)
+            user_data = user_claims(user, role)
+            access_token = create_access_token(user_data)
+            
+            # Set cookie
+            response.set_cookie(
+                key="access_token",
+                value=access_token,
+                httponly=True,
+                max_age=7 * 24 * 60 * 60,  # 7 days
+                path="/",
+                samesite="lax",
+                secure=False  # Set to True in production with HTTPS
+            )
+            
+            return {
+                "access_token": access_token,
+                "token_type": "bearer",
+                "role": role,
+                "is_verified": user.get("is_verified", False)
+            }
     
     raise HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -383,29 +434,30 @@ async def login(response: Response, form_data: OAuth2PasswordRequestForm = Depen
     )
 
 @router.post("/logout")
-async def logout(current_user: dict = Depends(get_current_user)):
+async def logout(
+    token: str = Depends(oauth2_scheme),
+    current_user: dict = Depends(get_current_user)
+):
     """
     Logout user
     
-    This endpoint doesn't actually do anything on the server since JWT tokens are stateless,
-    but it's included for completeness. The client should delete the token.
+    The token is added to the revocation list so it can't be used again.
+    The client should still delete the token.
     """
+    token_data = verify_token(token)
+    if token_data and token_data.jti:
+        revocation_list.revoke_token(token_data.jti, token_data.exp)
     return {"message": "Successfully logged out"}
 
 @router.post("/forgot-password")
-async def forgot_password(reset_data: PasswordReset):
+async def forgot_password(reset_data: PasswordReset, request: Request):
     """
     Send password reset code
     """
+    enforce_rate_limit(request, reset_data.email, email_ip_limiter, email_address_limiter)
     try:
-        # Check if user exists in students collection
-        user = db.students.find_one({"email": reset_data.email})
-        collection = db.students
-        
-        # If not found in students, check experts
-        if not user:
-            user = db.experts.find_one({"email": reset_data.email})
-            collection = db.experts
+        # Check if user exists
+        role, user = find_user(reset_data.email, {"first_name": 1})
         
         if not user:
             # Don't reveal that email doesn't exist for security
@@ -414,15 +466,15 @@ async def forgot_password(reset_data: PasswordReset):
         # Generate reset code
         reset_code = generate_verification_code()
         
-        # Update user with reset code
-        collection.update_one(
-            {"_id": user["_id"]},
-            {
-                "$set": {
-                    "reset_code": reset_code,
-                    "reset_code_expires": get_password_reset_code_expiry()
-                }
-            }
+        # Store the reset code
+        issue_code(
+            reset_data.email,
+            PASSWORD_RESET,
+            reset_code,
+            get_password_reset_code_expiry(),
+            role,
+            user["_id"],
+            user["first_name"]
         )
         
         # Send password reset email
@@ -446,56 +498,52 @@ async def reset_password(reset_data: ResetPassword):
     Reset password with code
     """
     try:
-        # Check if user exists in students collection
-        user = db.students.find_one({"email": reset_data.email})
-        collection = db.students
-        
-        # If not found in students, check experts
-        if not user:
-            user = db.experts.find_one({"email": reset_data.email})
-            collection = db.experts
+        # Look up the pending reset code
+        code_doc = find_code(reset_data.email, PASSWORD_RESET)
         
-        if not user:
+        if not code_doc:
             raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="User not found"
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid reset code"
             )
         
         # Check reset code
-        if user.get("reset_code") != reset_data.reset_code:
+        if code_doc.get("code") != reset_data.reset_code:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Invalid reset code"
             )
         
         # Check if code is expired
-        expires = user.get("reset_code_expires")
-        if expires:
-            # Ensure both datetimes are timezone-aware
-            now = datetime.now(timezone.utc)
-            # If expires.tzinfo is None:
-            if expires.tzinfo is None:
-                expires = expires.replace(tzinfo=timezone.utc)
-                
-            if expires < now:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Reset code expired"
-                )
+        if is_expired(code_doc):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Reset code expired"
+            )
+        
+        collection = db.students if code_doc["role"] == "student" else db.experts
+        user = collection.find_one({"_id": code_doc["user_id"]}, {"password": 1})
+        if not user:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="User not found"
+            )
     
-        if bcrypt.checkpw(reset_data.password.encode('utf-8'), user["password"].encode('utf-8')):
+        if await verify_password_async(reset_data.password, user["password"]):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="New password must be different from the old password"
         )
         # Update user with new password
+        password_hash = await hash_password_async(reset_data.password)
         collection.update_one(
             {"_id": user["_id"]},
-            {
-                "$set": {"password": hash_password(reset_data.password)},
-                "$unset": {"reset_code": "", "reset_code_expires": ""}
-            }
+            {"$set": {"password": password_hash}}
         )
+        set_password(reset_data.email, password_hash)
+        delete_code(reset_data.email, PASSWORD_RESET)
+        invalidate_user(code_doc["role"], reset_data.email)
+        revoke_user_tokens(code_doc["role"], reset_data.email)
         
         return {"message": "Password reset successfully"}
     except HTTPException as e:
@@ -523,14 +571,21 @@ async def refresh_token(
                 detail="Refresh token missing"
             )
         
-        # Verify refresh token
+        # Verify refresh token; access tokens don't refresh
         payload = verify_token(refresh_token)
-        if not payload:
+        if not payload or payload.token_type != REFRESH_TOKEN_TYPE:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid refresh token"
             )
         
+        # Reject logged out tokens and tokens issued before a password change
+        if is_token_revoked(payload):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Refresh token revoked"
+            )
+        
         # Create new access token
         email = payload.email
         role = payload.role
@@ -599,8 +654,8 @@ async def get_current_user_info(current_user: dict = Depends(get_current_user)):
     del user["_id"]
     
     # Remove sensitive information
-    if "hashed_password" in user:
-        del user["hashed_password"]
+    if "password" in user:
+        del user["password"]
     
     return user
 
@@ -655,12 +710,9 @@ async def auth(request: Request):
         # Get user info directly from token response
         user = token.get("userinfo")
         
-        # If userinfo is not in token, fetch it
+        # If userinfo is not in token, fetch it over the pooled OAuth client
         if not user:
-            user_info_endpoint = "https://www.googleapis.com/oauth2/v2/userinfo"
-            headers = {"Authorization": f'Bearer {token["access_token"]}'}
-            google_response = requests.get(user_info_endpoint, headers=headers)
-            user = google_response.json()
+            user = await oauth.google.userinfo(token=token)
             
         user_id = user.get("sub")
         user_email = user.get("email")
@@ -722,19 +774,24 @@ async def change_password(
         )
     
     # Verify current password
-    if not verify_password(current_password, user["hashed_password"]):
+    if not await verify_password_async(current_password, user["password"]):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Incorrect password"
         )
     
     # Hash new password
-    hashed_password = hash_password(new_password)
+    hashed_password = await hash_password_async(new_password)
     
     # Update user
     collection.update_one(
         {"_id": ObjectId(current_user["id"])},
         {"$set": {"password": hashed_password}}
     )
+    set_password(current_user["email"], hashed_password)
+    invalidate_user(current_user["role"], current_user["email"])
+    cutoff = revoke_user_tokens(current_user["role"], current_user["email"])
     
-    return {"message": "Password changed successfully"}
+    # Every earlier token of the user is revoked, the caller's included
+    access_token = create_access_token(user_claims(user, current_user["role"]), issued_after=cutoff)
+    return {"message": "Password changed successfully", "access_token": access_token, "token_type": "bearer"}
@@ -1,14 +1,27 @@
-from fastapi import APIRouter, HTTPException, Depends, status, UploadFile, File, Body
+from fastapi import APIRouter, HTTPException, Depends, status, UploadFile, File, Body, Query
 from typing import List, Optional, Dict
 from datetime import datetime, timezone, timedelta
 from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+from pymongo import ReturnDocument
 
 from ..models.expert import ExpertUpdate, ExpertProfile
 from ..models.session import SessionResponse, SessionUpdate
 from ..models.review import ReviewResponse
-from ..utils.auth import get_current_active_user, require_role
+from ..utils.auth import get_current_active_user, require_role, invalidate_user
+from ..utils.revocation import revoke_user_tokens
+from ..utils.hash import verify_password_async, hash_password_async
+from ..utils.JWTtoken import create_access_token, user_claims
 from ..models.message import MessageCreate, MessageResponse, ConversationResponse
 from ..db.mongo import db
+from ..db.ids import ref_filter, stringify_refs
+from ..db.queries import find_sessions_with_participants, SESSION_PAGE_MAX_LIMIT
+from ..db.archive import find_session, find_sessions, find_messages_page, MESSAGE_PAGE_MAX_LIMIT
+from ..db.identity_map import get_by_id, update_by_id
+from ..db.user_directory import set_password, change_email, revert_email_change
+from ..db.notifications import record_event, NEW_MESSAGE
+from ..db.expert_documents import DEFAULTED_FIELDS, fill_expert_defaults
+from ..db.expert_search import expert_search_index
 
 router = APIRouter(
     prefix="/api/experts",
@@ -52,20 +65,48 @@ async def update_expert_profile(
     # Add updated_at timestamp
     update_data["updated_at"] = datetime.now(timezone.utc)
     
-    # Update expert
-    result = db.experts.update_one(
-        {"_id": ObjectId(current_user["id"])},
-        {"$set": update_data}
-    )
+    # Claim a new email in the directory first, it is unique across all users
+    new_email = update_data.get("email")
+    if new_email == current_user["email"]:
+        new_email = None
+    if new_email:
+        try:
+            change_email(current_user["email"], new_email)
+        except DuplicateKeyError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Email already registered"
+            )
+    
+    # Update expert, giving the email back to the directory if that fails
+    try:
+        result = db.experts.update_one(
+            {"_id": ObjectId(current_user["id"])},
+            {"$set": update_data}
+        )
+    except Exception as e:
+        if new_email:
+            revert_email_change(current_user["email"], new_email)
+        if isinstance(e, DuplicateKeyError):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Email already registered"
+            )
+        raise
     
     if result.modified_count == 0:
+        if new_email:
+            revert_email_change(current_user["email"], new_email)
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Expert not found"
         )
     
-    # Get updated expert
-    updated_expert = db.experts.find_one({"_id": ObjectId(current_user["id"])})
+    invalidate_user(current_user["role"], current_user["email"])
+    
+    # Get updated expert, restoring defaults of fields the update emptied
+    updated_expert = fill_expert_defaults(db.experts.find_one({"_id": ObjectId(current_user["id"])}))
+    expert_search_index.expert_changed()
     
     # Convert ObjectId to string
     updated_expert["id"] = str(updated_expert["_id"])
@@ -99,6 +140,8 @@ async def upload_profile_image(
             }
         }
     )
+    invalidate_user(current_user["role"], current_user["email"])
+    expert_search_index.expert_changed()
     
     return {"message": "Profile image uploaded successfully", "image_url": image_url}
 
@@ -110,58 +153,49 @@ async def mark_profile_completed(
     Mark expert profile as completed
     """
     # Update expert
-    result = db.experts.update_one(
+    expert = db.experts.find_one_and_update(
         {"_id": ObjectId(current_user["id"])},
         {
             "$set": {
                 "is_profile_completed": True,
                 "updated_at": datetime.now(timezone.utc)
             }
-        }
+        },
+        projection={field: 1 for field in DEFAULTED_FIELDS},
+        return_document=ReturnDocument.AFTER
     )
     
-    if result.modified_count == 0:
+    if expert is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Expert not found"
         )
+    fill_expert_defaults(expert)
+    expert_search_index.expert_changed()
     
     return {"message": "Profile marked as completed successfully"}
 
 @router.get("/sessions", response_model=List[SessionResponse])
 async def get_expert_sessions(
     status: Optional[str] = None,
+    skip: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=SESSION_PAGE_MAX_LIMIT),
     current_user: dict = Depends(require_role("expert"))
 ):
     """
     Get expert sessions
+    
+    Without a limit only recent sessions are returned. Paged requests continue
+    into archived sessions once the recent ones are exhausted.
     """
     # Build query
-    query = {"expert_id": current_user["id"]}
+    query = {"expert_id": ref_filter(current_user["id"])}
     
     if status:
         query["status"] = status
     
-    # Find sessions
-    sessions = list(db.sessions.find(query).sort("date", -1))
-    
-    # Enrich sessions with expert and student info
-    for session in sessions:
-        session["id"] = str(session["_id"])
-        
-        # Get expert info
-        expert = db.experts.find_one({"_id": ObjectId(session["expert_id"])})
-        if expert:
-            session["expert_name"] = f"{expert['first_name']} {expert['last_name']}"
-            session["expert_profile_image"] = expert.get("profile_image")
-        
-        # Get student info
-        student = db.students.find_one({"_id": ObjectId(session["student_id"])})
-        if student:
-            session["student_name"] = f"{student['first_name']} {student['last_name']}"
-            session["student_profile_image"] = student.get("profile_image")
-    
-    return sessions
+    # Find sessions enriched with expert and student info
+    return find_sessions_with_participants(query, skip, limit)
 
 @router.get("/sessions/{session_id}", response_model=SessionResponse)
 async def get_session_details(
@@ -171,7 +205,7 @@ async def get_session_details(
     """
     Get session details
     """
-    session = db.sessions.find_one({"_id": ObjectId(session_id)})
+    session = find_session({"_id": ObjectId(session_id)})
     if not session:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -179,7 +213,7 @@ async def get_session_details(
         )
     
     # Verify expert has access to this session
-    if session["expert_id"] != current_user["id"]:
+    if str(session["expert_id"]) != current_user["id"]:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="You don't have access to this session"
@@ -187,15 +221,16 @@ async def get_session_details(
     
     # Convert ObjectId to string
     session["id"] = str(session["_id"])
+    stringify_refs(session)
     
     # Get expert info
-    expert = db.experts.find_one({"_id": ObjectId(session["expert_id"])})
+    expert = get_by_id("experts", session["expert_id"])
     if expert:
         session["expert_name"] = f"{expert['first_name']} {expert['last_name']}"
         session["expert_profile_image"] = expert.get("profile_image")
     
     # Get student info
-    student = db.students.find_one({"_id": ObjectId(session["student_id"])})
+    student = get_by_id("students", session["student_id"])
     if student:
         session["student_name"] = f"{student['first_name']} {student['last_name']}"
         session["student_profile_image"] = student.get("profile_image")
@@ -211,7 +246,7 @@ async def update_session(
     """
     Update a session
     """
-    session = db.sessions.find_one({"_id": ObjectId(session_id)})
+    session = get_by_id("sessions", session_id)
     if not session:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -219,7 +254,7 @@ async def update_session(
         )
     
     # Verify expert has access to this session
-    if session["expert_id"] != current_user["id"]:
+    if str(session["expert_id"]) != current_user["id"]:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="You don't have access to this session"
@@ -238,23 +273,18 @@ async def update_session(
     update_data["updated_at"] = datetime.now(timezone.utc)
     
     # Update session
-    db.sessions.update_one(
-        {"_id": ObjectId(session_id)},
-        {"$set": update_data}
-    )
-    
-    # Get updated session
-    updated_session = db.sessions.find_one({"_id": ObjectId(session_id)})
+    updated_session = update_by_id("sessions", session_id, {"$set": update_data})
     updated_session["id"] = str(updated_session["_id"])
+    stringify_refs(updated_session)
     
     # Get expert info
-    expert = db.experts.find_one({"_id": ObjectId(updated_session["expert_id"])})
+    expert = get_by_id("experts", updated_session["expert_id"])
     if expert:
         updated_session["expert_name"] = f"{expert['first_name']} {expert['last_name']}"
         updated_session["expert_profile_image"] = expert.get("profile_image")
     
     # Get student info
-    student = db.students.find_one({"_id": ObjectId(updated_session["student_id"])})
+    student = get_by_id("students", updated_session["student_id"])
     if student:
         updated_session["student_name"] = f"{student['first_name']} {student['last_name']}"
         updated_session["student_profile_image"] = student.get("profile_image")
@@ -287,7 +317,7 @@ async def get_conversations(
         
         # Get the last message
         last_message = db.messages.find_one(
-            {"conversation_id": str(conversation["_id"])},
+            {"conversation_id": ref_filter(conversation["_id"])},
             sort=[("timestamp", -1)]
         )
         
@@ -296,8 +326,8 @@ async def get_conversations(
         
         # Check if there are unread messages for the expert
         unread_count = db.messages.count_documents({
-            "conversation_id": str(conversation["_id"]),
-            "sender_id": student_id,
+            "conversation_id": ref_filter(conversation["_id"]),
+            "sender_id": ref_filter(student_id),
             "read": False
         })
         
@@ -316,10 +346,15 @@ async def get_conversations(
 @router.get("/conversations/{student_id}", response_model=List[MessageResponse])
 async def get_conversation_messages(
     student_id: str,
+    limit: Optional[int] = Query(None, ge=1, le=MESSAGE_PAGE_MAX_LIMIT),
+    before: Optional[datetime] = None,
     current_user: dict = Depends(require_role("expert"))
 ):
     """
     Get messages for a conversation with a student
+    
+    Pass `limit` (and `before` for older pages) to page backwards through the
+    history, including archived messages.
     """
     # Find or create conversation
     conversation = db.conversations.find_one({
@@ -338,15 +373,18 @@ async def get_conversation_messages(
         return []
     
     # Get messages
-    messages = list(db.messages.find({
-        "conversation_id": str(conversation["_id"])
-    }).sort("timestamp", 1))
+    if limit:
+        messages = find_messages_page({"conversation_id": ref_filter(conversation["_id"])}, limit, before)
+    else:
+        messages = list(db.messages.find({
+            "conversation_id": ref_filter(conversation["_id"])
+        }).sort("timestamp", 1))
     
     # Mark messages from student as read
     db.messages.update_many(
         {
-            "conversation_id": str(conversation["_id"]),
-            "sender_id": student_id,
+            "conversation_id": ref_filter(conversation["_id"]),
+            "sender_id": ref_filter(student_id),
             "read": False
         },
         {"$set": {"read": True}}
@@ -355,6 +393,7 @@ async def get_conversation_messages(
     # Convert ObjectId to string
     for message in messages:
         message["id"] = str(message["_id"])
+        stringify_refs(message)
     
     return messages
 
@@ -402,8 +441,8 @@ async def send_message(
     
     # Create message
     message_data = {
-        "conversation_id": conversation_id,
-        "sender_id": current_user["id"],
+        "conversation_id": ObjectId(conversation_id),
+        "sender_id": ObjectId(current_user["id"]),
         "sender_name": f"{expert['first_name']} {expert['last_name']}",
         "sender_role": "expert",
         "content": message.content,
@@ -413,26 +452,29 @@ async def send_message(
     
     # Insert message
     result = db.messages.insert_one(message_data)
+    record_event("student", student["_id"], NEW_MESSAGE, {
+        "sender_name": message_data["sender_name"],
+        "preview": message.content[:140]
+    })
     
     # Return created message
     created_message = {
         "id": str(result.inserted_id),
         **message_data
     }
+    stringify_refs(created_message)
     
     return created_message
 
 @router.post("/change-password", response_model=dict)
 async def change_password(
-    current_password: str,
-    new_password: str,
+    current_password: str = Body(...),
+    new_password: str = Body(...),
     current_user: dict = Depends(require_role("expert"))
 ):
     """
     Change expert password
     """
-    from ..utils.hash import verify_password, get_password_hash
-    
     # Get expert
     expert = db.experts.find_one({"_id": ObjectId(current_user["id"])})
     if not expert:
@@ -442,20 +484,25 @@ async def change_password(
         )
     
     # Verify current password
-    if not verify_password(current_password, expert["hashed_password"]):
+    if not await verify_password_async(current_password, expert["password"]):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Incorrect password"
         )
     
     # Update password
-    hashed_password = get_password_hash(new_password)
+    hashed_password = await hash_password_async(new_password)
     db.experts.update_one(
         {"_id": ObjectId(current_user["id"])},
-        {"$set": {"hashed_password": hashed_password}}
+        {"$set": {"password": hashed_password}}
     )
+    set_password(current_user["email"], hashed_password)
+    invalidate_user(current_user["role"], current_user["email"])
+    cutoff = revoke_user_tokens(current_user["role"], current_user["email"])
     
-    return {"message": "Password updated successfully"}
+    # Every earlier token of the user is revoked, the caller's included
+    access_token = create_access_token(user_claims(expert, "expert"), issued_after=cutoff)
+    return {"message": "Password updated successfully", "access_token": access_token, "token_type": "bearer"}
 
 @router.get("/reviews", response_model=List[ReviewResponse])
 async def get_expert_reviews(current_user: dict = Depends(require_role("expert"))):
@@ -463,11 +510,12 @@ async def get_expert_reviews(current_user: dict = Depends(require_role("expert")
     Get all reviews for the current expert
     """
     # Get reviews for this expert
-    reviews = list(db.reviews.find({"expert_id": current_user["id"]}).sort("created_at", -1))
+    reviews = list(db.reviews.find({"expert_id": ref_filter(current_user["id"])}).sort("created_at", -1))
     
     # Convert ObjectId to string
     for review in reviews:
         review["id"] = str(review["_id"])
+        stringify_refs(review)
         if "_id" in review:
             del review["_id"]
     
@@ -490,7 +538,7 @@ async def get_expert_stats(
     
     # Get session stats
     upcoming_sessions = db.sessions.count_documents({
-        "expert_id": current_user["id"],
+        "expert_id": ref_filter(current_user["id"]),
         "status": "scheduled",
         "date": {"$gte": datetime.now(timezone.utc)}
     })
@@ -498,7 +546,7 @@ async def get_expert_stats(
     completed_sessions = expert.get("completed_sessions", 0)
     
     # Get review stats
-    reviews = list(db.reviews.find({"expert_id": current_user["id"]}))
+    reviews = list(db.reviews.find({"expert_id": ref_filter(current_user["id"])}))
     review_count = len(reviews)
     
     # Calculate average rating
@@ -614,6 +662,7 @@ async def update_availability(
             }
         }
     )
+    expert_search_index.expert_changed()
     
     return {"message": "Availability updated successfully"}
 
@@ -651,10 +700,10 @@ async def get_expert_earnings(
         query_date = {"$gte": start_date}
     
     # Get sessions for the expert
-    sessions = list(db.sessions.find({
-        "expert_id": current_user["id"],
+    sessions = find_sessions({
+        "expert_id": ref_filter(current_user["id"]),
         "date": query_date
-    }).sort("date", -1))
+    }, since=start_date)
     
     # Calculate earnings
     earnings = []
@@ -664,11 +713,11 @@ async def get_expert_earnings(
     
     for session in sessions:
         # Get student info
-        student = db.students.find_one({"_id": ObjectId(session["student_id"])})
+        student = get_by_id("students", session["student_id"])
         student_name = f"{student['first_name']} {student['last_name']}" if student else "Unknown Student"
         
         # Calculate amount based on session duration and expert hourly rate
-        expert = db.experts.find_one({"_id": ObjectId(current_user["id"])})
+        expert = get_by_id("experts", current_user["id"])
         hourly_rate = expert.get("hourly_rate", 45)
         duration_hours = session.get("duration", 60) / 60  # Convert minutes to hours
         amount = hourly_rate * duration_hours
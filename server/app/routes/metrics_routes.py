@@ -0,0 +1,103 @@
+import os
+from fastapi import APIRouter, HTTPException, Depends, status
+
+from ..db.monitoring import query_monitor
+from ..utils.hash import password_hasher
+from ..utils.auth import principal_cache
+from ..utils.JWTtoken import token_cache
+from ..utils.rate_limit import rate_limiters
+from ..utils.oauth import google_metadata
+from ..utils.mailer import outbox_workers
+from ..utils.digest import digest_scheduler
+from ..db.expert_search import expert_search_index
+from ..utils.search_cache import search_result_cache
+
+# The metrics describe internals (cache sizes, queue depths, query shapes)
+# and are not authenticated, so they are only served when turned on
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "false").lower() == "true"
+
+
+def require_metrics_enabled():
+    """Hide the metrics endpoints unless METRICS_ENABLED is set"""
+    if not METRICS_ENABLED:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Not Found"
+        )
+
+
+router = APIRouter(
+    prefix="/api/metrics",
+    tags=["Metrics"],
+    dependencies=[Depends(require_metrics_enabled)],
+)
+
+@router.get("/db", response_model=dict)
+async def get_db_metrics():
+    """
+    Get process-wide MongoDB command statistics
+    """
+    return query_monitor.snapshot()
+
+@router.get("/password-hashing", response_model=dict)
+async def get_password_hashing_metrics():
+    """
+    Get bcrypt worker pool queue depth and timings
+    """
+    return password_hasher.snapshot()
+
+@router.get("/principal-cache", response_model=dict)
+async def get_principal_cache_metrics():
+    """
+    Get authenticated user cache hit and miss counts
+    """
+    return principal_cache.snapshot()
+
+@router.get("/token-cache", response_model=dict)
+async def get_token_cache_metrics():
+    """
+    Get decoded-token cache hit and miss counts
+    """
+    return token_cache.snapshot()
+
+@router.get("/rate-limits", response_model=dict)
+async def get_rate_limit_metrics():
+    """
+    Get allowed and rejected counts per rate limiter
+    """
+    return {limiter.name: limiter.snapshot() for limiter in rate_limiters}
+
+@router.get("/oauth", response_model=dict)
+async def get_oauth_metrics():
+    """
+    Get OAuth provider metadata refresh state
+    """
+    return google_metadata.snapshot()
+
+@router.get("/email-outbox", response_model=dict)
+async def get_email_outbox_metrics():
+    """
+    Get email outbox backlog and delivery counts
+    """
+    return outbox_workers.snapshot()
+
+@router.get("/notification-digest", response_model=dict)
+async def get_notification_digest_metrics():
+    """
+    Get notification digest job runs and the result of the last run
+    """
+    return digest_scheduler.snapshot()
+
+@router.get("/expert-search", response_model=dict)
+async def get_expert_search_metrics():
+    """
+    Get size, age and build time of the expert search index and its facet cache hits
+    """
+    return expert_search_index.snapshot()
+
+@router.get("/search-cache", response_model=dict)
+async def get_search_cache_metrics():
+    """
+    Get expert search result cache hit and miss counts
+    """
+    return search_result_cache.snapshot()
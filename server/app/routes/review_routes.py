@@ -6,6 +6,10 @@ from bson import ObjectId
 from ..models.review import ReviewCreate, ReviewResponse
 from ..utils.auth import get_current_active_user, require_role
 from ..db.mongo import db
+from ..db.ids import ref_filter, stringify_refs
+from ..db.archive import find_session
+from ..db.notifications import record_event, NEW_REVIEW
+from ..db.expert_search import expert_search_index
 
 router = APIRouter(
     prefix="/api/reviews",
@@ -30,9 +34,9 @@ async def create_review(
         )
     
     # Verify student has had a session with this expert
-    session = db.sessions.find_one({
-        "student_id": current_user["id"],
-        "expert_id": expert_id,
+    session = find_session({
+        "student_id": ref_filter(current_user["id"]),
+        "expert_id": ref_filter(expert_id),
         "status": "completed"
     })
     
@@ -44,8 +48,8 @@ async def create_review(
     
     # Check if student has already reviewed this expert
     existing_review = db.reviews.find_one({
-        "student_id": current_user["id"],
-        "expert_id": expert_id
+        "student_id": ref_filter(current_user["id"]),
+        "expert_id": ref_filter(expert_id)
     })
     
     if existing_review:
@@ -59,21 +63,26 @@ async def create_review(
     
     # Create review
     review_data = {
-        "student_id": current_user["id"],
+        "student_id": ObjectId(current_user["id"]),
         "student_name": f"{student['first_name']} {student['last_name']}",
         "student_profile_image": student.get("profile_image"),
-        "expert_id": expert_id,
+        "expert_id": ObjectId(expert_id),
         "rating": review.rating,
         "comment": review.comment,
         "created_at": datetime.now(timezone.utc),
-        "session_id": str(session["_id"]) if session else None
+        "session_id": session["_id"] if session else None
     }
     
     # Insert review
     result = db.reviews.insert_one(review_data)
+    record_event("expert", expert["_id"], NEW_REVIEW, {
+        "student_name": review_data["student_name"],
+        "rating": review.rating,
+        "comment": (review.comment or "")[:140]
+    })
     
     # Update expert rating
-    all_reviews = list(db.reviews.find({"expert_id": expert_id}))
+    all_reviews = list(db.reviews.find({"expert_id": ref_filter(expert_id)}))
     total_rating = sum(r["rating"] for r in all_reviews)
     new_rating = total_rating / len(all_reviews)
     
@@ -82,16 +91,19 @@ async def create_review(
         {
             "$set": {
                 "rating": new_rating,
-                "reviews_count": len(all_reviews)
+                "reviews_count": len(all_reviews),
+                "updated_at": datetime.now(timezone.utc)
             }
         }
     )
+    expert_search_index.expert_changed()
     
     # Return created review
     created_review = {
         "id": str(result.inserted_id),
         **review_data
     }
+    stringify_refs(created_review)
     
     return created_review
 
@@ -112,11 +124,12 @@ async def get_expert_reviews(
         )
     
     # Get reviews
-    reviews = list(db.reviews.find({"expert_id": expert_id}).sort("created_at", -1))
+    reviews = list(db.reviews.find({"expert_id": ref_filter(expert_id)}).sort("created_at", -1))
     
     # Convert ObjectId to string
     for review in reviews:
         review["id"] = str(review["_id"])
+        stringify_refs(review)
     
     return reviews
 
@@ -138,7 +151,7 @@ async def delete_review(
         )
     
     # Verify user has permission to delete this review
-    if review["student_id"] != current_user["id"] and current_user["role"] != "admin":
+    if str(review["student_id"]) != current_user["id"] and current_user["role"] != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="You don't have permission to delete this review"
@@ -148,7 +161,7 @@ async def delete_review(
     db.reviews.delete_one({"_id": ObjectId(review_id)})
     
     # Update expert rating
-    all_reviews = list(db.reviews.find({"expert_id": expert_id}))
+    all_reviews = list(db.reviews.find({"expert_id": ref_filter(expert_id)}))
     
     if all_reviews:
         total_rating = sum(r["rating"] for r in all_reviews)
@@ -159,7 +172,8 @@ async def delete_review(
             {
                 "$set": {
                     "rating": new_rating,
-                    "reviews_count": len(all_reviews)
+                    "reviews_count": len(all_reviews),
+                    "updated_at": datetime.now(timezone.utc)
                 }
             }
         )
@@ -170,9 +184,11 @@ async def delete_review(
             {
                 "$set": {
                     "rating": 0.0,
-                    "reviews_count": 0
+                    "reviews_count": 0,
+                    "updated_at": datetime.now(timezone.utc)
                 }
             }
         )
+    expert_search_index.expert_changed()
     
     return {"message": "Review deleted successfully"}
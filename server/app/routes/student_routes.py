@@ -1,18 +1,34 @@
-from fastapi import APIRouter, HTTPException, Depends, status, UploadFile, File, Body
+from fastapi import APIRouter, HTTPException, Depends, status, UploadFile, File, Body, Query, Response
 from typing import List, Optional, Dict
+from pydantic import TypeAdapter
 from datetime import datetime, timezone, timedelta
 from bson import ObjectId
 
 from ..models.student import StudentUpdate, StudentProfile, RecommendationResponse
-from ..models.expert import ExpertSearchResult, ExpertProfile
+from ..models.expert import ExpertSearchResult, ExpertProfile, ExpertFacets, ExpertSuggestion
 from ..models.session import SessionCreate, SessionResponse, SessionUpdate
 from ..models.message import MessageCreate, MessageResponse, ConversationResponse
 from ..models.payment import PaymentMethod, PaymentHistory
 from ..recommender.hybrid import HybridRecommender, Student, Tutor
-from ..utils.auth import get_current_active_user, require_role
-from ..utils.email import send_session_confirmation_email
-from ..utils.hash import verify_password, hash_password
+from ..utils.auth import get_current_active_user, require_role, invalidate_user
+from ..utils.revocation import revoke_user_tokens
+from ..utils.JWTtoken import create_access_token, user_claims
+from ..db.expert_search import expert_search_index, canonical_query, SEARCHABLE
+from ..utils.search_cache import search_result_cache, CachedSearch
+from ..db.expert_documents import SEARCH_RESULT_PROJECTION
+from ..db.expert_pages import (
+    InvalidCursor, RELEVANCE, SORT_NAMES, EXPERT_SEARCH_DEFAULT_LIMIT, EXPERT_SEARCH_MAX_LIMIT
+)
+from ..db.notifications import record_event, SESSION_BOOKED, NEW_MESSAGE, DIGEST_SCHEDULES
+from ..utils.hash import verify_password_async, hash_password_async
 from ..db.mongo import db
+from ..db.ids import ref_filter, stringify_refs
+from ..db.queries import find_sessions_with_participants, SESSION_PAGE_MAX_LIMIT
+from ..db.archive import (
+    find_session, find_messages_page, delete_sessions, delete_messages, MESSAGE_PAGE_MAX_LIMIT
+)
+from ..db.identity_map import get_by_id, update_by_id
+from ..db.user_directory import set_password, remove_entry
 
 router = APIRouter(
     prefix="/api/students",
@@ -115,6 +131,8 @@ async def update_student_profile(
             detail="Student not found"
         )
     
+    invalidate_user(current_user["role"], current_user["email"])
+    
     # Get updated student
     updated_student = db.students.find_one({"_id": ObjectId(current_user["id"])})
     
@@ -153,6 +171,7 @@ async def upload_profile_image(
             }
         }
     )
+    invalidate_user(current_user["role"], current_user["email"])
     
     return {"message": "Profile image uploaded successfully", "image_url": image_url}
 
@@ -174,20 +193,25 @@ async def change_password(
         )
     
     # Verify current password
-    if not verify_password(current_password, student["hashed_password"]):
+    if not await verify_password_async(current_password, student["password"]):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Incorrect password"
         )
     
     # Update password
-    hashed_password = hash_password(new_password)
+    hashed_password = await hash_password_async(new_password)
     db.students.update_one(
         {"_id": ObjectId(current_user["id"])},
-        {"$set": {"hashed_password": hashed_password}}
+        {"$set": {"password": hashed_password}}
     )
+    set_password(current_user["email"], hashed_password)
+    invalidate_user(current_user["role"], current_user["email"])
+    cutoff = revoke_user_tokens(current_user["role"], current_user["email"])
     
-    return {"message": "Password updated successfully"}
+    # Every earlier token of the user is revoked, the caller's included
+    access_token = create_access_token(user_claims(student, "student"), issued_after=cutoff)
+    return {"message": "Password updated successfully", "access_token": access_token, "token_type": "bearer"}
 
 @router.delete("/delete-account", response_model=dict)
 async def delete_account(
@@ -206,7 +230,7 @@ async def delete_account(
         )
     
     # Verify password
-    if not verify_password(password, student["hashed_password"]):
+    if not await verify_password_async(password, student["password"]):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Incorrect password"
@@ -214,11 +238,14 @@ async def delete_account(
     
     # Delete student
     db.students.delete_one({"_id": ObjectId(current_user["id"])})
+    remove_entry(current_user["email"])
+    invalidate_user(current_user["role"], current_user["email"])
+    revoke_user_tokens(current_user["role"], current_user["email"])
     
-    # Delete related data
-    db.sessions.delete_many({"student_id": current_user["id"]})
+    # Delete related data, archived sessions and messages included
+    delete_sessions({"student_id": ref_filter(current_user["id"])})
     db.conversations.delete_many({"participants": current_user["id"]})
-    db.messages.delete_many({"sender_id": current_user["id"]})
+    delete_messages({"sender_id": ref_filter(current_user["id"])})
     
     return {"message": "Account deleted successfully"}
 
@@ -326,11 +353,12 @@ async def get_payment_history(current_user: dict = Depends(require_role("student
     Get student payment history
     """
     # Get payment history
-    payment_history = list(db.payments.find({"student_id": current_user["id"]}).sort("date", -1))
+    payment_history = list(db.payments.find({"student_id": ref_filter(current_user["id"])}).sort("date", -1))
     
     # Convert ObjectId to string
     for payment in payment_history:
         payment["id"] = str(payment["_id"])
+        stringify_refs(payment)
     
     return payment_history
 
@@ -339,91 +367,177 @@ async def update_notification_settings(
     email_notifications: bool = Body(...),
     sms_notifications: bool = Body(...),
     marketing_emails: bool = Body(...),
+    digest_schedule: Optional[str] = Body(None),
     current_user: dict = Depends(require_role("student"))
 ):
     """
     Update notification settings
+    
+    `digest_schedule` (instant, hourly or daily) controls how often
+    notification emails are batched into a digest.
     """
+    if digest_schedule is not None and digest_schedule not in DIGEST_SCHEDULES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"digest_schedule must be one of: {', '.join(DIGEST_SCHEDULES)}"
+        )
+    
     # Update notification settings
+    settings = {
+        "notification_settings.email_notifications": email_notifications,
+        "notification_settings.sms_notifications": sms_notifications,
+        "notification_settings.marketing_emails": marketing_emails,
+        "updated_at": datetime.now(timezone.utc)
+    }
+    if digest_schedule is not None:
+        settings["notification_settings.digest_schedule"] = digest_schedule
     db.students.update_one(
         {"_id": ObjectId(current_user["id"])},
-        {
-            "$set": {
-                "notification_settings": {
-                    "email_notifications": email_notifications,
-                    "sms_notifications": sms_notifications,
-                    "marketing_emails": marketing_emails
-                },
-                "updated_at": datetime.now(timezone.utc)
-            }
-        }
+        {"$set": settings}
     )
     
     return {"message": "Notification settings updated successfully"}
 
+SEARCH_RESULTS = TypeAdapter(List[ExpertSearchResult])
+
+def _search_filters(specialty: Optional[str], tags: Optional[str], language: Optional[str],
+                    min_rate: Optional[float], max_rate: Optional[float], min_rating: Optional[float]) -> dict:
+    """Search index filters from the find-tutors query parameters"""
+    return {
+        "specialty": specialty if specialty != "any" else None,
+        "tags": [tag.strip() for tag in tags.split(",") if tag.strip()] if tags else None,
+        "language": language if language != "any" else None,
+        "min_rate": min_rate,
+        "max_rate": max_rate,
+        "min_rating": min_rating
+    }
+
 @router.get("/experts", response_model=List[ExpertSearchResult])
 async def search_experts(
+    q: Optional[str] = None,
     specialty: Optional[str] = None,
     tags: Optional[str] = None,
     min_rate: Optional[float] = None,
     max_rate: Optional[float] = None,
     min_rating: Optional[float] = None,
     language: Optional[str] = None,
+    sort: Optional[str] = None,
+    limit: int = Query(EXPERT_SEARCH_DEFAULT_LIMIT, ge=1, le=EXPERT_SEARCH_MAX_LIMIT),
+    cursor: Optional[str] = None,
+    fuzzy: bool = False,
     current_user: dict = Depends(require_role("student"))
 ):
     """
     Search for experts
-    """
-    # Build query
-    query = {"is_approved": True, "is_verified": True}
     
-    if specialty and specialty != "any":
-        query["specialty"] = {"$regex": specialty, "$options": "i"}
+    `q` searches specialty, tags and bio. With `fuzzy=true` it searches
+    specialty, tags and names instead and tolerates misspelled terms
+    ("pyhton" finds Python tutors), ranked by similarity. Filtering, sorting and paging run
+    on the in-process search index; MongoDB only loads the page.
     
-    if tags:
-        tag_list = tags.split(",")
-        query["tags"] = {"$in": tag_list}
+    Results are paged: `sort` is one of rating (default), hourly_rate,
+    completed_sessions or relevance (default when `q` is given). The
+    `X-Total-Count` header has the number of matches. When more results
+    exist the response carries an `X-Next-Cursor` header; pass it back as
+    `cursor` with the same filters to get the next page.
     
-    if min_rate is not None or max_rate is not None:
-        query["hourly_rate"] = {}
-        if min_rate is not None:
-            query["hourly_rate"]["$gte"] = min_rate
-        if max_rate is not None:
-            query["hourly_rate"]["$lte"] = max_rate
+    Responses are cached per worker as JSON bytes, keyed by the canonical
+    query and the catalog version of the search index.
+    """
+    sort = sort or (RELEVANCE if q else "rating")
+    if sort not in SORT_NAMES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"sort must be one of: {', '.join(SORT_NAMES)}"
+        )
+    if sort == RELEVANCE and not q:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Sorting by relevance requires a search query"
+        )
     
-    if min_rating is not None:
-        query["rating"] = {"$gte": min_rating}
-        
-    if language and language != "any":
-        query["languages"] = {"$in": [language]}
+    filters, q, query_key = canonical_query(
+        _search_filters(specialty, tags, language, min_rate, max_rate, min_rating), q
+    )
+    key = (query_key, fuzzy, sort, limit, cursor)
+    # Read before searching: a write during the search retires the entry
+    version = expert_search_index.version
+    cached = search_result_cache.get(version, key)
+    if cached is not None:
+        return Response(content=cached.body, media_type="application/json", headers=cached.headers)
+    
+    # Cut the page from the search index
+    try:
+        page = expert_search_index.find_page(filters, q, sort, limit, cursor, fuzzy)
+    except InvalidCursor as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     
-    # Find experts
-    experts = list(db.experts.find(query))
+    headers = {"X-Total-Count": str(page.total)}
+    if page.next_cursor:
+        headers["X-Next-Cursor"] = page.next_cursor
+    
+    # Load the page's experts, in page order; experts deleted or no longer
+    # searchable since the last index refresh are left out
+    found = {
+        expert["_id"]: expert
+        for expert in db.experts.find(
+            {"_id": {"$in": [expert_id for expert_id, _ in page.experts]}, **SEARCHABLE},
+            SEARCH_RESULT_PROJECTION
+        )
+    }
+    experts = []
+    for expert_id, relevance in page.experts:
+        if expert_id in found:
+            expert = found[expert_id]
+            expert["id"] = str(expert_id)
+            expert["relevance"] = relevance
+            experts.append(expert)
+    
+    cached = CachedSearch(SEARCH_RESULTS.dump_json(SEARCH_RESULTS.validate_python(experts)), headers)
+    search_result_cache.set(version, key, cached)
+    return Response(content=cached.body, media_type="application/json", headers=cached.headers)
+
+@router.get("/experts/facets", response_model=ExpertFacets)
+async def get_expert_facets(
+    q: Optional[str] = None,
+    specialty: Optional[str] = None,
+    tags: Optional[str] = None,
+    min_rate: Optional[float] = None,
+    max_rate: Optional[float] = None,
+    min_rating: Optional[float] = None,
+    language: Optional[str] = None,
+    fuzzy: bool = False,
+    current_user: dict = Depends(require_role("student"))
+):
+    """
+    Count experts per tag, language, specialty and hourly rate bucket
     
-    # Convert ObjectId to string and ensure all required fields exist
-    for expert in experts:
-        expert["id"] = str(expert["_id"])
-        
-        # Set default values for missing fields
-        if "specialty" not in expert or expert["specialty"] is None:
-            expert["specialty"] = "General Tutoring"
-            
-        if "tags" not in expert or not expert["tags"]:
-            expert["tags"] = []
-            
-        if "bio" not in expert or not expert["bio"]:
-            expert["bio"] = f"Experienced tutor specializing in {expert.get('specialty', 'various subjects')}."
-            
-        if "languages" not in expert or not expert["languages"]:
-            expert["languages"] = ["English"]
-            
-        if "experience_years" not in expert:
-            expert["experience_years"] = 1
-            
-        if "completed_sessions" not in expert:
-            expert["completed_sessions"] = 0
+    Takes the filters of `GET /experts`, `fuzzy` included. Each facet is counted with all
+    filters except its own (the tag counts ignore `tags`, the rate buckets
+    ignore `min_rate`/`max_rate`, ...) so the sidebar can show what every
+    other choice would return. Counts come from the search index and are
+    cached per filter set until an expert changes.
+    """
+    filters = _search_filters(specialty, tags, language, min_rate, max_rate, min_rating)
+    return expert_search_index.facets(filters, q, fuzzy)
+
+@router.get("/experts/suggestions", response_model=List[ExpertSuggestion])
+async def get_expert_suggestions(
+    q: str = "",
+    limit: int = Query(10, ge=1, le=25),
+    current_user: dict = Depends(require_role("student"))
+):
+    """
+    Autocomplete the find-tutors search box
     
-    return experts
+    Returns tags and specialties starting with `q` (or with a word starting
+    with `q`), most common first, with the number of experts carrying each.
+    Served from the search index, which picks up profile changes.
+    """
+    return expert_search_index.suggest(q, limit)
 
 @router.get("/experts/{expert_id}", response_model=ExpertProfile)
 async def get_expert_details(
@@ -443,28 +557,6 @@ async def get_expert_details(
     # Convert ObjectId to string
     expert["id"] = str(expert["_id"])
     
-    # Set default values for missing required fields
-    if "specialty" not in expert or expert["specialty"] is None:
-        expert["specialty"] = "General Tutoring"
-        
-    if "tags" not in expert or not expert["tags"]:
-        expert["tags"] = []
-        
-    if "bio" not in expert or not expert["bio"]:
-        expert["bio"] = f"Experienced tutor specializing in {expert.get('specialty', 'various subjects')}."
-        
-    if "languages" not in expert or not expert["languages"]:
-        expert["languages"] = ["English"]
-        
-    if "experience_years" not in expert:
-        expert["experience_years"] = 1
-        
-    if "completed_sessions" not in expert:
-        expert["completed_sessions"] = 0
-        
-    if "education" not in expert or not expert["education"]:
-        expert["education"] = "Bachelor's Degree"
-    
     # Handle availability field - remove it from the response if it exists
     # since it's causing validation errors
     if "availability" in expert:
@@ -594,7 +686,7 @@ async def get_expert_availability(
         end_of_range = datetime.combine(end_date_obj, datetime.max.time()).replace(tzinfo=timezone.utc)
         
         sessions = list(db.sessions.find({
-            "expert_id": expert_id,
+            "expert_id": ref_filter(expert_id),
             "date": {"$gte": start_of_range, "$lte": end_of_range},
             "status": {"$in": ["scheduled", "confirmed"]}
         }))
@@ -655,7 +747,7 @@ async def book_session(
     Book a session with an expert
     """
     # Verify expert exists
-    expert = db.experts.find_one({"_id": ObjectId(session.expert_id)})
+    expert = get_by_id("experts", session.expert_id)
     if not expert:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -675,38 +767,34 @@ async def book_session(
     
     # Create session
     session_data = session.dict()
+    session_data["student_id"] = ObjectId(session.student_id)
+    session_data["expert_id"] = expert["_id"]
     session_data["created_at"] = datetime.now(timezone.utc)
     session_data["status"] = "scheduled"
     
     # Insert session
     result = db.sessions.insert_one(session_data)
     
-    # Get expert and student names for email
-    student = db.students.find_one({"_id": ObjectId(session.student_id)})
+    # Get expert and student names for the notifications
+    student = get_by_id("students", session.student_id)
     
-    # Send confirmation emails
+    # Notify both the student and expert in their next digest
     session_details = {
-        "id": str(result.inserted_id),
-        "expert_name": f"{expert['first_name']} {expert['last_name']}",
+        "session_id": str(result.inserted_id),
         "date": session.date,
         "duration": session.duration,
         "topic": session.topic
     }
     
-    # Send confirmation emails to both the student and expert
-    if student and "email" in student and "first_name" in student and "last_name" in student:
-        send_session_confirmation_email(
-            student["email"], 
-            f"{student['first_name']} {student['last_name']}", 
-            session_details
-        )
-    
-    if "email" in expert and "first_name" in expert and "last_name" in expert:
-        send_session_confirmation_email(
-            expert["email"], 
-            f"{expert['first_name']} {expert['last_name']}", 
-            session_details
-        )
+    if student:
+        record_event("student", student["_id"], SESSION_BOOKED, {
+            **session_details,
+            "with_name": f"{expert['first_name']} {expert['last_name']}"
+        })
+        record_event("expert", expert["_id"], SESSION_BOOKED, {
+            **session_details,
+            "with_name": f"{student['first_name']} {student['last_name']}"
+        })
     
     return {
         "message": "Session booked successfully",
@@ -716,37 +804,24 @@ async def book_session(
 @router.get("/sessions", response_model=List[SessionResponse])
 async def get_student_sessions(
     status: Optional[str] = None,
+    skip: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=SESSION_PAGE_MAX_LIMIT),
     current_user: dict = Depends(require_role("student"))
 ):
     """
     Get student sessions
+    
+    Without a limit only recent sessions are returned. Paged requests continue
+    into archived sessions once the recent ones are exhausted.
     """
     # Build query
-    query = {"student_id": current_user["id"]}
+    query = {"student_id": ref_filter(current_user["id"])}
     
     if status:
         query["status"] = status
     
-    # Find sessions
-    sessions = list(db.sessions.find(query).sort("date", -1))
-    
-    # Enrich sessions with expert and student info
-    for session in sessions:
-        session["id"] = str(session["_id"])
-        
-        # Get expert info
-        expert = db.experts.find_one({"_id": ObjectId(session["expert_id"])})
-        if expert:
-            session["expert_name"] = f"{expert['first_name']} {expert['last_name']}"
-            session["expert_profile_image"] = expert.get("profile_image")
-        
-        # Get student info
-        student = db.students.find_one({"_id": ObjectId(session["student_id"])})
-        if student:
-            session["student_name"] = f"{student['first_name']} {student['last_name']}"
-            session["student_profile_image"] = student.get("profile_image")
-    
-    return sessions
+    # Find sessions enriched with expert and student info
+    return find_sessions_with_participants(query, skip, limit)
 
 @router.get("/sessions/{session_id}", response_model=SessionResponse)
 async def get_session_details(
@@ -756,7 +831,7 @@ async def get_session_details(
     """
     Get session details
     """
-    session = db.sessions.find_one({"_id": ObjectId(session_id)})
+    session = find_session({"_id": ObjectId(session_id)})
     if not session:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -764,7 +839,7 @@ async def get_session_details(
         )
     
     # Verify student has access to this session
-    if session["student_id"] != current_user["id"]:
+    if str(session["student_id"]) != current_user["id"]:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="You don't have access to this session"
@@ -772,15 +847,16 @@ async def get_session_details(
     
     # Convert ObjectId to string
     session["id"] = str(session["_id"])
+    stringify_refs(session)
     
     # Get expert info
-    expert = db.experts.find_one({"_id": ObjectId(session["expert_id"])})
+    expert = get_by_id("experts", session["expert_id"])
     if expert:
         session["expert_name"] = f"{expert['first_name']} {expert['last_name']}"
         session["expert_profile_image"] = expert.get("profile_image")
     
     # Get student info
-    student = db.students.find_one({"_id": ObjectId(session["student_id"])})
+    student = get_by_id("students", session["student_id"])
     if student:
         session["student_name"] = f"{student['first_name']} {student['last_name']}"
         session["student_profile_image"] = student.get("profile_image")
@@ -795,7 +871,7 @@ async def cancel_session(
     """
     Cancel a session
     """
-    session = db.sessions.find_one({"_id": ObjectId(session_id)})
+    session = get_by_id("sessions", session_id)
     if not session:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -803,22 +879,19 @@ async def cancel_session(
         )
     
     # Verify student has access to this session
-    if session["student_id"] != current_user["id"]:
+    if str(session["student_id"]) != current_user["id"]:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="You don't have access to this session"
         )
     
     # Update session status
-    db.sessions.update_one(
-        {"_id": ObjectId(session_id)},
-        {
-            "$set": {
-                "status": "cancelled",
-                "updated_at": datetime.now(timezone.utc)
-            }
+    update_by_id("sessions", session_id, {
+        "$set": {
+            "status": "cancelled",
+            "updated_at": datetime.now(timezone.utc)
         }
-    )
+    })
     
     return {"message": "Session cancelled successfully"}
 
@@ -831,7 +904,7 @@ async def update_session(
     """
     Update a session
     """
-    session = db.sessions.find_one({"_id": ObjectId(session_id)})
+    session = get_by_id("sessions", session_id)
     if not session:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -839,7 +912,7 @@ async def update_session(
         )
     
     # Verify student has access to this session
-    if session["student_id"] != current_user["id"]:
+    if str(session["student_id"]) != current_user["id"]:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="You don't have access to this session"
@@ -858,23 +931,18 @@ async def update_session(
     update_data["updated_at"] = datetime.now(timezone.utc)
     
     # Update session
-    db.sessions.update_one(
-        {"_id": ObjectId(session_id)},
-        {"$set": update_data}
-    )
-    
-    # Get updated session
-    updated_session = db.sessions.find_one({"_id": ObjectId(session_id)})
+    updated_session = update_by_id("sessions", session_id, {"$set": update_data})
     updated_session["id"] = str(updated_session["_id"])
+    stringify_refs(updated_session)
     
     # Get expert info
-    expert = db.experts.find_one({"_id": ObjectId(updated_session["expert_id"])})
+    expert = get_by_id("experts", updated_session["expert_id"])
     if expert:
         updated_session["expert_name"] = f"{expert['first_name']} {expert['last_name']}"
         updated_session["expert_profile_image"] = expert.get("profile_image")
     
     # Get student info
-    student = db.students.find_one({"_id": ObjectId(updated_session["student_id"])})
+    student = get_by_id("students", updated_session["student_id"])
     if student:
         updated_session["student_name"] = f"{student['first_name']} {student['last_name']}"
         updated_session["student_profile_image"] = student.get("profile_image")
@@ -889,7 +957,7 @@ async def confirm_session(
     """
     Confirm a session as completed
     """
-    session = db.sessions.find_one({"_id": ObjectId(session_id)})
+    session = get_by_id("sessions", session_id)
     if not session:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -897,36 +965,34 @@ async def confirm_session(
         )
     
     # Verify student has access to this session
-    if session["student_id"] != current_user["id"]:
+    if str(session["student_id"]) != current_user["id"]:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="You don't have access to this session"
         )
     
     # Update session status
-    db.sessions.update_one(
-        {"_id": ObjectId(session_id)},
-        {
-            "$set": {
-                "status": "completed",
-                "updated_at": datetime.now(timezone.utc)
-            }
+    update_by_id("sessions", session_id, {
+        "$set": {
+            "status": "completed",
+            "updated_at": datetime.now(timezone.utc)
         }
-    )
+    })
     
     # Update expert's completed_sessions count
-    db.experts.update_one(
-        {"_id": ObjectId(session["expert_id"])},
-        {"$inc": {"completed_sessions": 1}}
-    )
+    expert = update_by_id("experts", session["expert_id"], {
+        "$inc": {"completed_sessions": 1},
+        "$set": {"updated_at": datetime.now(timezone.utc)}
+    })
+    expert_search_index.expert_changed()
     
     # Process payment (in a real app, this would trigger a payment to the expert)
     # For now, we'll just create a payment record
     payment_data = {
-        "student_id": current_user["id"],
-        "expert_id": session["expert_id"],
-        "session_id": session_id,
-        "amount": calculate_session_cost(session),
+        "student_id": ObjectId(current_user["id"]),
+        "expert_id": ObjectId(session["expert_id"]),
+        "session_id": ObjectId(session_id),
+        "amount": calculate_session_cost(session, expert),
         "status": "completed",
         "date": datetime.now(timezone.utc)
     }
@@ -935,11 +1001,14 @@ async def confirm_session(
     
     return {"message": "Session confirmed as completed successfully"}
 
-def calculate_session_cost(session):
+def calculate_session_cost(session, expert=None):
     """
     Calculate the cost of a session based on expert's hourly rate and session duration
+    
+    Pass the expert document when the caller already has it loaded.
     """
-    expert = db.experts.find_one({"_id": ObjectId(session["expert_id"])})
+    if expert is None:
+        expert = get_by_id("experts", session["expert_id"])
     if not expert:
         return 0
     
@@ -1044,7 +1113,7 @@ async def get_conversations(
         
         # Get the last message
         last_message = db.messages.find_one(
-            {"conversation_id": str(conversation["_id"])},
+            {"conversation_id": ref_filter(conversation["_id"])},
             sort=[("timestamp", -1)]
         )
         
@@ -1053,8 +1122,8 @@ async def get_conversations(
         
         # Check if there are unread messages for the student
         unread_count = db.messages.count_documents({
-            "conversation_id": str(conversation["_id"]),
-            "sender_id": expert_id,
+            "conversation_id": ref_filter(conversation["_id"]),
+            "sender_id": ref_filter(expert_id),
             "read": False
         })
         
@@ -1073,10 +1142,15 @@ async def get_conversations(
 @router.get("/conversations/{expert_id}", response_model=List[MessageResponse])
 async def get_conversation_messages(
     expert_id: str,
+    limit: Optional[int] = Query(None, ge=1, le=MESSAGE_PAGE_MAX_LIMIT),
+    before: Optional[datetime] = None,
     current_user: dict = Depends(require_role("student"))
 ):
     """
     Get messages for a conversation with an expert
+    
+    Pass `limit` (and `before` for older pages) to page backwards through the
+    history, including archived messages.
     """
     # Find or create conversation
     conversation = db.conversations.find_one({
@@ -1095,15 +1169,18 @@ async def get_conversation_messages(
         return []
     
     # Get messages
-    messages = list(db.messages.find({
-        "conversation_id": str(conversation["_id"])
-    }).sort("timestamp", 1))
+    if limit:
+        messages = find_messages_page({"conversation_id": ref_filter(conversation["_id"])}, limit, before)
+    else:
+        messages = list(db.messages.find({
+            "conversation_id": ref_filter(conversation["_id"])
+        }).sort("timestamp", 1))
     
     # Mark messages from expert as read
     db.messages.update_many(
         {
-            "conversation_id": str(conversation["_id"]),
-            "sender_id": expert_id,
+            "conversation_id": ref_filter(conversation["_id"]),
+            "sender_id": ref_filter(expert_id),
             "read": False
         },
         {"$set": {"read": True}}
@@ -1112,6 +1189,7 @@ async def get_conversation_messages(
     # Convert ObjectId to string
     for message in messages:
         message["id"] = str(message["_id"])
+        stringify_refs(message)
     
     return messages
 
@@ -1159,8 +1237,8 @@ async def send_message(
     
     # Create message
     message_data = {
-        "conversation_id": conversation_id,
-        "sender_id": current_user["id"],
+        "conversation_id": ObjectId(conversation_id),
+        "sender_id": ObjectId(current_user["id"]),
         "sender_name": f"{student['first_name']} {student['last_name']}",
         "sender_role": "student",
         "content": message.content,
@@ -1170,11 +1248,16 @@ async def send_message(
     
     # Insert message
     result = db.messages.insert_one(message_data)
+    record_event("expert", expert["_id"], NEW_MESSAGE, {
+        "sender_name": message_data["sender_name"],
+        "preview": message.content[:140]
+    })
     
     # Return created message
     created_message = {
         "id": str(result.inserted_id),
         **message_data
     }
+    stringify_refs(created_message)
     
     return created_message
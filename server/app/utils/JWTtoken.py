@@ -4,6 +4,9 @@ from dotenv import load_dotenv
 import os
 from fastapi import HTTPException, status
 from typing import Optional
+from cachetools import LRUCache
+import threading
+import uuid
 from ..models.user import TokenData
 
 # Load environment variables
@@ -14,35 +17,85 @@ SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 1440))
 REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", 7))
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", 4096))
+
+# Value of the "type" claim of refresh tokens (access tokens have none)
+REFRESH_TOKEN_TYPE = "refresh"
 
 if not SECRET_KEY:
     raise ValueError("Missing SECRET_KEY. Check your .env file.")
 
-def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
+def issued_at(now: datetime) -> float:
+    """
+    Issue time (iat) claim of a token issued at `now`
+    
+    Kept to the microsecond (JWT allows fractional NumericDates), so a
+    token issued in the same second as a revocation of its user's tokens,
+    but after it, stays valid.
+    """
+    return now.timestamp()
+
+def create_access_token(data: dict, expires_delta: Optional[timedelta] = None,
+                        issued_after: Optional[datetime] = None) -> str:
     """
     Create a JWT access token
     
+    Every token gets a unique id (jti) and issue time (iat) so it can be
+    revoked individually or together with all tokens of its user.
+    
     Args:
         data (dict): Data to encode in the token
         expires_delta (timedelta, optional): Token expiry time
+        issued_after (datetime, optional): Revocation cutoff the token has
+            to be issued after
         
     Returns:
         str: Encoded JWT token
     """
     to_encode = data.copy()
+    now = datetime.now(timezone.utc)
+    if issued_after is not None:
+        now = max(now, issued_after + timedelta(microseconds=1))
     
     if expires_delta:
-        expire = datetime.now(timezone.utc) + expires_delta
+        expire = now + expires_delta
     else:
-        expire = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+        expire = now + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
         
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "iat": issued_at(now), "jti": uuid.uuid4().hex})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
+def user_claims(user: dict, role: str) -> dict:
+    """
+    Build the claims of a self-contained access token
+    
+    With these claims present, requests are authorized without loading
+    the user from the database.
+    
+    Args:
+        user (dict): User document
+        role (str): student or expert
+        
+    Returns:
+        dict: Token claims
+    """
+    return {
+        "sub": user["email"],
+        "role": role,
+        "uid": str(user["_id"]),
+        "verified": user.get("is_verified", False),
+        "first_name": user.get("first_name", ""),
+        "last_name": user.get("last_name", "")
+    }
+
 def create_refresh_token(data: dict) -> str:
     """
     Create a JWT refresh token with longer expiry
     
+    Refresh tokens carry a "type" claim so they can't be used as access
+    tokens (nor access tokens as refresh tokens), and a jti and iat like
+    access tokens so they are revoked together with them.
+    
     Args:
         data (dict): Data to encode in the token
         
@@ -50,13 +103,80 @@ def create_refresh_token(data: dict) -> str:
         str: Encoded JWT refresh token
     """
     to_encode = data.copy()
-    expire = datetime.now(timezone.utc) + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
-    to_encode.update({"exp": expire})
+    now = datetime.now(timezone.utc)
+    expire = now + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    to_encode.update({"exp": expire, "iat": issued_at(now), "jti": uuid.uuid4().hex, "type": REFRESH_TOKEN_TYPE})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
+class TokenCache:
+    """
+    Bounded LRU cache of decoded tokens.
+    
+    Only successfully verified tokens are cached (keyed by the full token
+    string, so a tampered token never matches), and entries are dropped once
+    the token expires.
+    """
+    
+    def __init__(self, maxsize: int = TOKEN_CACHE_SIZE):
+        self._cache = LRUCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, token: str) -> Optional[TokenData]:
+        with self._lock:
+            token_data = self._cache.get(token)
+            if token_data is None:
+                self.misses += 1
+                return None
+            if token_data.exp <= datetime.now(timezone.utc):
+                del self._cache[token]
+                self.misses += 1
+                return None
+            self.hits += 1
+            return token_data
+    
+    def set(self, token: str, token_data: TokenData):
+        with self._lock:
+            self._cache[token] = token_data
+    
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+    
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._cache),
+                "maxsize": self._cache.maxsize,
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+token_cache = TokenCache()
+
 def verify_token(token: str) -> Optional[TokenData]:
     """
-    Verify and decode a JWT token
+    Verify and decode a JWT token, using the decoded-token cache
+    
+    Args:
+        token (str): JWT token to verify
+        
+    Returns:
+        TokenData: Decoded token data or None if invalid
+    """
+    token_data = token_cache.get(token)
+    if token_data is not None:
+        return token_data
+    
+    token_data = decode_token(token)
+    if token_data is not None and token_data.exp is not None:
+        token_cache.set(token, token_data)
+    return token_data
+
+def decode_token(token: str) -> Optional[TokenData]:
+    """
+    Verify and decode a JWT token without the cache
     
     Args:
         token (str): JWT token to verify
@@ -76,7 +196,18 @@ def verify_token(token: str) -> Optional[TokenData]:
         if email is None or role is None:
             return None
             
-        return TokenData(email=email, role=role, exp=exp)
+        return TokenData(
+            email=email,
+            role=role,
+            exp=exp,
+            jti=payload.get("jti"),
+            iat=payload.get("iat"),
+            token_type=payload.get("type"),
+            user_id=payload.get("uid"),
+            is_verified=payload.get("verified"),
+            first_name=payload.get("first_name"),
+            last_name=payload.get("last_name")
+        )
     except JWTError:
         return None
 
@@ -1,13 +1,137 @@
 from fastapi import Depends, HTTPException, status, Cookie
 from fastapi.security import OAuth2PasswordBearer
 from typing import Optional
-from .JWTtoken import verify_token
+from .JWTtoken import verify_token, REFRESH_TOKEN_TYPE
+from .revocation import revocation_list
 from ..db.mongo import db
 from bson import ObjectId
 from datetime import datetime, timezone
+from cachetools import TTLCache
+import threading
+import os
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login")
 
+# Principal cache configuration
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", 10000))
+PRINCIPAL_CACHE_TTL = int(os.getenv("PRINCIPAL_CACHE_TTL", 60))  # seconds
+
+class PrincipalCache:
+    """
+    Per-worker LRU/TTL cache of authenticated users keyed by (role, email).
+
+    Entries are invalidated by the routes that change the cached fields;
+    the TTL bounds staleness for writes made by other workers.
+    """
+
+    def __init__(self, maxsize: int = PRINCIPAL_CACHE_SIZE, ttl: int = PRINCIPAL_CACHE_TTL):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, role: str, email: str) -> Optional[dict]:
+        with self._lock:
+            user = self._cache.get((role, email))
+            if user is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return dict(user)
+
+    def set(self, role: str, email: str, user: dict):
+        with self._lock:
+            self._cache[(role, email)] = dict(user)
+
+    def invalidate(self, role: str, email: str):
+        with self._lock:
+            self._cache.pop((role, email), None)
+            self.invalidations += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._cache),
+                "maxsize": self._cache.maxsize,
+                "ttl": self._cache.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "invalidations": self.invalidations
+            }
+
+principal_cache = PrincipalCache()
+
+def invalidate_user(role: str, email: str):
+    """
+    Drop a cached user after a write to their profile, password,
+    verification status or account
+    """
+    principal_cache.invalidate(role, email)
+
+def principal_from_token(token_data) -> Optional[dict]:
+    """
+    Build the user from the claims of a self-contained token
+
+    Only verified users are trusted from claims; tokens issued before
+    verification (or without claims) fall back to a database lookup.
+    """
+    if not token_data.user_id or not token_data.is_verified:
+        return None
+    return {
+        "id": token_data.user_id,
+        "email": token_data.email,
+        "role": token_data.role,
+        "is_verified": True,
+        "first_name": token_data.first_name or "",
+        "last_name": token_data.last_name or "",
+        "profile_image": ""
+    }
+
+def is_token_revoked(token_data) -> bool:
+    """Check a decoded token against the revocation list"""
+    return revocation_list.is_revoked(token_data.jti, token_data.role, token_data.email, token_data.iat)
+
+def load_principal(role: str, email: str) -> Optional[dict]:
+    """
+    Resolve the user for a (role, email) pair, using the principal cache
+
+    Args:
+        role (str): student or expert
+        email (str): User email
+
+    Returns:
+        dict: User data or None if the user does not exist
+    """
+    user = principal_cache.get(role, email)
+    if user is not None:
+        return user
+    
+    # Find user in database
+    if role == "student":
+        user = db.students.find_one({"email": email})
+    elif role == "expert":
+        user = db.experts.find_one({"email": email})
+    else:
+        return None
+    
+    if user is None:
+        return None
+    
+    principal = {
+        "id": str(user["_id"]),
+        "email": user["email"],
+        "role": role,
+        "is_verified": user.get("is_verified", False),
+        "first_name": user.get("first_name", ""),
+        "last_name": user.get("last_name", ""),
+        "profile_image": user.get("profile_image", "")
+    }
+    principal_cache.set(role, email, principal)
+    return principal
+
 async def get_current_user(token: str = Depends(oauth2_scheme)):
     """
     Get the current user from the JWT token
@@ -36,29 +160,20 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
         if token_data.exp < datetime.now(timezone.utc):
             raise credentials_exception
         
-        # Find user in database
-        if token_data.role == "student":
-            user = db.students.find_one({"email": token_data.email})
-        elif token_data.role == "expert":
-            user = db.experts.find_one({"email": token_data.email})
-        else:
+        # Refresh tokens only get new access tokens
+        if token_data.token_type == REFRESH_TOKEN_TYPE:
             raise credentials_exception
         
-        if user is None:
+        # Reject logged out tokens and tokens issued before a password change
+        if is_token_revoked(token_data):
             raise credentials_exception
         
-        # Convert ObjectId to string
-        user["_id"] = str(user["_id"])
+        # Authorize from the token claims, else find user (cached per worker)
+        user = principal_from_token(token_data) or load_principal(token_data.role, token_data.email)
+        if user is None:
+            raise credentials_exception
         
-        return {
-            "id": user["_id"],
-            "email": user["email"],
-            "role": token_data.role,
-            "is_verified": user.get("is_verified", False),
-            "first_name": user.get("first_name", ""),
-            "last_name": user.get("last_name", ""),
-            "profile_image": user.get("profile_image", "")
-        }
+        return user
     except Exception as e:
         print(f"Token validation error: {str(e)}")
         raise credentials_exception
@@ -104,25 +219,22 @@ def get_current_user_from_cookie(access_token: Optional[str] = Cookie(None)):
     if token_data.exp < datetime.now(timezone.utc):
         return None
     
-    # Find user in database
-    if token_data.role == "student":
-        user = db.students.find_one({"email": token_data.email})
-    elif token_data.role == "expert":
-        user = db.experts.find_one({"email": token_data.email})
-    else:
+    if token_data.token_type == REFRESH_TOKEN_TYPE:
         return None
     
-    if user is None:
+    if is_token_revoked(token_data):
         return None
     
-    # Convert ObjectId to string
-    user["_id"] = str(user["_id"])
+    # Authorize from the token claims, else find user (cached per worker)
+    user = principal_from_token(token_data) or load_principal(token_data.role, token_data.email)
+    if user is None:
+        return None
     
     return {
-        "id": user["_id"],
+        "id": user["id"],
         "email": user["email"],
-        "role": token_data.role,
-        "is_verified": user.get("is_verified", False)
+        "role": user["role"],
+        "is_verified": user["is_verified"]
     }
 
 def require_role(required_role: str):
@@ -0,0 +1,214 @@
+"""
+Notification digest job.
+
+Every NOTIFICATION_DIGEST_INTERVAL_SECONDS the job groups pending
+notification events per recipient. A recipient whose oldest pending event is
+older than their digest window (notification_settings.digest_schedule)
+gets one email listing everything that happened; recipients who turned
+email notifications off have their events dropped. All digests of a run are
+rendered in bulk and written to the email outbox in one insert.
+
+Only one process runs the job at a time (lease in `job_locks`). It runs in
+the API process by default and can also be run from cron:
+    python -m app.utils.digest
+"""
+import os
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Tuple
+from pymongo.errors import DuplicateKeyError
+
+from ..db.mongo import db
+from ..db.notifications import (
+    SESSION_BOOKED, NEW_MESSAGE, NEW_REVIEW,
+    pending_by_recipient, mark_digested, digest_window
+)
+from .email import send_bulk_email, FRONTEND_URL
+
+logger = logging.getLogger(__name__)
+
+# Digest configuration
+NOTIFICATION_DIGEST_INTERVAL_SECONDS = float(os.getenv("NOTIFICATION_DIGEST_INTERVAL_SECONDS", 60))
+NOTIFICATION_DIGEST_ENABLED = os.getenv("NOTIFICATION_DIGEST_ENABLED", "true").lower() == "true"
+DIGEST_TEMPLATE = "notification_digest"
+DIGEST_LOCK = "notification_digest"
+DIGEST_LOCK_SECONDS = 300
+
+
+def acquire_lock(name: str, seconds: int) -> bool:
+    """Take a named lease shared by all processes"""
+    now = datetime.now(timezone.utc)
+    try:
+        db.job_locks.find_one_and_update(
+            {"_id": name, "$or": [{"locked_until": {"$lte": now}}, {"locked_until": None}]},
+            {"$set": {"locked_until": now + timedelta(seconds=seconds)}},
+            upsert=True
+        )
+        return True
+    except DuplicateKeyError:
+        # Another process holds the lease
+        return False
+
+
+def release_lock(name: str) -> None:
+    db.job_locks.update_one({"_id": name}, {"$set": {"locked_until": None}})
+
+
+def _load_recipients(groups: List[dict]) -> Dict[Tuple[str, object], dict]:
+    """Load email, name and notification settings of every recipient in two queries"""
+    ids = {"student": [], "expert": []}
+    for group in groups:
+        ids.setdefault(group["_id"]["role"], []).append(group["_id"]["recipient_id"])
+
+    projection = {"email": 1, "first_name": 1, "last_name": 1, "notification_settings": 1}
+    recipients = {}
+    for role, collection in (("student", db.students), ("expert", db.experts)):
+        if ids.get(role):
+            for user in collection.find({"_id": {"$in": ids[role]}}, projection):
+                recipients[(role, user["_id"])] = user
+    return recipients
+
+
+def digest_items(role: str, events: List[dict]) -> List[dict]:
+    """Turn events into the lines of a digest email"""
+    items = []
+    messages_by_sender = {}
+    for event in events:
+        payload = event["payload"]
+        if event["kind"] == SESSION_BOOKED:
+            date = payload["date"]
+            items.append({
+                "title": f"Session booked with {payload['with_name']}",
+                "detail": f"{date.strftime('%A, %B %d, %Y at %I:%M %p')} - {payload['duration']} minutes - {payload['topic']}",
+                "url": f"{FRONTEND_URL}/dashboard/{role}/lessons/{payload['session_id']}"
+            })
+        elif event["kind"] == NEW_MESSAGE:
+            # Collapse several messages from the same sender into one line
+            sender = payload["sender_name"]
+            if sender not in messages_by_sender:
+                messages_by_sender[sender] = {"url": f"{FRONTEND_URL}/dashboard/{role}/messages", "count": 0}
+                items.append(messages_by_sender[sender])
+            entry = messages_by_sender[sender]
+            entry["count"] += 1
+            entry["title"] = f"{entry['count']} new message{'s' if entry['count'] > 1 else ''} from {sender}"
+            entry["detail"] = payload["preview"]
+        elif event["kind"] == NEW_REVIEW:
+            items.append({
+                "title": f"{payload['student_name']} left a {payload['rating']}-star review",
+                "detail": payload.get("comment") or "",
+                "url": f"{FRONTEND_URL}/dashboard/{role}/reviews"
+            })
+
+    for item in items:
+        item.pop("count", None)
+    return items
+
+
+def run_digest(now: datetime = None) -> dict:
+    """
+    Send every digest that is due
+
+    Returns:
+        dict: Number of digests queued and events digested or dropped
+    """
+    now = now or datetime.now(timezone.utc)
+    groups = pending_by_recipient()
+    recipients = _load_recipients(groups)
+
+    messages = []
+    digested = []
+    dropped = []
+    for group in groups:
+        role = group["_id"]["role"]
+        user = recipients.get((role, group["_id"]["recipient_id"]))
+        event_ids = [event["_id"] for event in group["events"]]
+
+        window = digest_window(user.get("notification_settings")) if user else None
+        if user is None or window is None or not user.get("email"):
+            # Deleted account or email notifications turned off
+            dropped.extend(event_ids)
+            continue
+
+        if group["first_at"].replace(tzinfo=timezone.utc) > now - window:
+            continue
+
+        items = digest_items(role, group["events"])
+        count = len(group["events"])
+        messages.append((
+            user["email"],
+            f"You have {count} new update{'s' if count > 1 else ''} on Synapse",
+            {
+                "name": user.get("first_name", ""),
+                "items": items,
+                "frontend_url": FRONTEND_URL
+            }
+        ))
+        digested.extend(event_ids)
+
+    # Queue first: a crash before marking resends rather than loses a digest
+    send_bulk_email(DIGEST_TEMPLATE, messages)
+    mark_digested(digested + dropped)
+
+    return {"digests": len(messages), "events": len(digested), "dropped": len(dropped)}
+
+
+class DigestScheduler:
+    """Runs the digest job periodically inside the API process"""
+
+    def __init__(self, interval: float = NOTIFICATION_DIGEST_INTERVAL_SECONDS):
+        self.interval = interval
+        self._task = None
+        self.runs = 0
+        self.last_result = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                if acquire_lock(DIGEST_LOCK, DIGEST_LOCK_SECONDS):
+                    try:
+                        self.last_result = await loop.run_in_executor(None, run_digest)
+                        self.runs += 1
+                    finally:
+                        release_lock(DIGEST_LOCK)
+            except Exception as e:
+                logger.error(f"Notification digest failed: {str(e)}")
+
+    def start(self):
+        """Start the periodic job (call from a running event loop)"""
+        if NOTIFICATION_DIGEST_ENABLED and self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def snapshot(self) -> dict:
+        return {
+            "enabled": NOTIFICATION_DIGEST_ENABLED,
+            "interval_seconds": self.interval,
+            "runs": self.runs,
+            "last_result": self.last_result
+        }
+
+
+digest_scheduler = DigestScheduler()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    if acquire_lock(DIGEST_LOCK, DIGEST_LOCK_SECONDS):
+        try:
+            print(run_digest())
+        finally:
+            release_lock(DIGEST_LOCK)
+    else:
+        print("Another process is running the digest")
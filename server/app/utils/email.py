@@ -1,32 +1,90 @@
 import os
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+from typing import Optional
 from dotenv import load_dotenv
-from jinja2 import Environment, FileSystemLoader
+from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache
 import logging
 from datetime import datetime
 
+from ..db.email_outbox import new_message, enqueue, enqueue_many
+from .mailer import outbox_workers
+
 # Load environment variables
 load_dotenv()
 
 # Email configuration
-SMTP_SERVER = os.getenv("SMTP_SERVER")
-SMTP_PORT = int(os.getenv("SMTP_PORT", 587))
-SMTP_USERNAME = os.getenv("SMTP_USERNAME")
-SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
-EMAIL_FROM = os.getenv("EMAIL_FROM")
 FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:3000")
 
-# Set up Jinja2 environment for email templates
+# Template configuration: outside development, templates are compiled once
+# and never checked for changes on disk
+EMAIL_TEMPLATE_AUTO_RELOAD = os.getenv("ENVIRONMENT", "development") == "development"
+# Unset: Jinja2's per-user cache directory (created 0700, ownership checked)
+EMAIL_TEMPLATE_CACHE_DIR = os.getenv("EMAIL_TEMPLATE_CACHE_DIR")
+
+def template_bytecode_cache(directory: Optional[str] = EMAIL_TEMPLATE_CACHE_DIR) -> FileSystemBytecodeCache:
+    """
+    Bytecode cache in a directory only this user can read and write
+    
+    Cached bytecode is executed when templates load, so the directory must
+    not be writable by anyone else.
+    
+    Raises:
+        PermissionError: If the directory belongs to another user
+    """
+    if directory is None:
+        return FileSystemBytecodeCache()
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    if hasattr(os, "getuid") and os.stat(directory).st_uid != os.getuid():
+        raise PermissionError(f"Email template cache {directory} belongs to another user")
+    os.chmod(directory, 0o700)
+    return FileSystemBytecodeCache(directory)
+
+# Set up Jinja2 environment for email templates. Compiled templates are also
+# kept in a bytecode cache on disk, so new worker processes skip parsing.
 template_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "templates")
-env = Environment(loader=FileSystemLoader(template_dir))
+env = Environment(
+    loader=FileSystemLoader(template_dir),
+    bytecode_cache=template_bytecode_cache(),
+    auto_reload=EMAIL_TEMPLATE_AUTO_RELOAD,
+    cache_size=-1
+)
 
 logger = logging.getLogger(__name__)
 
+def precompile_templates():
+    """
+    Compile every email template into the environment cache
+    
+    Returns:
+        list: Names of the compiled templates
+    """
+    names = env.list_templates(extensions=["html"])
+    for name in names:
+        env.get_template(name)
+    logger.info(f"Compiled {len(names)} email templates")
+    return names
+
+def render_email(template_name, context):
+    """
+    Render an email template
+    
+    Args:
+        template_name (str): Name of the template file (without extension)
+        context (dict): Context variables for the template
+    
+    Returns:
+        str: Rendered HTML
+    """
+    # Add current year to context for copyright notices
+    context["current_year"] = datetime.now().year
+    template = env.get_template(f"{template_name}.html")
+    return template.render(**context)
+
 def send_email(to_email, subject, template_name, context):
     """
-    Send an email using a template
+    Render an email and queue it for delivery
+    
+    The message is written to the email outbox and delivered by the
+    background workers in app/utils/mailer.py, with retries.
     
     Args:
         to_email (str): Recipient email address
@@ -35,46 +93,56 @@ def send_email(to_email, subject, template_name, context):
         context (dict): Context variables for the template
     
     Returns:
-        bool: True if email was sent successfully, False otherwise
+        bool: True if the email was queued, False otherwise
     """
     try:
-        # Add current year to context for copyright notices
-        context["current_year"] = datetime.now().year
-        
-        # If in development mode without SMTP credentials, just log the email
-        if not all([SMTP_SERVER, SMTP_USERNAME, SMTP_PASSWORD]):
-            logger.info(f"[DEV MODE] Would send email to {to_email}")
-            logger.info(f"Subject: {subject}")
-            logger.info(f"Template: {template_name}")
-            logger.info(f"Context: {context}")
-            return True
-            
-        # Create message
-        message = MIMEMultipart()
-        message["From"] = EMAIL_FROM
-        message["To"] = to_email
-        message["Subject"] = subject
-        
-        # Render template
-        template = env.get_template(f"{template_name}.html")
-        html_content = template.render(**context)
-        
-        # Attach HTML content
-        message.attach(MIMEText(html_content, "html"))
-        
-        # Connect to SMTP server and send email
-        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-            server.starttls()
-            server.login(SMTP_USERNAME, SMTP_PASSWORD)
-            server.send_message(message)
-        
-        logger.info(f"Email sent to {to_email}")
+        html_content = render_email(template_name, context)
+        enqueue(new_message(to_email, subject, html_content, template_name))
+        outbox_workers.notify()
         return True
     
     except Exception as e:
-        logger.error(f"Failed to send email to {to_email}: {str(e)}")
+        logger.error(f"Failed to queue email to {to_email}: {str(e)}")
         return False
 
+def render_many(template_name, contexts):
+    """
+    Render one template for many recipients
+    
+    Args:
+        template_name (str): Name of the template file (without extension)
+        contexts (list): Context dict per message
+    
+    Returns:
+        list: Rendered HTML per context
+    """
+    template = env.get_template(f"{template_name}.html")
+    current_year = datetime.now().year
+    return [template.render({**context, "current_year": current_year}) for context in contexts]
+
+def send_bulk_email(template_name, messages):
+    """
+    Render and queue many emails built from the same template
+    
+    All messages are written to the outbox in a single insert.
+    
+    Args:
+        template_name (str): Name of the template file (without extension)
+        messages (list): (to_email, subject, context) tuples
+    
+    Returns:
+        int: Number of queued emails
+    """
+    if not messages:
+        return 0
+    html_contents = render_many(template_name, [context for _, _, context in messages])
+    enqueue_many([
+        new_message(to_email, subject, html_content, template_name)
+        for (to_email, subject, _), html_content in zip(messages, html_contents)
+    ])
+    outbox_workers.notify()
+    return len(messages)
+
 def send_verification_code_email(user_email, first_name, verification_code):
     """Send email with verification code"""
     context = {
@@ -0,0 +1,324 @@
+"""
+Background delivery of the email outbox.
+
+Each API worker process runs EMAIL_OUTBOX_WORKERS delivery loops. A loop
+claims a batch of due messages from the outbox, sends them over one pooled
+SMTP connection on a thread (smtplib blocks) and records the results. Loops
+sleep until either a new message is enqueued by this process or
+EMAIL_POLL_SECONDS pass, so messages enqueued by other processes and
+scheduled retries are picked up as well.
+
+Authenticated SMTP connections are kept open in `SMTPConnectionPool` and
+reused across batches, so STARTTLS and login happen once per connection
+instead of once per message. Connections are recycled after an error, after
+SMTP_IDLE_SECONDS without use or after SMTP_MAX_MESSAGES_PER_CONNECTION
+messages.
+"""
+import os
+import time
+import uuid
+import asyncio
+import logging
+import smtplib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+from typing import List, Optional, Tuple
+from dotenv import load_dotenv
+
+from ..db.email_outbox import claim_batch, mark_sent, mark_failed, pending_count, FAILED
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# SMTP configuration
+SMTP_SERVER = os.getenv("SMTP_SERVER")
+SMTP_PORT = int(os.getenv("SMTP_PORT", 587))
+SMTP_USERNAME = os.getenv("SMTP_USERNAME")
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
+EMAIL_FROM = os.getenv("EMAIL_FROM")
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "true").lower() == "true"
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", 30))
+
+# Delivery configuration
+EMAIL_OUTBOX_WORKERS = int(os.getenv("EMAIL_OUTBOX_WORKERS", 2))
+EMAIL_POLL_SECONDS = float(os.getenv("EMAIL_POLL_SECONDS", 5))
+EMAIL_BATCH_SIZE = int(os.getenv("EMAIL_BATCH_SIZE", 20))
+SMTP_IDLE_SECONDS = float(os.getenv("SMTP_IDLE_SECONDS", 30))
+SMTP_MAX_MESSAGES_PER_CONNECTION = int(os.getenv("SMTP_MAX_MESSAGES_PER_CONNECTION", 500))
+
+
+def build_mime(message: dict) -> MIMEMultipart:
+    """Build the MIME message for an outbox document"""
+    mime = MIMEMultipart()
+    mime["From"] = EMAIL_FROM
+    mime["To"] = message["to"]
+    mime["Subject"] = message["subject"]
+    mime.attach(MIMEText(message["html"], "html"))
+    return mime
+
+
+def smtp_configured() -> bool:
+    """Without SMTP credentials (development) email is only logged"""
+    return all([SMTP_SERVER, SMTP_USERNAME, SMTP_PASSWORD])
+
+
+class SMTPConnectionPool:
+    """
+    Thread-safe pool of open, authenticated SMTP connections.
+
+    `send_batch` sends several messages over one connection. A message the
+    server rejects (4xx/5xx reply) fails on its own and the connection is
+    reset and reused; a broken connection is dropped and the rest of the
+    batch continues on a fresh one. When no connection can be opened every
+    remaining message fails with the connection error.
+    """
+
+    def __init__(self, host: str = SMTP_SERVER, port: int = SMTP_PORT,
+                 username: Optional[str] = SMTP_USERNAME, password: Optional[str] = SMTP_PASSWORD,
+                 starttls: bool = SMTP_STARTTLS, size: int = EMAIL_OUTBOX_WORKERS,
+                 idle_seconds: float = SMTP_IDLE_SECONDS,
+                 max_messages: int = SMTP_MAX_MESSAGES_PER_CONNECTION):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.size = size
+        self.idle_seconds = idle_seconds
+        self.max_messages = max_messages
+        self._lock = threading.Lock()
+        # Idle connections: [connection, last used (monotonic), messages sent]
+        self._idle = []
+        self.connections_opened = 0
+        self.connections_recycled = 0
+        self.messages_sent = 0
+
+    def _connect(self) -> list:
+        connection = smtplib.SMTP(self.host, self.port, timeout=SMTP_TIMEOUT)
+        try:
+            if self.starttls:
+                connection.starttls()
+            if self.username and self.password:
+                connection.login(self.username, self.password)
+        except Exception:
+            connection.close()
+            raise
+        with self._lock:
+            self.connections_opened += 1
+        return [connection, time.monotonic(), 0]
+
+    def _close(self, entry: list):
+        with self._lock:
+            self.connections_recycled += 1
+        try:
+            entry[0].quit()
+        except Exception:
+            entry[0].close()
+
+    def _acquire(self) -> list:
+        while True:
+            with self._lock:
+                entry = self._idle.pop() if self._idle else None
+            if entry is None:
+                return self._connect()
+            if time.monotonic() - entry[1] > self.idle_seconds:
+                # The server has likely dropped it already
+                self._close(entry)
+                continue
+            return entry
+
+    def _release(self, entry: list):
+        entry[1] = time.monotonic()
+        with self._lock:
+            if entry[2] < self.max_messages and len(self._idle) < self.size:
+                self._idle.append(entry)
+                return
+        self._close(entry)
+
+    def send_batch(self, messages: List[dict]) -> List[Tuple[dict, Optional[str]]]:
+        """
+        Send messages over one pooled connection
+
+        Args:
+            messages (list): Outbox documents
+
+        Returns:
+            list: (message, error) pairs, error is None for delivered messages
+        """
+        results = []
+        entry = None
+        for position, message in enumerate(messages):
+            if entry is None:
+                try:
+                    entry = self._acquire()
+                except Exception as e:
+                    # No connection (server down, login refused): the rest of the batch fails with it
+                    error = f"SMTP connection failed: {e}"
+                    results.extend((pending, error) for pending in messages[position:])
+                    break
+            try:
+                entry[0].send_message(build_mime(message))
+                entry[2] += 1
+                results.append((message, None))
+            except (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused) as e:
+                # Rejected by the server, the connection itself is still usable
+                results.append((message, str(e)))
+                try:
+                    entry[0].rset()
+                except Exception:
+                    self._close(entry)
+                    entry = None
+            except Exception as e:
+                results.append((message, str(e)))
+                self._close(entry)
+                entry = None
+
+        if entry is not None:
+            self._release(entry)
+        with self._lock:
+            self.messages_sent += sum(1 for _, error in results if error is None)
+        return results
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for entry in idle:
+            self._close(entry)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "idle_connections": len(self._idle),
+                "connections_opened": self.connections_opened,
+                "connections_recycled": self.connections_recycled,
+                "messages_sent": self.messages_sent,
+                "messages_per_connection": round(self.messages_sent / self.connections_opened, 2) if self.connections_opened else None
+            }
+
+
+smtp_pool = SMTPConnectionPool()
+
+
+def deliver_batch(messages: List[dict]) -> List[Tuple[dict, Optional[str]]]:
+    """Send outbox messages, returning (message, error) pairs"""
+    if not smtp_configured():
+        for message in messages:
+            logger.info(f"[DEV MODE] Would send email to {message['to']}")
+            logger.info(f"Subject: {message['subject']}")
+            logger.info(f"Template: {message.get('template')}")
+        return [(message, None) for message in messages]
+
+    return smtp_pool.send_batch(messages)
+
+
+class OutboxWorkers:
+    """Pool of delivery loops for the email outbox"""
+
+    def __init__(self, workers: int = EMAIL_OUTBOX_WORKERS):
+        self.workers = workers
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="mailer")
+        self._lock = threading.Lock()
+        self._loop = None
+        self._wakeup = None
+        self._tasks = []
+        self.delivered = 0
+        self.retried = 0
+        self.failed = 0
+        self.batches = 0
+        self.total_delivery_ms = 0.0
+
+    def start(self):
+        """Start the delivery loops (call from a running event loop)"""
+        if self._tasks:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        prefix = uuid.uuid4().hex[:8]
+        self._tasks = [
+            self._loop.create_task(self._run(f"{prefix}-{index}"))
+            for index in range(self.workers)
+        ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._executor.shutdown(wait=False)
+        smtp_pool.close()
+
+    def notify(self):
+        """Wake the delivery loops after an enqueue (safe from any thread)"""
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def _wait(self):
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), EMAIL_POLL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
+
+    async def _run(self, worker_id: str):
+        while True:
+            try:
+                messages = claim_batch(worker_id, EMAIL_BATCH_SIZE)
+            except Exception as e:
+                logger.error(f"Failed to claim outbox messages: {str(e)}")
+                messages = []
+
+            if not messages:
+                await self._wait()
+                continue
+
+            try:
+                await self._deliver(messages)
+            except Exception as e:
+                # The messages stay leased and are claimed again once the lease runs out
+                logger.error(f"Failed to deliver {len(messages)} outbox messages: {str(e)}")
+                await self._wait()
+
+    async def _deliver(self, messages: List[dict]):
+        started = time.perf_counter()
+        results = await self._loop.run_in_executor(self._executor, deliver_batch, messages)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        sent = [message["_id"] for message, error in results if error is None]
+        mark_sent(sent)
+        for message, error in results:
+            if error is None:
+                continue
+            state = mark_failed(message, error)
+            with self._lock:
+                if state == FAILED:
+                    self.failed += 1
+                else:
+                    self.retried += 1
+            logger.error(f"Failed to send email to {message['to']} (attempt {message.get('attempts', 0) + 1}): {error}")
+
+        with self._lock:
+            self.delivered += len(sent)
+            self.batches += 1
+            self.total_delivery_ms += elapsed_ms
+        if sent:
+            logger.info(f"Sent {len(sent)} emails in {elapsed_ms:.0f} ms")
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "running": len(self._tasks),
+                "pending": pending_count(),
+                "delivered": self.delivered,
+                "retried": self.retried,
+                "failed": self.failed,
+                "batches": self.batches,
+                "avg_batch_ms": round(self.total_delivery_ms / self.batches, 3) if self.batches else None,
+                "smtp": smtp_pool.snapshot()
+            }
+
+
+outbox_workers = OutboxWorkers()
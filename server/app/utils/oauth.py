@@ -0,0 +1,173 @@
+"""
+OAuth client for social login.
+
+Every Authlib client shares one pooled httpx transport, so token exchanges
+and userinfo calls reuse keep-alive connections instead of paying a TLS
+handshake per login. The provider's OpenID discovery document and JWKS are
+fetched ahead of time and refreshed in the background; Authlib finds them
+already loaded in `server_metadata` and never fetches them on a login.
+
+Set OAUTH_PROVIDER=stub to log in against the local stub provider in
+app/utils/oauth_stub.py instead of Google.
+"""
+import os
+import time
+import asyncio
+import logging
+from typing import Optional
+import httpx
+from authlib.integrations.starlette_client import OAuth
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# OAuth client configuration
+OAUTH_PROVIDER = os.getenv("OAUTH_PROVIDER", "google")
+OAUTH_STUB_URL = os.getenv("OAUTH_STUB_URL", "http://127.0.0.1:8900")
+GOOGLE_DISCOVERY_URL = "https://accounts.google.com/.well-known/openid-configuration"
+OAUTH_HTTP_MAX_CONNECTIONS = int(os.getenv("OAUTH_HTTP_MAX_CONNECTIONS", 20))
+OAUTH_HTTP_KEEPALIVE_SECONDS = float(os.getenv("OAUTH_HTTP_KEEPALIVE_SECONDS", 60))
+OAUTH_HTTP_TIMEOUT = float(os.getenv("OAUTH_HTTP_TIMEOUT", 10))
+OAUTH_METADATA_REFRESH_SECONDS = float(os.getenv("OAUTH_METADATA_REFRESH_SECONDS", 3600))
+
+
+def discovery_url() -> str:
+    """Get the OpenID discovery URL of the configured provider"""
+    if OAUTH_PROVIDER == "stub":
+        return f"{OAUTH_STUB_URL}/.well-known/openid-configuration"
+    return GOOGLE_DISCOVERY_URL
+
+
+class SharedTransport(httpx.AsyncBaseTransport):
+    """
+    Pooled transport handed to every OAuth client.
+
+    Authlib opens and closes a client per call; closing a client must not
+    close the shared connection pool, so `aclose` is a no-op and the pool is
+    only closed by `close_pool` on shutdown.
+    """
+
+    def __init__(self, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self._transport = transport or httpx.AsyncHTTPTransport(
+            limits=httpx.Limits(
+                max_connections=OAUTH_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=OAUTH_HTTP_MAX_CONNECTIONS,
+                keepalive_expiry=OAUTH_HTTP_KEEPALIVE_SECONDS
+            ),
+            retries=1
+        )
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self._transport.handle_async_request(request)
+
+    async def aclose(self):
+        pass
+
+    async def close_pool(self):
+        await self._transport.aclose()
+
+
+oauth_transport = SharedTransport()
+http_client = httpx.AsyncClient(transport=oauth_transport, timeout=OAUTH_HTTP_TIMEOUT)
+
+oauth = OAuth()
+oauth.register(
+    name="google",
+    client_id=os.getenv("GOOGLE_CLIENT_ID"),
+    client_secret=os.getenv("GOOGLE_CLIENT_SECRET"),
+    server_metadata_url=discovery_url(),
+    client_kwargs={
+        "scope": "openid email profile",
+        "transport": oauth_transport,
+        "timeout": OAUTH_HTTP_TIMEOUT
+    },
+    authorize_params={"access_type": "offline", "prompt": "consent"},
+    authorize_state=os.getenv("FASTAPI_SECRET_KEY"),
+    # Make sure this matches the route you're handling callbacks on
+    redirect_uri=os.getenv("REDIRECT_URL", "http://127.0.0.1:8000/api/auth"),
+)
+
+
+class ProviderMetadata:
+    """Keeps a provider's discovery document and JWKS loaded and fresh"""
+
+    def __init__(self, client_app, url: str, refresh_seconds: float = OAUTH_METADATA_REFRESH_SECONDS):
+        self.client_app = client_app
+        self.url = url
+        self.refresh_seconds = refresh_seconds
+        self._task = None
+        self.refreshes = 0
+        self.failures = 0
+        self.last_refresh_ms = None
+        self.loaded_at = None
+
+    async def refresh(self):
+        """Fetch the discovery document and JWKS and hand them to Authlib"""
+        started = time.perf_counter()
+        response = await http_client.get(self.url)
+        response.raise_for_status()
+        metadata = response.json()
+
+        if metadata.get("jwks_uri"):
+            jwks_response = await http_client.get(metadata["jwks_uri"])
+            jwks_response.raise_for_status()
+            metadata["jwks"] = jwks_response.json()
+
+        # Authlib skips its own fetch once `_loaded_at` is present
+        metadata["_loaded_at"] = time.time()
+        self.client_app.server_metadata.update(metadata)
+
+        self.loaded_at = metadata["_loaded_at"]
+        self.refreshes += 1
+        self.last_refresh_ms = round((time.perf_counter() - started) * 1000, 3)
+
+    async def _run(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                # Keep serving the previous metadata, Authlib fetches it on demand if there is none
+                self.failures += 1
+                logger.error(f"Failed to refresh OAuth metadata from {self.url}: {str(e)}")
+            await asyncio.sleep(self.refresh_seconds)
+
+    def start(self):
+        """Start refreshing in the background (call from a running event loop)"""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def snapshot(self) -> dict:
+        return {
+            "url": self.url,
+            "refreshes": self.refreshes,
+            "failures": self.failures,
+            "last_refresh_ms": self.last_refresh_ms,
+            "age_seconds": round(time.time() - self.loaded_at, 3) if self.loaded_at else None,
+            "has_jwks": "jwks" in self.client_app.server_metadata
+        }
+
+
+google_metadata = ProviderMetadata(oauth.google, discovery_url())
+
+
+def start_oauth_client():
+    """Load provider metadata now and keep it fresh"""
+    google_metadata.start()
+
+
+async def close_oauth_client():
+    """Stop the metadata refresh and close pooled connections"""
+    await google_metadata.stop()
+    await http_client.aclose()
+    await oauth_transport.close_pool()
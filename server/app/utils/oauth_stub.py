@@ -0,0 +1,147 @@
+"""
+Local OpenID Connect provider for tests and benchmarks.
+
+Implements just enough of Google's flow for the `/login-google` and callback
+handlers: discovery, an authorize endpoint that immediately redirects back
+with a code, a token endpoint issuing RS256 id_tokens, userinfo and JWKS.
+Nothing is persisted and every login succeeds.
+
+Run it next to the API and start the API with OAUTH_PROVIDER=stub:
+    python -m app.utils.oauth_stub [--port 8900]
+
+In-process callers can use `stub_transport()` with httpx instead.
+"""
+import os
+import time
+import base64
+import secrets
+import argparse
+from urllib.parse import urlencode
+import httpx
+from authlib.jose import JsonWebKey, jwt
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, RedirectResponse
+from starlette.routing import Route
+
+# Stub provider configuration
+OAUTH_STUB_URL = os.getenv("OAUTH_STUB_URL", "http://127.0.0.1:8900")
+OAUTH_STUB_EMAIL = os.getenv("OAUTH_STUB_EMAIL", "stub.user@example.com")
+TOKEN_LIFETIME_SECONDS = 3600
+
+_signing_key = JsonWebKey.generate_key("RSA", 2048, is_private=True, options={"kid": "stub"})
+_codes = {}
+_tokens = {}
+
+
+def _user(email: str) -> dict:
+    return {
+        "sub": f"stub-{email}",
+        "email": email,
+        "email_verified": True,
+        "name": email.split("@")[0].replace(".", " ").title(),
+        "picture": None
+    }
+
+
+def _client_id(request: Request, form) -> str:
+    """Client id from HTTP Basic auth (client_secret_basic) or the form"""
+    authorization = request.headers.get("authorization", "")
+    if authorization.lower().startswith("basic "):
+        decoded = base64.b64decode(authorization[6:]).decode("utf-8")
+        return decoded.split(":", 1)[0]
+    return form.get("client_id", "")
+
+
+async def discovery(request: Request):
+    return JSONResponse({
+        "issuer": OAUTH_STUB_URL,
+        "authorization_endpoint": f"{OAUTH_STUB_URL}/authorize",
+        "token_endpoint": f"{OAUTH_STUB_URL}/token",
+        "userinfo_endpoint": f"{OAUTH_STUB_URL}/userinfo",
+        "jwks_uri": f"{OAUTH_STUB_URL}/certs",
+        "response_types_supported": ["code"],
+        "subject_types_supported": ["public"],
+        "id_token_signing_alg_values_supported": ["RS256"],
+        "scopes_supported": ["openid", "email", "profile"],
+        "token_endpoint_auth_methods_supported": ["client_secret_basic", "client_secret_post"]
+    })
+
+
+async def certs(request: Request):
+    return JSONResponse({"keys": [_signing_key.as_dict(is_private=False)]})
+
+
+async def authorize(request: Request):
+    """Approve immediately; `login_hint` picks the email of the logged in user"""
+    params = request.query_params
+    code = secrets.token_urlsafe(24)
+    _codes[code] = {
+        "email": params.get("login_hint") or OAUTH_STUB_EMAIL,
+        "nonce": params.get("nonce")
+    }
+    query = urlencode({"code": code, "state": params.get("state", "")})
+    return RedirectResponse(f"{params['redirect_uri']}?{query}", status_code=302)
+
+
+async def token(request: Request):
+    form = await request.form()
+    grant = _codes.pop(form.get("code"), None)
+    if grant is None:
+        return JSONResponse({"error": "invalid_grant"}, status_code=400)
+
+    now = int(time.time())
+    user = _user(grant["email"])
+    claims = {
+        **user,
+        "iss": OAUTH_STUB_URL,
+        "aud": _client_id(request, form),
+        "iat": now,
+        "exp": now + TOKEN_LIFETIME_SECONDS
+    }
+    if grant["nonce"]:
+        claims["nonce"] = grant["nonce"]
+
+    access_token = secrets.token_urlsafe(32)
+    _tokens[access_token] = user
+    id_token = jwt.encode({"alg": "RS256", "kid": "stub"}, claims, _signing_key).decode("utf-8")
+    return JSONResponse({
+        "access_token": access_token,
+        "token_type": "Bearer",
+        "expires_in": TOKEN_LIFETIME_SECONDS,
+        "scope": "openid email profile",
+        "id_token": id_token
+    })
+
+
+async def userinfo(request: Request):
+    access_token = request.headers.get("authorization", "")[len("Bearer "):]
+    user = _tokens.get(access_token)
+    if user is None:
+        return JSONResponse({"error": "invalid_token"}, status_code=401)
+    return JSONResponse(user)
+
+
+app = Starlette(routes=[
+    Route("/.well-known/openid-configuration", discovery),
+    Route("/certs", certs),
+    Route("/authorize", authorize),
+    Route("/token", token, methods=["POST"]),
+    Route("/userinfo", userinfo),
+])
+
+
+def stub_transport() -> httpx.ASGITransport:
+    """Transport that serves OAuth requests from the stub without a socket"""
+    return httpx.ASGITransport(app=app)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Run the local OpenID Connect stub provider")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    args = parser.parse_args()
+
+    uvicorn.run(app, host=args.host, port=args.port)
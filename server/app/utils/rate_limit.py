@@ -0,0 +1,207 @@
+"""
+Sliding-window rate limiting for expensive endpoints.
+
+Login, forgot-password and resend-verification run bcrypt or send email.
+Each call is checked against limits keyed by client IP and by email before
+any of that work starts, and rejected with 429 once a limit is reached.
+
+The window is a sliding-window counter: the count of the current fixed
+window plus the previous window's count weighted by how much of it still
+overlaps the sliding window. That needs two counters per key instead of a
+timestamp per request.
+
+Counters live in a per-worker memory backend by default. With several
+workers behind a load balancer, set RATE_LIMIT_BACKEND=mongo to share them
+through the `rate_limits` collection, or pass any object implementing
+`hit()` to `RateLimiter`.
+"""
+import os
+import time
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import Optional, Tuple
+from cachetools import TTLCache
+from fastapi import HTTPException, Request, status
+from pymongo import ReturnDocument
+from dotenv import load_dotenv
+
+from ..db.mongo import db
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Rate limit configuration, limits are "<requests>/<seconds>"
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", 100000))
+RATE_LIMIT_TRUST_PROXY = os.getenv("RATE_LIMIT_TRUST_PROXY", "false").lower() == "true"
+LOGIN_RATE_LIMIT_IP = os.getenv("LOGIN_RATE_LIMIT_IP", "30/60")
+LOGIN_RATE_LIMIT_EMAIL = os.getenv("LOGIN_RATE_LIMIT_EMAIL", "10/300")
+EMAIL_RATE_LIMIT_IP = os.getenv("EMAIL_RATE_LIMIT_IP", "10/600")
+EMAIL_RATE_LIMIT_EMAIL = os.getenv("EMAIL_RATE_LIMIT_EMAIL", "3/600")
+
+
+def parse_limit(value: str) -> Tuple[int, int]:
+    """Parse a "<requests>/<seconds>" limit"""
+    requests, seconds = value.split("/")
+    return int(requests), int(seconds)
+
+
+class MemoryBackend:
+    """Per-worker counters; entries expire after two windows"""
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._caches = {}
+
+    def _cache(self, window: int) -> TTLCache:
+        cache = self._caches.get(window)
+        if cache is None:
+            cache = self._caches[window] = TTLCache(maxsize=self.max_keys, ttl=2 * window)
+        return cache
+
+    def hit(self, key: str, window: int, now: float) -> Tuple[int, int]:
+        """
+        Count a request and return the previous and current window counts
+
+        Args:
+            key (str): Limited key, e.g. "login:ip:1.2.3.4"
+            window (int): Window length in seconds
+            now (float): Current time in seconds
+
+        Returns:
+            tuple: (previous window count, current window count)
+        """
+        index = int(now // window)
+        with self._lock:
+            cache = self._cache(window)
+            counts = cache.get(key)
+            if counts is None or counts[0] < index - 1:
+                counts = [index, 0, 0]
+            elif counts[0] == index - 1:
+                counts = [index, counts[2], 0]
+            counts[2] += 1
+            cache[key] = counts
+            return counts[1], counts[2]
+
+
+class MongoBackend:
+    """Counters shared by all workers, one document per key and window"""
+
+    def __init__(self, collection=None):
+        self.collection = collection if collection is not None else db.rate_limits
+
+    def hit(self, key: str, window: int, now: float) -> Tuple[int, int]:
+        index = int(now // window)
+        expires_at = datetime.fromtimestamp((index + 2) * window, timezone.utc)
+        current = self.collection.find_one_and_update(
+            {"_id": f"{key}:{index}"},
+            {"$inc": {"count": 1}, "$setOnInsert": {"expires_at": expires_at}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        previous = self.collection.find_one({"_id": f"{key}:{index - 1}"}, {"count": 1})
+        return (previous or {}).get("count", 0), current["count"]
+
+
+def create_backend(name: str = RATE_LIMIT_BACKEND):
+    """Build the configured backend"""
+    if name == "mongo":
+        return MongoBackend()
+    return MemoryBackend()
+
+
+class RateLimiter:
+    """Sliding-window limit of `limit` requests per `window` seconds per key"""
+
+    def __init__(self, name: str, limit: str, backend=None):
+        self.name = name
+        self.limit, self.window = parse_limit(limit)
+        self.backend = backend
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.rejected = 0
+
+    def hit(self, key: str) -> Optional[int]:
+        """
+        Count a request for `key`
+
+        Returns:
+            int: Seconds to wait before retrying, or None if the request is allowed
+        """
+        now = time.time()
+        try:
+            previous, current = self.backend.hit(f"{self.name}:{key}", self.window, now)
+        except Exception as e:
+            # Never lock users out because the shared backend is unavailable
+            logger.error(f"Rate limit backend failed for {self.name}: {str(e)}")
+            return None
+
+        overlap = 1 - (now % self.window) / self.window
+        estimate = previous * overlap + current
+        with self._lock:
+            if estimate <= self.limit:
+                self.allowed += 1
+                return None
+            self.rejected += 1
+
+        return max(1, int(self.window - now % self.window))
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "limit": self.limit,
+                "window_seconds": self.window,
+                "allowed": self.allowed,
+                "rejected": self.rejected
+            }
+
+
+rate_limit_backend = create_backend()
+
+login_ip_limiter = RateLimiter("login:ip", LOGIN_RATE_LIMIT_IP, rate_limit_backend)
+login_email_limiter = RateLimiter("login:email", LOGIN_RATE_LIMIT_EMAIL, rate_limit_backend)
+email_ip_limiter = RateLimiter("email:ip", EMAIL_RATE_LIMIT_IP, rate_limit_backend)
+email_address_limiter = RateLimiter("email:address", EMAIL_RATE_LIMIT_EMAIL, rate_limit_backend)
+
+rate_limiters = [login_ip_limiter, login_email_limiter, email_ip_limiter, email_address_limiter]
+
+
+def client_ip(request: Request) -> str:
+    """Get the client address, honouring X-Forwarded-For behind a trusted proxy"""
+    if RATE_LIMIT_TRUST_PROXY:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+def enforce_rate_limit(request: Request, email: Optional[str], ip_limiter: RateLimiter, email_limiter: RateLimiter):
+    """
+    Reject the request with 429 when its IP or email is over the limit
+
+    Args:
+        request (Request): Incoming request
+        email (str, optional): Email the request acts on
+        ip_limiter (RateLimiter): Limiter keyed by client IP
+        email_limiter (RateLimiter): Limiter keyed by email
+
+    Raises:
+        HTTPException: 429 with a Retry-After header
+    """
+    if not RATE_LIMIT_ENABLED:
+        return
+
+    retry_after = ip_limiter.hit(client_ip(request))
+    if retry_after is None and email:
+        retry_after = email_limiter.hit(email.strip().lower())
+
+    if retry_after is not None:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many requests, please try again later",
+            headers={"Retry-After": str(retry_after)},
+        )
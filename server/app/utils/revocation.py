@@ -0,0 +1,178 @@
+"""
+Token revocation for self-contained access tokens.
+
+Revoked token ids (jti) are kept in a Bloom filter backed by an exact
+jti -> expiry map, so the common case (token not revoked) is answered by a
+few bit lookups. Revoking every token of a user (password change or reset)
+is recorded as a per-subject cutoff: tokens issued up to it are rejected.
+The cutoff and token issue times are kept to the microsecond, so tokens
+issued right after a revocation (the caller's new token) stay valid.
+
+Revocations are written to the `revoked_tokens` collection, which a TTL
+index empties once the tokens would have expired anyway. Each worker pulls
+new entries at most every REVOCATION_SYNC_SECONDS.
+"""
+import os
+import time
+import hashlib
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from ..db.mongo import db
+from .JWTtoken import ACCESS_TOKEN_EXPIRE_MINUTES, REFRESH_TOKEN_EXPIRE_DAYS, issued_at
+
+logger = logging.getLogger(__name__)
+
+# Revocation configuration
+REVOCATION_BLOOM_BITS = int(os.getenv("REVOCATION_BLOOM_BITS", 1 << 20))
+REVOCATION_BLOOM_HASHES = int(os.getenv("REVOCATION_BLOOM_HASHES", 7))
+REVOCATION_SYNC_SECONDS = float(os.getenv("REVOCATION_SYNC_SECONDS", 5))
+REVOCATION_REBUILD_SECONDS = float(os.getenv("REVOCATION_REBUILD_SECONDS", 3600))
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings"""
+
+    def __init__(self, bits: int = REVOCATION_BLOOM_BITS, hashes: int = REVOCATION_BLOOM_HASHES):
+        self.bits = bits
+        self.hashes = hashes
+        self._array = bytearray((bits + 7) // 8)
+
+    def _positions(self, value: str):
+        digest = hashlib.blake2b(value.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        # Double hashing (Kirsch-Mitzenmacher)
+        return [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+
+    def add(self, value: str):
+        for position in self._positions(value):
+            self._array[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, value: str) -> bool:
+        return all(self._array[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+
+class RevocationList:
+    """Per-worker view of the revoked_tokens collection"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._bloom = BloomFilter()
+        self._jtis = {}
+        self._subjects = {}
+        self._last_sync = None
+        self._next_sync = 0.0
+        self._next_rebuild = 0.0
+
+    def _key(self, role: str, email: str) -> str:
+        return f"{role}:{email}"
+
+    def _apply(self, entry: dict):
+        expires_at = entry["expires_at"].replace(tzinfo=timezone.utc).timestamp()
+        if entry.get("jti"):
+            self._bloom.add(entry["jti"])
+            self._jtis[entry["jti"]] = expires_at
+        if entry.get("subject"):
+            cutoff = entry["revoked_before"]
+            self._subjects[entry["subject"]] = max(self._subjects.get(entry["subject"], 0), cutoff)
+
+    def _sync(self):
+        """Pull revocations written since the last sync (by any worker)"""
+        now = time.monotonic()
+        if now < self._next_sync:
+            return
+
+        rebuild = now >= self._next_rebuild
+        query = {}
+        if not rebuild and self._last_sync is not None:
+            query = {"created_at": {"$gte": self._last_sync}}
+        # Overlap syncs slightly to tolerate clock skew between workers
+        synced_at = datetime.now(timezone.utc) - timedelta(seconds=1)
+
+        try:
+            entries = list(db.revoked_tokens.find(query))
+        except Exception as e:
+            logger.error(f"Failed to sync revoked tokens: {str(e)}")
+            self._next_sync = now + REVOCATION_SYNC_SECONDS
+            return
+
+        if rebuild:
+            # Bloom filters cannot forget, start over from the live entries
+            self._bloom = BloomFilter()
+            self._jtis = {}
+            self._subjects = {}
+            self._next_rebuild = now + REVOCATION_REBUILD_SECONDS
+
+        for entry in entries:
+            self._apply(entry)
+
+        self._last_sync = synced_at
+        self._next_sync = now + REVOCATION_SYNC_SECONDS
+
+    def revoke_token(self, jti: str, expires_at: datetime):
+        """Revoke a single token (logout)"""
+        entry = {"jti": jti, "expires_at": expires_at, "created_at": datetime.now(timezone.utc)}
+        db.revoked_tokens.insert_one(dict(entry))
+        with self._lock:
+            self._apply(entry)
+
+    def revoke_subject(self, role: str, email: str, expires_at: datetime) -> datetime:
+        """
+        Revoke every token issued to a user until now (password change or reset)
+
+        Args:
+            role (str): student or expert
+            email (str): User email
+            expires_at (datetime): When the longest-lived existing token expires
+
+        Returns:
+            datetime: The cutoff; tokens issued after it stay valid
+        """
+        now = datetime.now(timezone.utc)
+        entry = {
+            "subject": self._key(role, email),
+            "revoked_before": issued_at(now),
+            "expires_at": expires_at,
+            "created_at": now
+        }
+        db.revoked_tokens.insert_one(dict(entry))
+        with self._lock:
+            self._apply(entry)
+        return now
+
+    def is_revoked(self, jti: Optional[str], role: str, email: str, issued_at: Optional[float]) -> bool:
+        """Check a token against the revocation list in O(1)"""
+        with self._lock:
+            self._sync()
+
+            if jti and jti in self._bloom:
+                expires_at = self._jtis.get(jti)
+                if expires_at is not None and expires_at > time.time():
+                    return True
+
+            cutoff = self._subjects.get(self._key(role, email))
+            if cutoff is not None:
+                # Tokens without an issue time predate self-contained tokens
+                return issued_at is None or issued_at <= cutoff
+
+        return False
+
+
+revocation_list = RevocationList()
+
+
+def revoke_user_tokens(role: str, email: str) -> datetime:
+    """
+    Revoke every token issued to a user so far (password change or reset)
+
+    Returns:
+        datetime: The cutoff; issue the caller's new token after it
+    """
+    longest_lifetime = max(
+        timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES),
+        timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    )
+    return revocation_list.revoke_subject(role, email, datetime.now(timezone.utc) + longest_lifetime)
@@ -0,0 +1,64 @@
+from typing import Dict, NamedTuple, Optional
+from cachetools import TTLCache
+import threading
+import os
+
+# Search result cache configuration
+EXPERT_SEARCH_CACHE_SIZE = int(os.getenv("EXPERT_SEARCH_CACHE_SIZE", 5000))
+EXPERT_SEARCH_CACHE_TTL = int(os.getenv("EXPERT_SEARCH_CACHE_TTL", 300))  # seconds
+
+
+class CachedSearch(NamedTuple):
+    body: bytes
+    headers: Dict[str, str]
+
+
+class SearchResultCache:
+    """
+    Per-worker LRU/TTL cache of serialized search_experts responses.
+
+    Entries are keyed by the catalog version of the search index and the
+    canonical query, so an expert write makes every older entry unreachable
+    (they age out of the LRU); the TTL bounds how long unused entries stay.
+    Bodies are the JSON bytes of the response, so a hit skips validation
+    and serialization entirely.
+    """
+
+    def __init__(self, maxsize: int = EXPERT_SEARCH_CACHE_SIZE, ttl: int = EXPERT_SEARCH_CACHE_TTL):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, version: int, key: tuple) -> Optional[CachedSearch]:
+        with self._lock:
+            cached = self._cache.get((version, key))
+            if cached is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return cached
+
+    def set(self, version: int, key: tuple, cached: CachedSearch):
+        with self._lock:
+            self._cache[(version, key)] = cached
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._cache),
+                "maxsize": self._cache.maxsize,
+                "ttl": self._cache.ttl,
+                "bytes": sum(len(cached.body) for cached in self._cache.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+
+search_result_cache = SearchResultCache()
@@ -0,0 +1,261 @@
+"""
+Load profile of the auth stack.
+
+Measures, in one run:
+  - create_access_token and verify_token (cached and uncached)
+  - get_current_user -> get_current_active_user -> require_role for a
+    self-contained token and for a token that needs a user lookup
+  - bcrypt verify at several cost factors, sequentially and through the
+    password hashing pool
+  - POST /api/auth/login end to end at several concurrency levels
+
+Every result reports wall-clock throughput, throughput per CPU-second of
+this process (i.e. per core, bcrypt pool threads included) and tail
+latency. Use it to pick BCRYPT_ROUNDS, PASSWORD_HASH_WORKERS and cache
+sizes from data.
+
+Runs against MONGODB_URI/MONGODB_DB when set; otherwise an in-memory
+mongomock stand-in is used (pip install -r requirements-dev.txt). Rate limiting is
+disabled for the run.
+
+Usage (from the server directory):
+    python -m benchmarks.auth_path [--iterations 5000] [--costs 8,10,12]
+        [--concurrency 1,8,32] [--requests 200]
+"""
+import os
+import time
+import asyncio
+import argparse
+import statistics
+
+os.environ.setdefault("SECRET_KEY", "benchmark-secret-key")
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+BENCH_EMAIL = "bench.auth@example.com"
+BENCH_PASSWORD = "benchmark-password"
+
+
+def use_mongo_stand_in():
+    """Patch pymongo with mongomock unless a real database is configured"""
+    if os.getenv("MONGODB_URI") and os.getenv("MONGODB_DB"):
+        return None
+
+    import mongomock
+
+    os.environ["MONGODB_URI"] = "mongodb://localhost:27017"
+    os.environ["MONGODB_DB"] = "synapse_benchmark"
+    patcher = mongomock.patch(servers=(("localhost", 27017),))
+    patcher.start()
+    return patcher
+
+
+def summarize(samples: list, wall_seconds: float, cpu_seconds: float) -> dict:
+    """Throughput and latency percentiles for a list of per-call seconds"""
+    samples = sorted(samples)
+    count = len(samples)
+    return {
+        "ops_per_sec": round(count / wall_seconds, 1),
+        "ops_per_cpu_sec": round(count / cpu_seconds, 1) if cpu_seconds else None,
+        "mean_ms": round(statistics.fmean(samples) * 1000, 4),
+        "p50_ms": round(samples[count // 2] * 1000, 4),
+        "p95_ms": round(samples[int(count * 0.95)] * 1000, 4),
+        "p99_ms": round(samples[int(count * 0.99)] * 1000, 4),
+        "max_ms": round(samples[-1] * 1000, 4)
+    }
+
+
+def measure(func, iterations: int) -> dict:
+    """Call `func` sequentially"""
+    samples = []
+    wall_started, cpu_started = time.perf_counter(), time.process_time()
+    for _ in range(iterations):
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+    return summarize(samples, time.perf_counter() - wall_started, time.process_time() - cpu_started)
+
+
+async def measure_concurrent(call, total: int, concurrency: int) -> dict:
+    """Run `total` awaits of `call()` with `concurrency` in flight"""
+    samples = []
+    errors = 0
+    remaining = total
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            try:
+                await call()
+            except Exception:
+                errors += 1
+            samples.append(time.perf_counter() - started)
+
+    wall_started, cpu_started = time.perf_counter(), time.process_time()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    result = summarize(samples, time.perf_counter() - wall_started, time.process_time() - cpu_started)
+    result["errors"] = errors
+    return result
+
+
+def bench_tokens(iterations: int) -> dict:
+    from app.utils.JWTtoken import create_access_token, decode_token, verify_token, token_cache
+
+    claims = {
+        "sub": BENCH_EMAIL,
+        "role": "student",
+        "uid": "0123456789abcdef01234567",
+        "verified": True,
+        "first_name": "Bench",
+        "last_name": "User"
+    }
+    token = create_access_token(claims)
+    token_cache.clear()
+    return {
+        "create_access_token": measure(lambda: create_access_token(claims), iterations),
+        "verify_token (uncached)": measure(lambda: decode_token(token), iterations),
+        "verify_token (cached)": measure(lambda: verify_token(token), iterations)
+    }
+
+
+def seed_user(rounds: int) -> str:
+    """Create (or reset) the benchmark student and return its id"""
+    import bcrypt
+    from app.db.mongo import db
+    from app.db.user_directory import upsert_entry
+
+    password_hash = bcrypt.hashpw(BENCH_PASSWORD.encode("utf-8"), bcrypt.gensalt(rounds)).decode("utf-8")
+    db.students.update_one(
+        {"email": BENCH_EMAIL},
+        {"$set": {
+            "first_name": "Bench",
+            "last_name": "User",
+            "password": password_hash,
+            "role": "student",
+            "is_verified": True
+        }},
+        upsert=True
+    )
+    student = db.students.find_one({"email": BENCH_EMAIL})
+    upsert_entry(BENCH_EMAIL, "student", student["_id"], password_hash)
+    return str(student["_id"])
+
+
+def bench_dependency_chain(student_id: str, iterations: int) -> dict:
+    from app.utils import auth
+    from app.utils.JWTtoken import create_access_token, user_claims, token_cache
+
+    claims_token = create_access_token(user_claims(
+        {"_id": student_id, "email": BENCH_EMAIL, "first_name": "Bench", "last_name": "User", "is_verified": True},
+        "student"
+    ))
+    # Tokens without user claims are resolved through load_principal
+    lookup_token = create_access_token({"sub": BENCH_EMAIL, "role": "student"})
+    role_dependency = auth.require_role("student")
+
+    async def chain(token):
+        user = await auth.get_current_user(token)
+        user = await auth.get_current_active_user(user)
+        return await role_dependency(user)
+
+    def cold_lookup():
+        auth.principal_cache.invalidate("student", BENCH_EMAIL)
+        loop.run_until_complete(chain(lookup_token))
+
+    loop = asyncio.new_event_loop()
+    try:
+        token_cache.clear()
+        return {
+            "claims token": measure(lambda: loop.run_until_complete(chain(claims_token)), iterations),
+            "lookup token (principal cached)": measure(lambda: loop.run_until_complete(chain(lookup_token)), iterations),
+            "lookup token (principal cold)": measure(cold_lookup, max(1, iterations // 10))
+        }
+    finally:
+        loop.close()
+
+
+def bench_bcrypt(costs: list, iterations: int) -> dict:
+    import bcrypt
+    from app.utils.hash import PasswordHasher, PASSWORD_HASH_WORKERS, verify_password
+
+    password = BENCH_PASSWORD.encode("utf-8")
+    hasher = PasswordHasher()
+    results = {}
+    for cost in costs:
+        password_hash = bcrypt.hashpw(password, bcrypt.gensalt(cost))
+        results[f"cost {cost} sequential"] = measure(lambda: bcrypt.checkpw(password, password_hash), iterations)
+
+        concurrency = PASSWORD_HASH_WORKERS * 2
+        call = lambda: hasher.run(verify_password, BENCH_PASSWORD, password_hash.decode("utf-8"))
+        results[f"cost {cost} pool x{PASSWORD_HASH_WORKERS}"] = asyncio.run(
+            measure_concurrent(call, iterations * PASSWORD_HASH_WORKERS, concurrency)
+        )
+    return results
+
+
+def bench_login(levels: list, requests: int) -> dict:
+    import httpx
+    from fastapi import FastAPI
+    from app.routes.auth_routes import router as auth_router
+
+    # Only the auth router, so the run does not depend on the recommender stack
+    app = FastAPI()
+    app.include_router(auth_router)
+
+    async def run_level(concurrency: int) -> dict:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            async def login():
+                response = await client.post(
+                    "/api/auth/login",
+                    data={"username": BENCH_EMAIL, "password": BENCH_PASSWORD}
+                )
+                response.raise_for_status()
+
+            # Warm up caches and connections outside the measurement
+            await login()
+            return await measure_concurrent(login, requests, concurrency)
+
+    return {f"concurrency {level}": asyncio.run(run_level(level)) for level in levels}
+
+
+def print_section(title: str, results: dict):
+    print(title)
+    for name, result in results.items():
+        print(f"  {name:34s} {result}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the auth stack")
+    parser.add_argument("--iterations", type=int, default=5000, help="Iterations for token and dependency benchmarks")
+    parser.add_argument("--costs", default="8,10,12", help="Comma-separated bcrypt cost factors")
+    parser.add_argument("--bcrypt-iterations", type=int, default=20)
+    parser.add_argument("--concurrency", default="1,8,32", help="Comma-separated login concurrency levels")
+    parser.add_argument("--requests", type=int, default=200, help="Login requests per concurrency level")
+    args = parser.parse_args()
+
+    patcher = use_mongo_stand_in()
+    try:
+        from app.utils.hash import BCRYPT_ROUNDS, PASSWORD_HASH_WORKERS
+
+        print(f"cpu_count={os.cpu_count()} bcrypt_rounds={BCRYPT_ROUNDS} "
+              f"hash_workers={PASSWORD_HASH_WORKERS} mongo={'mongomock' if patcher else 'MONGODB_URI'}")
+
+        print_section("tokens:", bench_tokens(args.iterations))
+
+        student_id = seed_user(BCRYPT_ROUNDS)
+        print_section("get_current_user -> require_role:", bench_dependency_chain(student_id, args.iterations))
+
+        costs = [int(cost) for cost in args.costs.split(",")]
+        print_section("bcrypt verify:", bench_bcrypt(costs, args.bcrypt_iterations))
+
+        levels = [int(level) for level in args.concurrency.split(",")]
+        print_section("POST /api/auth/login:", bench_login(levels, args.requests))
+    finally:
+        if patcher is not None:
+            patcher.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Microbenchmark of the auth dependency chain with and without the
+decoded-token cache.
+
+Measures verify_token on its own and, when MONGODB_URI/MONGODB_DB point to a
+reachable database, the full get_current_user -> get_current_active_user ->
+require_role chain for a self-contained (claims) token.
+
+Usage (from the server directory):
+    python -m benchmarks.auth_token_cache [--iterations 20000]
+"""
+import os
+import time
+import asyncio
+import argparse
+import statistics
+
+os.environ.setdefault("SECRET_KEY", "benchmark-secret-key")
+
+from app.utils.JWTtoken import create_access_token, decode_token, verify_token, token_cache
+
+
+def sample_token() -> str:
+    return create_access_token({
+        "sub": "bench@example.com",
+        "role": "student",
+        "uid": "0123456789abcdef01234567",
+        "verified": True,
+        "first_name": "Bench",
+        "last_name": "User"
+    })
+
+
+def timed(func, iterations: int) -> dict:
+    """Run `func` repeatedly and report per-call latency in microseconds"""
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1_000_000)
+    samples.sort()
+    return {
+        "ops_per_sec": round(iterations / (sum(samples) / 1_000_000)),
+        "mean_us": round(statistics.fmean(samples), 2),
+        "p50_us": round(samples[len(samples) // 2], 2),
+        "p99_us": round(samples[int(len(samples) * 0.99)], 2)
+    }
+
+
+def bench_verify_token(token: str, iterations: int) -> dict:
+    token_cache.clear()
+    return {
+        "uncached": timed(lambda: decode_token(token), iterations),
+        "cached": timed(lambda: verify_token(token), iterations)
+    }
+
+
+def bench_dependency_chain(token: str, iterations: int) -> dict:
+    from app.utils import auth
+
+    role_dependency = auth.require_role("student")
+
+    async def chain():
+        user = await auth.get_current_user(token)
+        user = await auth.get_current_active_user(user)
+        return await role_dependency(user)
+
+    loop = asyncio.new_event_loop()
+    try:
+        run = lambda: loop.run_until_complete(chain())
+
+        token_cache.clear()
+        original = auth.verify_token
+        auth.verify_token = decode_token
+        try:
+            uncached = timed(run, iterations)
+        finally:
+            auth.verify_token = original
+        cached = timed(run, iterations)
+    finally:
+        loop.close()
+
+    return {"uncached": uncached, "cached": cached}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the decoded-token cache")
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    token = sample_token()
+
+    print("verify_token:")
+    for mode, result in bench_verify_token(token, args.iterations).items():
+        print(f"  {mode:9s} {result}")
+
+    if os.getenv("MONGODB_URI") and os.getenv("MONGODB_DB"):
+        print("get_current_user -> require_role:")
+        for mode, result in bench_dependency_chain(token, args.iterations).items():
+            print(f"  {mode:9s} {result}")
+    else:
+        print("Skipping dependency chain benchmark (MONGODB_URI/MONGODB_DB not set)")
+
+
+if __name__ == "__main__":
+    main()
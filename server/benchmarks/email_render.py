@@ -0,0 +1,90 @@
+"""
+Email template render cost per message.
+
+For every template in app/templates measures:
+  - compiling from source in a fresh environment (a new worker, no cache)
+  - compiling in a fresh environment with the bytecode cache warm
+  - get_template + render with auto_reload on (the previous default, which
+    stats the template file on every email)
+  - get_template + render on the precompiled production environment
+  - render_many, per message, for a digest-sized bulk render
+
+Compare the per-message numbers with the delivery cost reported by
+benchmarks.smtp_delivery: rendering should stay well below it.
+
+Usage (from the server directory):
+    python -m benchmarks.email_render [--iterations 2000] [--bulk 500]
+"""
+import argparse
+from datetime import datetime
+
+from benchmarks.auth_path import use_mongo_stand_in, measure
+
+CONTEXTS = {
+    "verification_code_email": {"first_name": "Ada", "verification_code": "123456"},
+    "password_reset_code": {"first_name": "Ada", "reset_code": "654321"},
+    "welcome_email": {"name": "Ada Lovelace", "role": "student"},
+    "session_confirmation": {
+        "name": "Ada Lovelace",
+        "session": {
+            "id": "0123456789abcdef01234567",
+            "expert_name": "Alan Turing",
+            "date": datetime(2026, 1, 15, 14, 30),
+            "duration": 60,
+            "topic": "Computability"
+        }
+    }
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark email template rendering")
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--bulk", type=int, default=500, help="Messages per render_many call")
+    args = parser.parse_args()
+
+    patcher = use_mongo_stand_in()
+    try:
+        from jinja2 import Environment, FileSystemLoader
+        from app.utils import email
+
+        email.precompile_templates()
+        loader = FileSystemLoader(email.template_dir)
+        reloading_env = Environment(loader=loader, auto_reload=True)
+        compile_iterations = max(1, args.iterations // 20)
+
+        for name, base_context in CONTEXTS.items():
+            filename = f"{name}.html"
+            context = {**base_context, "frontend_url": email.FRONTEND_URL, "current_year": 2026}
+
+            results = {
+                "compile (no cache)": measure(
+                    lambda: Environment(loader=loader).get_template(filename), compile_iterations
+                ),
+                "compile (bytecode cache)": measure(
+                    lambda: Environment(loader=loader, bytecode_cache=email.env.bytecode_cache).get_template(filename),
+                    compile_iterations
+                ),
+                "render (auto_reload)": measure(
+                    lambda: reloading_env.get_template(filename).render(**context), args.iterations
+                ),
+                "render (precompiled)": measure(
+                    lambda: email.env.get_template(filename).render(**context), args.iterations
+                )
+            }
+
+            contexts = [dict(context) for _ in range(args.bulk)]
+            bulk = measure(lambda: email.render_many(name, contexts), max(1, args.iterations // args.bulk))
+            bulk["per_message_ms"] = round(bulk["mean_ms"] / args.bulk, 4)
+            results[f"render_many x{args.bulk}"] = bulk
+
+            print(f"{name}:")
+            for mode, result in results.items():
+                print(f"  {mode:26s} {result}")
+    finally:
+        if patcher is not None:
+            patcher.stop()
+
+
+if __name__ == "__main__":
+    main()
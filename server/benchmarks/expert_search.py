@@ -0,0 +1,190 @@
+"""
+Expert search latency at catalog scale.
+
+Seeds --experts synthetic approved experts (specialty, tags, bio, languages,
+rate, rating) and measures:
+  - the previous specialty filter, an unanchored case-insensitive $regex
+    that scans the whole collection
+  - building and (incrementally) refreshing the in-process search index
+  - pages cut by the index alone for typical find-tutors searches: plain
+    listings, a deep page, filter combinations, text search, typo-tolerant
+    (fuzzy) text search, facets and search box autocomplete
+  - search_experts end to end (one page of 20) for a specialty filter, a
+    text query and a rate-sorted listing, and a repeated search served
+    from the result cache
+
+Runs against MONGODB_URI/MONGODB_DB when set, otherwise against an
+in-memory mongomock stand-in. The stand-in executes every query in Python,
+so the end-to-end search_experts numbers are only measured against a real
+database.
+
+Usage (from the server directory):
+    python -m benchmarks.expert_search [--experts 100000] [--iterations 200]
+"""
+import random
+import asyncio
+import argparse
+from datetime import datetime, timezone, timedelta
+
+from benchmarks.auth_path import use_mongo_stand_in, measure
+
+SPECIALTIES = [
+    "Mathematics", "Calculus", "Linear Algebra", "Statistics", "Physics", "Chemistry",
+    "Biology", "Python Programming", "JavaScript Development", "Data Science",
+    "Machine Learning", "English Literature", "Spanish Language", "French Language",
+    "History", "Economics", "Music Theory", "Guitar", "SAT Preparation", "Essay Writing"
+]
+TAGS = [
+    "algebra", "geometry", "trigonometry", "calculus", "probability", "python", "java",
+    "javascript", "react", "sql", "pandas", "deep-learning", "mechanics", "organic",
+    "genetics", "grammar", "conversation", "writing", "exam-prep", "beginners",
+    "advanced", "kids", "university", "ielts", "toefl", "piano", "guitar", "history"
+]
+LANGUAGES = ["English", "Spanish", "French", "German", "Mandarin", "Hindi", "Arabic", "Portuguese"]
+BIO_WORDS = (
+    "experienced tutor patient friendly structured lessons students exams university "
+    "school teaching years practice projects homework clear explanations goals "
+    "confidence progress feedback interactive online sessions beginners advanced"
+).split()
+FIRST_NAMES = ["Ada", "Alan", "Grace", "Linus", "Marie", "Nikola", "Rosalind", "Emmy", "Carl", "Sofia"]
+LAST_NAMES = ["Lovelace", "Turing", "Hopper", "Torvalds", "Curie", "Tesla", "Franklin", "Noether", "Gauss", "Kovalevskaya"]
+
+BENCH_MARKER = "benchmark-expert"
+
+
+def expert_documents(count: int, seed: int = 7) -> list:
+    """Synthetic, searchable expert documents"""
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    documents = []
+    for index in range(count):
+        specialty = rng.choice(SPECIALTIES)
+        documents.append({
+            "first_name": rng.choice(FIRST_NAMES),
+            "last_name": rng.choice(LAST_NAMES),
+            "email": f"expert{index}@{BENCH_MARKER}.example.com",
+            "specialty": specialty,
+            "tags": rng.sample(TAGS, rng.randint(1, 5)),
+            "bio": f"{specialty} tutor. " + " ".join(rng.choices(BIO_WORDS, k=rng.randint(15, 40))),
+            "languages": rng.sample(LANGUAGES, rng.randint(1, 3)),
+            "hourly_rate": float(rng.randrange(15, 150)),
+            "rating": round(rng.uniform(3.0, 5.0), 2),
+            "completed_sessions": rng.randint(0, 500),
+            "experience_years": rng.randint(1, 30),
+            "education": "Master's Degree",
+            "is_approved": True,
+            "is_verified": True,
+            "created_at": now - timedelta(days=rng.randint(0, 1000)),
+            "updated_at": now
+        })
+    return documents
+
+
+def seed_experts(db, count: int) -> None:
+    """Replace the benchmark experts with `count` fresh ones"""
+    db.experts.delete_many({"email": {"$regex": f"@{BENCH_MARKER}"}})
+    documents = expert_documents(count)
+    for start in range(0, count, 5000):
+        db.experts.insert_many(documents[start:start + 5000])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark expert search")
+    parser.add_argument("--experts", type=int, default=100000)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    patcher = use_mongo_stand_in()
+    try:
+        from app.db.mongo import db
+        from app.db.expert_search import expert_search_index
+        from app.routes.student_routes import search_experts
+        from app.utils.search_cache import search_result_cache
+
+        if patcher is not None:
+            # The stand-in checks unique indexes with a scan per insert
+            db.experts.drop_indexes()
+        seed_experts(db, args.experts)
+        print(f"{args.experts} experts")
+
+        def search(cached: bool = False, **filters):
+            params = {
+                "q": None, "specialty": None, "tags": None, "min_rate": None, "max_rate": None,
+                "min_rating": None, "language": None, "sort": None, "limit": 20, "cursor": None,
+                "current_user": {}
+            }
+            params.update(filters)
+            if not cached:
+                search_result_cache.clear()
+            return asyncio.run(search_experts(**params))
+
+        scan_iterations = max(1, args.iterations // 20)
+        page_filters = {
+            "specialty": None, "tags": None, "language": None,
+            "min_rate": None, "max_rate": None, "min_rating": None
+        }
+
+        def find_page(q=None, sort="rating", cursor=None, fuzzy=False, **filters):
+            return expert_search_index.find_page({**page_filters, **filters}, q, sort, 20, cursor, fuzzy)
+
+        def deep_cursor(pages: int) -> str:
+            cursor = None
+            for _ in range(pages):
+                cursor = find_page(cursor=cursor).next_cursor
+            return cursor
+
+        results = {
+            "$regex specialty scan": measure(
+                lambda: list(db.experts.find({
+                    "is_approved": True, "is_verified": True,
+                    "specialty": {"$regex": "calc", "$options": "i"}
+                })),
+                scan_iterations
+            ),
+            "index build": measure(expert_search_index.build, 1),
+            "index refresh (no changes)": measure(expert_search_index.refresh, 1)
+        }
+        cursor = deep_cursor(100)
+        index_searches = {
+            "first page by rating": lambda: find_page(),
+            "page 101 by rating": lambda: find_page(cursor=cursor),
+            "specialty filter": lambda: find_page(specialty="calc"),
+            "language+tags+rate": lambda: find_page(
+                sort="hourly_rate", language="Spanish", tags=["python", "sql"], min_rate=30, max_rate=80
+            ),
+            "min rating, by sessions": lambda: find_page(sort="completed_sessions", min_rating=4.5),
+            "rare filter combination": lambda: find_page(language="Hindi", tags=["ielts"], min_rating=4.9),
+            "text search, relevance": lambda: find_page(q="python exam", sort="relevance"),
+            "text search, by rate": lambda: find_page(q="calculus", sort="hourly_rate"),
+            "fuzzy search, relevance": lambda: find_page(q="pyhton", sort="relevance", fuzzy=True),
+            "fuzzy search, two terms": lambda: find_page(q="calculas exm", sort="relevance", fuzzy=True),
+            "fuzzy search with filters": lambda: find_page(
+                q="lovelase", sort="rating", fuzzy=True, language="Spanish", min_rating=4
+            ),
+            "autocomplete \"al\"": lambda: expert_search_index.suggest("al"),
+            "facet counts": lambda: expert_search_index._count_facets(
+                expert_search_index._current(), {**page_filters, "language": "Spanish", "min_rate": 30}, None
+            ),
+            "facet counts, cached": lambda: expert_search_index.facets(
+                {**page_filters, "language": "Spanish", "min_rate": 30}
+            )
+        }
+        for name, call in index_searches.items():
+            results[f"index: {name}"] = measure(call, args.iterations)
+        search(specialty="math", language="English")
+        results["search_experts cache hit"] = measure(
+            lambda: search(cached=True, specialty="Math", language="English"), args.iterations
+        )
+        if patcher is None:
+            results["search_experts specialty"] = measure(lambda: search(specialty="calc"), scan_iterations)
+            results["search_experts q"] = measure(lambda: search(q="python exam"), scan_iterations)
+            results["search_experts by rate"] = measure(lambda: search(sort="hourly_rate", min_rating=4), scan_iterations)
+        for mode, result in results.items():
+            print(f"  {mode:36s} {result}")
+    finally:
+        if patcher is not None:
+            patcher.stop()
+
+
+if __name__ == "__main__":
+    main()
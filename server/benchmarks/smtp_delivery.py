@@ -0,0 +1,115 @@
+"""
+SMTP delivery throughput for a burst of email (e.g. a session-reminder wave).
+
+Sends the same burst to a local aiosmtpd server (pip install -r requirements-dev.txt):
+  - with one connection per message (how send_email used to deliver)
+  - through SMTPConnectionPool.send_batch at several batch sizes
+
+using --threads delivery threads, and reports messages per second, latency
+per batch (ops) and how many connections were opened. The stand-in does not do
+STARTTLS or AUTH, so the gap to a real provider, where every connection
+pays a TLS handshake and a login, is larger than measured here.
+
+Usage (from the server directory):
+    python -m benchmarks.smtp_delivery [--messages 2000] [--threads 4] [--batch-sizes 1,20,100]
+"""
+import time
+import socket
+import smtplib
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.auth_path import use_mongo_stand_in, summarize
+
+
+class CountingHandler:
+    """aiosmtpd handler that accepts and counts every message"""
+
+    def __init__(self):
+        self.received = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received += 1
+        return "250 Message accepted for delivery"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def reminder_messages(count: int) -> list:
+    """Outbox-shaped messages with a body the size of a rendered template"""
+    body = "<html><body>\n" + "<p>Your session starts in one hour.</p>\n" * 100 + "</body></html>"
+    return [
+        {"_id": index, "to": f"student{index}@example.com", "subject": "Session reminder", "html": body}
+        for index in range(count)
+    ]
+
+
+def run(send, chunks: list, threads: int) -> dict:
+    samples = []
+
+    def timed(chunk):
+        started = time.perf_counter()
+        send(chunk)
+        samples.append(time.perf_counter() - started)
+
+    wall_started, cpu_started = time.perf_counter(), time.process_time()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(timed, chunks))
+    result = summarize(samples, time.perf_counter() - wall_started, time.process_time() - cpu_started)
+    messages = sum(len(chunk) for chunk in chunks)
+    result["messages_per_sec"] = round(messages / (time.perf_counter() - wall_started), 1)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pooled SMTP delivery")
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--batch-sizes", default="1,20,100")
+    args = parser.parse_args()
+
+    patcher = use_mongo_stand_in()
+    from aiosmtpd.controller import Controller
+    from app.utils.mailer import SMTPConnectionPool, build_mime
+
+    handler = CountingHandler()
+    port = free_port()
+    controller = Controller(handler, hostname="127.0.0.1", port=port)
+    controller.start()
+    try:
+        messages = reminder_messages(args.messages)
+
+        def connection_per_message(chunk):
+            for message in chunk:
+                with smtplib.SMTP("127.0.0.1", port) as server:
+                    server.send_message(build_mime(message))
+
+        print(f"burst of {args.messages} messages, {args.threads} threads")
+        result = run(connection_per_message, [[message] for message in messages], args.threads)
+        result["connections_opened"] = args.messages
+        print(f"  {'connection per message':24s} {result}")
+
+        for batch_size in [int(size) for size in args.batch_sizes.split(",")]:
+            pool = SMTPConnectionPool(
+                host="127.0.0.1", port=port, username=None, password=None,
+                starttls=False, size=args.threads
+            )
+            chunks = [messages[start:start + batch_size] for start in range(0, len(messages), batch_size)]
+            result = run(pool.send_batch, chunks, args.threads)
+            result["connections_opened"] = pool.connections_opened
+            pool.close()
+            print(f"  {f'pooled, batch {batch_size}':24s} {result}")
+
+        print(f"received by stand-in: {handler.received}")
+    finally:
+        controller.stop()
+        if patcher is not None:
+            patcher.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -23,6 +23,14 @@ from app.routes.auth_routes import router as auth_router
 from app.routes.student_routes import router as student_router
 from app.routes.expert_routes import router as expert_router
 from app.routes.review_routes import router as review_router
+from app.routes.metrics_routes import router as metrics_router
+from app.db.monitoring import query_stats_middleware
+from app.db.identity_map import identity_map_middleware
+from app.utils.oauth import start_oauth_client, close_oauth_client
+from app.utils.mailer import outbox_workers
+from app.utils.digest import digest_scheduler
+from app.db.expert_search import expert_search_index
+from app.utils.email import precompile_templates
 
 # Create FastAPI app
 app = FastAPI(
@@ -38,8 +46,15 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Total-Count"],
 )
 
+# Share documents loaded by _id within a request
+app.middleware("http")(identity_map_middleware)
+
+# Record database commands issued by each request
+app.middleware("http")(query_stats_middleware)
+
 # Mount static files directory for profile images
 os.makedirs("static/profile-images", exist_ok=True)
 app.mount("/static", StaticFiles(directory="static"), name="static")
@@ -49,6 +64,26 @@ app.include_router(auth_router)
 app.include_router(student_router)
 app.include_router(expert_router)
 app.include_router(review_router)
+app.include_router(metrics_router)
+
+@app.on_event("startup")
+async def start_background_tasks():
+    # Preload OAuth provider metadata and keep it fresh
+    start_oauth_client()
+    # Compile email templates once instead of on the first email
+    precompile_templates()
+    # Deliver queued email in the background
+    outbox_workers.start()
+    # Batch notifications into digest emails
+    digest_scheduler.start()
+    # Load the expert search index before the first search needs it
+    expert_search_index.start()
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    await close_oauth_client()
+    await outbox_workers.stop()
+    await digest_scheduler.stop()
 
 @app.get("/")
 def root():
@@ -0,0 +1,122 @@
+"""
+Shared fixtures of the server tests.
+
+The app connects to MongoDB and creates its indexes at import, so an
+in-memory mongomock stand-in is patched in before any app module is
+imported (pip install -r requirements-dev.txt).
+
+Usage (from the server directory):
+    python -m pytest tests
+"""
+import os
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import mongomock
+import pytest
+from bson import ObjectId
+
+os.environ["MONGODB_URI"] = "mongodb://localhost:27017"
+os.environ["MONGODB_DB"] = "synapse_test"
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
+os.environ["RATE_LIMIT_ENABLED"] = "false"
+os.environ["NOTIFICATION_DIGEST_ENABLED"] = "false"
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+mongomock.patch(servers=(("localhost", 27017),)).start()
+
+
+def _without_sort(add):
+    def wrapper(self, *args, sort=None, **kwargs):
+        return add(self, *args, **kwargs)
+    return wrapper
+
+
+# pymongo >= 4.11 passes `sort` to bulk updates, which mongomock 4.3 predates
+_builder = mongomock.collection.BulkOperationBuilder
+_builder.add_update = _without_sort(_builder.add_update)
+_builder.add_replace = _without_sort(_builder.add_replace)
+
+from app.db.mongo import db  # noqa: E402
+from app.db.expert_search import ExpertSearchIndex  # noqa: E402
+from app.db.user_directory import add_entry  # noqa: E402
+from app.models.expert import ExpertUpdate  # noqa: E402
+from app.routes import expert_routes  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def clean_db():
+    """Empty every collection (keeping its indexes) after each test"""
+    yield
+    for name in db.list_collection_names():
+        db[name].delete_many({})
+
+
+@pytest.fixture
+def add_expert():
+    """Insert approved, verified experts: add_expert(number, **fields) -> _id"""
+    def add(number: int, **fields) -> ObjectId:
+        expert = {
+            "email": f"expert{number}@example.com",
+            "first_name": f"Expert{number}",
+            "last_name": "Test",
+            "specialty": "Python Programming",
+            "tags": ["python"],
+            "bio": "Teaches python.",
+            "languages": ["English"],
+            "hourly_rate": 20.0 + number,
+            "rating": 4.0,
+            "completed_sessions": number,
+            "is_approved": True,
+            "is_verified": True,
+            "updated_at": datetime.now(timezone.utc)
+        }
+        expert.update(fields)
+        return db.experts.insert_one(expert).inserted_id
+    return add
+
+
+@pytest.fixture
+def index():
+    """A search index that only refreshes when the test says so"""
+    return ExpertSearchIndex(refresh_seconds=1e9)
+
+
+@pytest.fixture
+def touch():
+    """Write an expert the way the routes do, moving updated_at forward: touch(_id, **fields)"""
+    def write(expert_id: ObjectId, **fields):
+        updated_at = datetime.now(timezone.utc) + timedelta(seconds=1)
+        db.experts.update_one({"_id": expert_id}, {"$set": {**fields, "updated_at": updated_at}})
+    return write
+
+
+@pytest.fixture
+def all_pages():
+    """Follow the cursors of a search: all_pages(index, filters, q, sort, limit, fuzzy) -> (_ids, totals)"""
+    def follow(index: ExpertSearchIndex, filters: dict, q, sort: str, limit: int = 3, fuzzy: bool = False) -> tuple:
+        ids, totals, cursor = [], set(), None
+        while True:
+            page = index.find_page(filters, q, sort, limit, cursor, fuzzy)
+            ids.extend(expert_id for expert_id, _ in page.experts)
+            totals.add(page.total)
+            cursor = page.next_cursor
+            if cursor is None:
+                return ids, totals
+    return follow
+
+
+@pytest.fixture
+def expert(add_expert):
+    """current_user of an expert registered in the user directory"""
+    expert_id = add_expert(0)
+    add_entry("expert0@example.com", "expert", expert_id, "hash")
+    return {"id": str(expert_id), "email": "expert0@example.com", "role": "expert"}
+
+
+@pytest.fixture
+def update_profile():
+    """Call update_expert_profile: update_profile(current_user, **fields) -> updated expert"""
+    def update(current_user: dict, **fields) -> dict:
+        return asyncio.run(expert_routes.update_expert_profile(ExpertUpdate(**fields), current_user))
+    return update
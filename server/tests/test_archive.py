@@ -0,0 +1,55 @@
+from datetime import datetime, timedelta, timezone
+
+from app.db.mongo import db
+from app.db import archive
+
+
+def days_ago(days: int) -> datetime:
+    return datetime.now(timezone.utc) - timedelta(days=days)
+
+
+def test_archive_moves_old_messages_and_finished_sessions():
+    db.messages.insert_many([
+        {"conversation_id": "c", "timestamp": days_ago(archive.MESSAGE_ARCHIVE_AFTER_DAYS + 1)},
+        {"conversation_id": "c", "timestamp": days_ago(1)}
+    ])
+    db.sessions.insert_many([
+        {"status": "completed", "date": days_ago(archive.SESSION_ARCHIVE_AFTER_DAYS + 1)},
+        {"status": "scheduled", "date": days_ago(archive.SESSION_ARCHIVE_AFTER_DAYS + 1)},
+        {"status": "completed", "date": days_ago(1)}
+    ])
+
+    assert archive.run(batch_size=1) == {"messages": 1, "sessions": 1}
+    assert db.messages.count_documents({}) == 1
+    assert archive.messages_archive.count_documents({}) == 1
+    assert db.sessions.count_documents({}) == 2
+    assert archive.sessions_archive.find_one()["status"] == "completed"
+
+    # Nothing left to move
+    assert archive.run() == {"messages": 0, "sessions": 0}
+
+
+def test_message_pages_continue_into_the_archive():
+    timestamps = [days_ago(days) for days in range(6, 0, -1)]
+    archive.messages_archive.insert_many([{"conversation_id": "c", "n": n, "timestamp": timestamps[n]} for n in range(3)])
+    db.messages.insert_many([{"conversation_id": "c", "n": n, "timestamp": timestamps[n]} for n in range(3, 6)])
+
+    latest = archive.find_messages_page({"conversation_id": "c"}, limit=4)
+    assert [message["n"] for message in latest] == [2, 3, 4, 5]
+
+    older = archive.find_messages_page({"conversation_id": "c"}, limit=4, before=latest[0]["timestamp"])
+    assert [message["n"] for message in older] == [0, 1]
+
+
+def test_find_session_falls_back_to_the_archive():
+    session_id = archive.sessions_archive.insert_one({"status": "completed"}).inserted_id
+
+    assert archive.find_session({"_id": session_id})["status"] == "completed"
+
+
+def test_find_sessions_reads_the_archive_only_for_old_ranges():
+    db.sessions.insert_one({"expert_id": "e", "date": days_ago(1)})
+    archive.sessions_archive.insert_one({"expert_id": "e", "date": days_ago(archive.SESSION_ARCHIVE_AFTER_DAYS + 5)})
+
+    assert len(archive.find_sessions({"expert_id": "e"}, since=days_ago(7))) == 1
+    assert len(archive.find_sessions({"expert_id": "e"}, since=days_ago(archive.SESSION_ARCHIVE_AFTER_DAYS + 10))) == 2
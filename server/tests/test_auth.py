@@ -0,0 +1,174 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException, Response
+
+from app.db.mongo import db
+from app.routes import auth_routes
+from app.utils import auth, revocation
+from app.models.user import TokenData
+from app.utils.JWTtoken import TokenCache, create_access_token, create_refresh_token, verify_token, user_claims
+from app.utils.auth import is_token_revoked
+from app.utils.hash import hash_password, verify_password
+from app.db.user_directory import add_entry, lookup
+from app.utils.revocation import BloomFilter, RevocationList, revocation_list, revoke_user_tokens
+
+
+def refresh(token: str) -> dict:
+    return asyncio.run(auth_routes.refresh_token(response=Response(), refresh_token=token))
+
+
+def test_refresh_issues_access_token():
+    token = create_refresh_token({"sub": "refresh@example.com", "role": "student"})
+
+    body = refresh(token)
+    assert body["role"] == "student"
+    assert verify_token(body["access_token"]).email == "refresh@example.com"
+
+
+def test_refresh_rejects_access_tokens():
+    token = create_access_token({"sub": "access@example.com", "role": "student"})
+
+    with pytest.raises(HTTPException) as error:
+        refresh(token)
+    assert error.value.status_code == 401
+
+
+def test_refresh_rejects_revoked_tokens():
+    token = create_refresh_token({"sub": "logout@example.com", "role": "expert"})
+    token_data = verify_token(token)
+    revocation_list.revoke_token(token_data.jti, token_data.exp)
+
+    with pytest.raises(HTTPException) as error:
+        refresh(token)
+    assert error.value.status_code == 401
+
+
+def test_refresh_tokens_are_not_access_tokens():
+    token = create_refresh_token({"sub": "bearer@example.com", "role": "student"})
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(auth_routes.get_current_user(token))
+    assert error.value.status_code == 401
+
+
+def test_password_change_revokes_tokens_issued_before_it():
+    email = "password@example.com"
+    access = create_access_token({"sub": email, "role": "student"})
+    refresh_before = create_refresh_token({"sub": email, "role": "student"})
+
+    # Issued within the same second as the cutoff, but before it
+    cutoff = revoke_user_tokens("student", email)
+    assert is_token_revoked(verify_token(access))
+    with pytest.raises(HTTPException):
+        refresh(refresh_before)
+
+    # The caller's new token is issued after the cutoff
+    access_after = create_access_token({"sub": email, "role": "student"}, issued_after=cutoff)
+    assert verify_token(access_after).iat > cutoff.timestamp()
+    assert not is_token_revoked(verify_token(access_after))
+
+
+def test_password_change_route_reissues_the_callers_token():
+    student = {"email": "route@example.com", "password": hash_password("old-secret"), "is_verified": True}
+    student["_id"] = db.students.insert_one(student).inserted_id
+    add_entry(student["email"], "student", student["_id"], student["password"])
+    before = create_access_token(user_claims(student, "student"))
+    user = {"id": str(student["_id"]), "email": student["email"], "role": "student"}
+
+    body = asyncio.run(auth_routes.change_password("old-secret", "new-secret", user))
+    assert is_token_revoked(verify_token(before))
+    assert not is_token_revoked(verify_token(body["access_token"]))
+    assert verify_password("new-secret", db.students.find_one({"_id": student["_id"]})["password"])
+    assert verify_password("new-secret", lookup(student["email"])["password"])
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(auth_routes.change_password("old-secret", "newer-secret", user))
+    assert error.value.status_code == 400
+
+
+def test_revocation_is_per_user():
+    access = create_access_token({"sub": "other@example.com", "role": "student"})
+    revoke_user_tokens("expert", "other@example.com")
+
+    assert not is_token_revoked(verify_token(access))
+
+
+def test_verified_tokens_authorize_from_claims(monkeypatch):
+    user = {"_id": ObjectId(), "email": "claims@example.com", "is_verified": True, "first_name": "Ada"}
+    token = create_access_token(user_claims(user, "student"))
+    monkeypatch.setattr(auth, "load_principal", lambda role, email: pytest.fail("looked up the user"))
+
+    principal = asyncio.run(auth.get_current_user(token))
+    assert (principal["id"], principal["first_name"]) == (str(user["_id"]), "Ada")
+
+
+def test_other_tokens_load_the_user_once():
+    db.students.insert_one({"email": "lookup@example.com", "first_name": "Old", "is_verified": False})
+    token = create_access_token({"sub": "lookup@example.com", "role": "student"})
+
+    assert asyncio.run(auth.get_current_user(token))["first_name"] == "Old"
+    db.students.update_one({"email": "lookup@example.com"}, {"$set": {"first_name": "New"}})
+    # Served from the principal cache until the writer invalidates it
+    assert asyncio.run(auth.get_current_user(token))["first_name"] == "Old"
+
+    auth.invalidate_user("student", "lookup@example.com")
+    assert asyncio.run(auth.get_current_user(token))["first_name"] == "New"
+
+
+def test_tokens_of_deleted_users_are_rejected():
+    token = create_access_token({"sub": "ghost@example.com", "role": "student"})
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(auth.get_current_user(token))
+    assert error.value.status_code == 401
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(bits=1 << 12, hashes=5)
+    for n in range(200):
+        bloom.add(f"jti-{n}")
+
+    assert all(f"jti-{n}" in bloom for n in range(200))
+    assert sum(f"other-{n}" in bloom for n in range(1000)) < 50
+
+
+def test_revocations_reach_other_workers(monkeypatch):
+    monkeypatch.setattr(revocation, "REVOCATION_SYNC_SECONDS", 0)
+    token_data = verify_token(create_access_token({"sub": "worker@example.com", "role": "student"}))
+    other_worker = RevocationList()
+    assert not other_worker.is_revoked(token_data.jti, "student", "worker@example.com", token_data.iat)
+
+    revocation_list.revoke_token(token_data.jti, token_data.exp)
+    assert other_worker.is_revoked(token_data.jti, "student", "worker@example.com", token_data.iat)
+
+
+def test_decoded_tokens_are_cached():
+    cache = TokenCache(maxsize=2)
+    token_data = verify_token(create_access_token({"sub": "cache@example.com", "role": "student"}))
+
+    assert cache.get("token") is None
+    cache.set("token", token_data)
+    assert cache.get("token") is token_data
+    assert cache.snapshot()["hits"] == 1
+
+
+def test_expired_tokens_leave_the_cache():
+    cache = TokenCache()
+    token = create_access_token({"sub": "expired@example.com", "role": "student"}, timedelta(seconds=-1))
+    cache.set(token, TokenData(email="expired@example.com", role="student", exp=datetime.now(timezone.utc)))
+
+    assert cache.get(token) is None
+    assert cache.snapshot()["size"] == 0
+    # Expired tokens don't verify either
+    assert verify_token(token) is None
+
+
+def test_tampered_tokens_do_not_hit_the_cache():
+    token = create_access_token({"sub": "tamper@example.com", "role": "student"})
+    assert verify_token(token) is not None
+
+    header, payload, signature = token.split(".")
+    assert verify_token(f"{header}.{payload}.{signature[::-1]}") is None
@@ -0,0 +1,55 @@
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+
+from app.db.mongo import db
+from app.db.auth_codes import VERIFICATION, PASSWORD_RESET, issue_code, find_code, delete_code, is_expired
+from app.db.migrations import move_auth_codes
+
+
+def in_minutes(minutes: int) -> datetime:
+    return datetime.now(timezone.utc) + timedelta(minutes=minutes)
+
+
+def test_issuing_a_code_replaces_the_previous_one():
+    user_id = ObjectId()
+    issue_code("code@example.com", VERIFICATION, "111111", in_minutes(10), "student", user_id)
+    issue_code("code@example.com", VERIFICATION, "222222", in_minutes(10), "student", user_id)
+    issue_code("code@example.com", PASSWORD_RESET, "333333", in_minutes(10), "student", user_id)
+
+    assert db.auth_codes.count_documents({}) == 2
+    assert find_code("code@example.com", VERIFICATION)["code"] == "222222"
+
+    delete_code("code@example.com", VERIFICATION)
+    assert find_code("code@example.com", VERIFICATION) is None
+    assert find_code("code@example.com", PASSWORD_RESET)["code"] == "333333"
+
+
+def test_is_expired():
+    assert is_expired({"expires_at": in_minutes(-1)})
+    assert not is_expired({"expires_at": in_minutes(1)})
+    # Naive datetimes read back from MongoDB are UTC
+    assert is_expired({"expires_at": in_minutes(-1).replace(tzinfo=None)})
+    assert not is_expired({})
+
+
+def test_migration_moves_unexpired_codes_off_users():
+    live = db.students.insert_one({
+        "email": "live@example.com", "first_name": "Live",
+        "verification_code": "123456", "verification_code_expires": in_minutes(10)
+    }).inserted_id
+    db.experts.insert_one({
+        "email": "stale@example.com",
+        "reset_code": "654321", "reset_code_expires": in_minutes(-10)
+    })
+
+    results = move_auth_codes.run(batch_size=1)
+
+    assert (results["students"], results["experts"]) == (1, 0)
+    code = find_code("live@example.com", VERIFICATION)
+    assert (code["code"], code["user_id"], code["first_name"]) == ("123456", live, "Live")
+    assert find_code("stale@example.com", PASSWORD_RESET) is None
+    for collection in (db.students, db.experts):
+        assert collection.count_documents({"$or": [
+            {"verification_code": {"$exists": True}}, {"reset_code_expires": {"$exists": True}}
+        ]}) == 0
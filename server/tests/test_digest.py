@@ -0,0 +1,66 @@
+from datetime import datetime, timedelta, timezone
+
+from app.db.mongo import db
+from app.db.email_outbox import outbox
+from app.db.notifications import record_event, notification_events, NEW_MESSAGE, NEW_REVIEW
+from app.utils.digest import run_digest, acquire_lock, release_lock
+
+
+def add_student(email: str, **settings) -> object:
+    return db.students.insert_one({
+        "email": email, "first_name": "Ada", "notification_settings": settings
+    }).inserted_id
+
+
+def message(recipient_id, sender: str, preview: str):
+    record_event("student", recipient_id, NEW_MESSAGE, {"sender_name": sender, "preview": preview})
+
+
+def later(hours: float = 2) -> datetime:
+    return datetime.now(timezone.utc) + timedelta(hours=hours)
+
+
+def test_events_are_sent_as_one_digest():
+    student_id = add_student("digest@example.com", digest_schedule="hourly")
+    message(student_id, "Alan", "First")
+    message(student_id, "Alan", "Second")
+    record_event("student", student_id, NEW_REVIEW, {"student_name": "Grace", "rating": 5, "comment": "Great"})
+
+    assert run_digest(later()) == {"digests": 1, "events": 3, "dropped": 0}
+    [email] = outbox.find()
+    assert email["to"] == "digest@example.com"
+    assert email["subject"] == "You have 3 new updates on Synapse"
+    # Messages from the same sender collapse into one line
+    assert "2 new messages from Alan" in email["html"]
+    assert "Grace left a 5-star review" in email["html"]
+    assert notification_events.count_documents({"digested_at": None}) == 0
+
+
+def test_digest_waits_for_the_window():
+    student_id = add_student("daily@example.com", digest_schedule="daily")
+    message(student_id, "Alan", "Hi")
+
+    assert run_digest(later(hours=2))["digests"] == 0
+    assert notification_events.count_documents({"digested_at": None}) == 1
+
+    assert run_digest(later(hours=25))["digests"] == 1
+
+
+def test_events_are_dropped_when_email_is_off():
+    student_id = add_student("quiet@example.com", email_notifications=False)
+    message(student_id, "Alan", "Hi")
+    # Recipients whose account is gone are dropped as well
+    message(db.students.insert_one({}).inserted_id, "Alan", "Hi")
+    db.students.delete_many({"email": {"$exists": False}})
+
+    assert run_digest(later()) == {"digests": 0, "events": 0, "dropped": 2}
+    assert outbox.count_documents({}) == 0
+    assert notification_events.count_documents({"digested_at": None}) == 0
+
+
+def test_digest_lock_is_held_by_one_process():
+    assert acquire_lock("digest-test", 60)
+    assert not acquire_lock("digest-test", 60)
+
+    release_lock("digest-test")
+    assert acquire_lock("digest-test", 60)
@@ -0,0 +1,58 @@
+import os
+import stat
+
+from app.db.email_outbox import outbox
+from app.utils.email import template_bytecode_cache, precompile_templates, render_email, render_many, send_bulk_email
+
+
+def mode(path) -> int:
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+
+def test_bytecode_cache_directory_is_private(tmp_path):
+    directory = tmp_path / "templates"
+    cache = template_bytecode_cache(str(directory))
+
+    assert cache.directory == str(directory)
+    assert mode(directory) == 0o700
+
+
+def test_bytecode_cache_tightens_existing_directory(tmp_path):
+    directory = tmp_path / "templates"
+    directory.mkdir(mode=0o777)
+    os.chmod(directory, 0o777)
+
+    template_bytecode_cache(str(directory))
+    assert mode(directory) == 0o700
+
+
+def test_default_bytecode_cache_is_private():
+    cache = template_bytecode_cache(None)
+
+    assert mode(cache.directory) & 0o077 == 0
+
+
+def test_templates_compile():
+    assert precompile_templates()
+
+
+def test_render_many_matches_render_email():
+    contexts = [{"first_name": name, "verification_code": code, "frontend_url": "http://localhost"}
+                for name, code in (("Ada", "123456"), ("Alan", "654321"))]
+
+    rendered = render_many("verification_code_email", contexts)
+    assert rendered == [render_email("verification_code_email", dict(context)) for context in contexts]
+    assert "123456" in rendered[0] and "654321" in rendered[1]
+
+
+def test_bulk_email_is_queued_in_one_go():
+    messages = [
+        (f"user{n}@example.com", "Welcome", {"name": f"User {n}", "role": "student", "frontend_url": "http://localhost"})
+        for n in range(3)
+    ]
+
+    assert send_bulk_email("welcome_email", messages) == 3
+    queued = {message["to"]: message for message in outbox.find()}
+    assert sorted(queued) == [to for to, _, _ in messages]
+    assert "User 2" in queued["user2@example.com"]["html"]
+    assert send_bulk_email("welcome_email", []) == 0
@@ -0,0 +1,55 @@
+from datetime import datetime, timedelta, timezone
+
+from app.db import email_outbox
+from app.db.email_outbox import (
+    new_message, enqueue, enqueue_many, claim_batch, mark_sent, pending_count, outbox, SENDING, SENT
+)
+from app.utils.email import send_verification_code_email
+
+
+def test_claimed_messages_are_leased_to_one_worker():
+    ids = enqueue_many([new_message(f"user{n}@example.com", "Subject", "<p>Hi</p>") for n in range(3)])
+
+    first = claim_batch("worker-a", 2)
+    second = claim_batch("worker-b", 2)
+
+    assert [message["_id"] for message in first] == ids[:2]
+    assert [message["_id"] for message in second] == ids[2:]
+    assert all(message["status"] == SENDING for message in first + second)
+    assert claim_batch("worker-c", 2) == []
+
+
+def test_expired_leases_are_claimed_again(monkeypatch):
+    monkeypatch.setattr(email_outbox, "EMAIL_LEASE_SECONDS", -1)
+    message_id = enqueue(new_message("crashed@example.com", "Subject", "<p>Hi</p>"))
+
+    claim_batch("crashed-worker", 1)
+    assert [message["_id"] for message in claim_batch("worker", 1)] == [message_id]
+
+
+def test_retries_wait_until_due():
+    message = new_message("later@example.com", "Subject", "<p>Hi</p>")
+    message["next_attempt_at"] = datetime.now(timezone.utc) + timedelta(minutes=5)
+    enqueue(message)
+
+    assert claim_batch("worker", 10) == []
+    assert pending_count() == 1
+
+
+def test_sent_messages_leave_the_queue():
+    enqueue(new_message("sent@example.com", "Subject", "<p>Hi</p>"))
+    claimed = claim_batch("worker", 10)
+
+    mark_sent([message["_id"] for message in claimed])
+    stored = outbox.find_one({})
+    assert (stored["status"], stored["attempts"]) == (SENT, 1)
+    assert "expire_at" in stored and "locked_by" not in stored
+    assert pending_count() == 0
+
+
+def test_emails_are_rendered_into_the_outbox():
+    assert send_verification_code_email("verify@example.com", "Ada", "123456")
+
+    message = outbox.find_one({"to": "verify@example.com"})
+    assert "123456" in message["html"]
+    assert message["template"] and message["status"] == email_outbox.PENDING
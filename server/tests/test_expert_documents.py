@@ -0,0 +1,66 @@
+from app.db.mongo import db
+from app.db.expert_documents import (
+    DEFAULT_SPECIALTY, DEFAULT_EDUCATION, expert_defaults, fill_expert_defaults, default_bio
+)
+from app.db.migrations import normalize_experts
+
+
+def test_expert_defaults_fill_missing_and_empty_fields():
+    defaults = expert_defaults({"specialty": "", "tags": None, "languages": []})
+
+    assert defaults == {
+        "specialty": DEFAULT_SPECIALTY,
+        "tags": [],
+        "bio": default_bio(DEFAULT_SPECIALTY),
+        "languages": ["English"],
+        "experience_years": 1,
+        "completed_sessions": 0,
+        "education": DEFAULT_EDUCATION
+    }
+    # Set values, including falsy ones that are valid, are kept
+    assert expert_defaults({
+        "specialty": "Chemistry", "tags": [], "bio": "Hi", "languages": ["French"],
+        "experience_years": 0, "completed_sessions": 0, "education": "PhD"
+    }) == {}
+    assert expert_defaults({"specialty": "Chemistry"})["bio"] == default_bio("Chemistry")
+
+
+def test_fill_expert_defaults_does_not_overwrite_concurrent_writes():
+    expert_id = db.experts.insert_one({"email": "racy@example.com"}).inserted_id
+    stale = db.experts.find_one({"_id": expert_id})
+    db.experts.update_one({"_id": expert_id}, {"$set": {"bio": "Written meanwhile"}})
+
+    fill_expert_defaults(stale)
+    assert db.experts.find_one({"_id": expert_id})["bio"] == "Written meanwhile"
+
+    fill_expert_defaults(db.experts.find_one({"_id": expert_id}))
+    stored = db.experts.find_one({"_id": expert_id})
+    assert stored["bio"] == "Written meanwhile"
+    assert stored["specialty"] == DEFAULT_SPECIALTY
+    assert "updated_at" in stored
+
+
+def test_profile_update_restores_emptied_fields(expert, update_profile):
+    updated = update_profile(expert, specialty="", bio="")
+
+    assert updated["specialty"] == DEFAULT_SPECIALTY
+    assert updated["bio"] == default_bio(DEFAULT_SPECIALTY)
+
+
+def test_migration_fills_defaults_and_resumes():
+    complete = db.experts.insert_one({
+        "specialty": "Chemistry", "tags": [], "bio": "Hi", "languages": ["French"],
+        "experience_years": 3, "completed_sessions": 2, "education": "PhD"
+    }).inserted_id
+    for number in range(5):
+        db.experts.insert_one({"email": f"old{number}@example.com", "specialty": "Physics"})
+
+    assert normalize_experts.run(batch_size=2) == 5
+    assert db.experts.count_documents(normalize_experts.NEEDS_DEFAULTS) == 0
+    assert all(expert["bio"] == default_bio("Physics") for expert in db.experts.find({"specialty": "Physics"}))
+    assert "updated_at" not in db.experts.find_one({"_id": complete})
+
+    # Completed runs are not repeated unless restarted
+    db.experts.insert_one({"email": "late@example.com"})
+    assert normalize_experts.run() == 0
+    assert normalize_experts.run(restart=True) == 1
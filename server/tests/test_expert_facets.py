@@ -0,0 +1,89 @@
+import pytest
+
+from app.db.mongo import db
+
+
+@pytest.fixture
+def catalog(add_expert):
+    return [
+        add_expert(0, specialty="Python", tags=["python", "django"], languages=["English"], hourly_rate=20.0),
+        add_expert(1, specialty="Python", tags=["python"], languages=["English", "Spanish"], hourly_rate=30.0),
+        add_expert(2, specialty="Java", tags=["java"], languages=["Spanish"], hourly_rate=60.0),
+        add_expert(3, specialty="Java", tags=["java", "python"], languages=["English"], hourly_rate=120.0),
+    ]
+
+
+def bucket_counts(facets: dict) -> list:
+    return [bucket["count"] for bucket in facets["rate_buckets"]]
+
+
+def test_facets_count_the_catalog(index, catalog):
+    index.build()
+
+    facets = index.facets({})
+    assert facets["total"] == 4
+    assert facets["tags"] == {"python": 3, "java": 2, "django": 1}
+    assert list(facets["tags"]) == ["python", "java", "django"]
+    assert facets["languages"] == {"English": 3, "Spanish": 2}
+    assert facets["specialties"] == {"Java": 2, "Python": 2}
+    # Buckets [0, 25), [25, 50), [50, 75), [75, 100), [100, ...)
+    assert bucket_counts(facets) == [1, 1, 1, 0, 1]
+
+
+def test_facets_ignore_their_own_filter(index, catalog):
+    index.build()
+
+    facets = index.facets({"tags": ["java"], "language": "English", "min_rate": 50})
+    assert facets["total"] == 1
+    # Tags: English and >= 50
+    assert facets["tags"] == {"java": 1, "python": 1}
+    # Languages: java and >= 50
+    assert facets["languages"] == {"English": 1, "Spanish": 1}
+    # Rate buckets: java and English
+    assert bucket_counts(facets) == [0, 0, 0, 0, 1]
+
+
+def test_facets_follow_text_search(index, catalog):
+    index.build()
+
+    facets = index.facets({}, "django")
+    assert facets["total"] == 1
+    assert facets["specialties"] == {"Python": 1}
+
+
+def test_facets_follow_fuzzy_text_search(index, catalog):
+    index.build()
+
+    assert index.facets({}, "djnago")["total"] == 0
+    facets = index.facets({}, "djnago", fuzzy=True)
+    assert facets["total"] == 1
+    assert facets["specialties"] == {"Python": 1}
+    # Exact and fuzzy counts are cached apart
+    assert index.facets_misses == 2
+
+
+def test_equivalent_filters_share_a_cache_entry(index, catalog):
+    index.build()
+
+    first = index.facets({"tags": ["python", "django"], "min_rate": 20})
+    assert index.facets({"tags": ["django", "python", "django"], "min_rate": 20.001}) is first
+    assert (index.facets_hits, index.facets_misses) == (1, 1)
+
+
+def test_facet_cache_is_dropped_when_experts_change(index, catalog, touch):
+    experts = catalog
+    index.build()
+    assert index.facets({})["tags"]["python"] == 3
+
+    touch(experts[0], tags=["django"])
+    index.refresh()
+    assert index.facets({})["tags"]["python"] == 2
+
+    # A write noted by this worker retires the cached counts at once
+    cached = index.facets({})
+    index.expert_changed()
+    assert index.facets({}) is not cached
+
+    db.experts.delete_one({"_id": experts[3]})
+    index.build()
+    assert index.facets({})["total"] == 3
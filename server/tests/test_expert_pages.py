@@ -0,0 +1,65 @@
+import pytest
+from pymongo import DESCENDING
+
+from app.db.expert_pages import SORT_ORDERS, InvalidCursor, encode_cursor, decode_cursor
+
+RATINGS = [4.5, 3.0, 4.5, 5.0, 3.0, 4.0, 4.5, 2.0]
+
+
+def expected_order(experts: list, sort: str) -> list:
+    """(value, _id) in the direction of the sort"""
+    field, direction = SORT_ORDERS[sort]
+    values = {"rating": RATINGS, "hourly_rate": [20.0 + number % 3 for number in range(len(experts))],
+              "completed_sessions": [number // 2 for number in range(len(experts))]}[field]
+    order = sorted(range(len(experts)), key=lambda number: (values[number], experts[number]),
+                   reverse=direction == DESCENDING)
+    return [experts[number] for number in order]
+
+
+@pytest.fixture
+def experts(add_expert):
+    return [
+        add_expert(number, rating=RATINGS[number], hourly_rate=20.0 + number % 3,
+                   completed_sessions=number // 2, tags=["python", "few"] if number % 4 == 0 else ["python"])
+        for number in range(len(RATINGS))
+    ]
+
+
+@pytest.mark.parametrize("sort", list(SORT_ORDERS))
+def test_pages_follow_the_sort_order_with_id_ties(index, experts, all_pages, sort):
+    index.build()
+
+    # Many matches walk the sort order, few matches are picked with a heap
+    for filters, members in (({}, experts), ({"tags": ["few"]}, experts[::4])):
+        for limit in (1, 3, 100):
+            ids, totals = all_pages(index, filters, None, sort, limit=limit)
+            assert ids == [expert_id for expert_id in expected_order(experts, sort) if expert_id in members]
+            assert totals == {len(members)}
+
+
+def test_experts_added_between_pages_do_not_repeat_or_skip(index, experts, add_expert):
+    index.build()
+    first = index.find_page({}, None, "rating", 3)
+
+    newcomer = add_expert(99, rating=1.0)
+    index.build()
+
+    ids = [expert_id for expert_id, _ in first.experts]
+    cursor = first.next_cursor
+    while cursor:
+        page = index.find_page({}, None, "rating", 3, cursor)
+        ids.extend(expert_id for expert_id, _ in page.experts)
+        cursor = page.next_cursor
+    assert ids == expected_order(experts, "rating") + [newcomer]
+
+
+def test_cursors_belong_to_their_sort_order(index, experts):
+    index.build()
+    cursor = index.find_page({}, None, "rating", 3).next_cursor
+
+    with pytest.raises(InvalidCursor):
+        index.find_page({}, None, "hourly_rate", 3, cursor)
+    with pytest.raises(InvalidCursor):
+        decode_cursor("not-a-cursor", "rating")
+    assert decode_cursor(encode_cursor("rating", 4.5, experts[0]), "rating") == (4.5, experts[0])
+
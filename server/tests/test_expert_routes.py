@@ -0,0 +1,74 @@
+import asyncio
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+from app.db.mongo import db
+from app.db.user_directory import add_entry, lookup
+from app.routes import expert_routes
+from app.utils.auth import is_token_revoked
+from app.utils.hash import hash_password, verify_password
+from app.utils.JWTtoken import create_access_token, verify_token, user_claims
+
+EMAIL = "expert0@example.com"
+
+
+def test_email_change_moves_directory_entry(expert, update_profile):
+    updated = update_profile(expert, email="renamed@example.com")
+
+    assert updated["email"] == "renamed@example.com"
+    assert lookup(EMAIL) is None
+    assert lookup("renamed@example.com")["user_id"] == ObjectId(expert["id"])
+
+
+def test_email_change_to_registered_email_is_rejected(expert, update_profile):
+    add_entry("student@example.com", "student", ObjectId(), "hash")
+
+    with pytest.raises(HTTPException) as error:
+        update_profile(expert, email="student@example.com", bio="New bio")
+    assert error.value.status_code == 400
+
+    stored = db.experts.find_one({"_id": ObjectId(expert["id"])})
+    assert stored["email"] == EMAIL
+    assert stored["bio"] != "New bio"
+    assert lookup(EMAIL)["user_id"] == ObjectId(expert["id"])
+    assert lookup("student@example.com")["role"] == "student"
+
+
+def test_email_change_to_email_missing_from_directory_is_rejected(expert, update_profile):
+    # Registered before the directory backfill
+    db.students.insert_one({"email": "legacy@example.com", "password": "hash"})
+
+    with pytest.raises(HTTPException) as error:
+        update_profile(expert, email="legacy@example.com")
+    assert error.value.status_code == 400
+    assert db.experts.find_one({"_id": ObjectId(expert["id"])})["email"] == EMAIL
+
+
+def test_failed_expert_update_restores_directory_entry(expert, update_profile):
+    db.experts.delete_one({"_id": ObjectId(expert["id"])})
+
+    with pytest.raises(HTTPException) as error:
+        update_profile(expert, email="renamed@example.com")
+    assert error.value.status_code == 404
+    assert lookup("renamed@example.com") is None
+    assert lookup(EMAIL)["user_id"] == ObjectId(expert["id"])
+
+
+def test_password_change_revokes_and_reissues_tokens(add_expert):
+    email = "changing-expert@example.com"
+    expert_id = add_expert(1, email=email, password=hash_password("old-secret"))
+    add_entry(email, "expert", expert_id, hash_password("old-secret"))
+    before = create_access_token(user_claims(db.experts.find_one({"_id": expert_id}), "expert"))
+    user = {"id": str(expert_id), "email": email, "role": "expert"}
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(expert_routes.change_password("wrong", "new-secret", user))
+    assert error.value.status_code == 400
+
+    body = asyncio.run(expert_routes.change_password("old-secret", "new-secret", user))
+    assert is_token_revoked(verify_token(before))
+    assert not is_token_revoked(verify_token(body["access_token"]))
+    assert verify_password("new-secret", db.experts.find_one({"_id": expert_id})["password"])
+    assert verify_password("new-secret", lookup(email)["password"])
@@ -0,0 +1,259 @@
+import random
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.db.mongo import db
+from app.db import expert_search
+from app.db.expert_search import ExpertSearchIndex
+from app.db.expert_pages import SORT_ORDERS, RELEVANCE
+
+
+def test_refresh_drops_updated_and_unapproved_slots(index, add_expert, touch, all_pages):
+    experts = [add_expert(number) for number in range(10)]
+    index.build()
+
+    touch(experts[0], is_approved=False)
+    touch(experts[1], bio="Teaches python and rust.")
+    assert index.refresh() == 2
+
+    live = set(experts[1:])
+    for filters, q, fuzzy in [
+        ({}, "python", False),
+        ({}, "pyhton", True),
+        ({"language": "English"}, "python", False),
+        ({"language": "English"}, "pyhton", True)
+    ]:
+        ids, totals = all_pages(index, filters, q, RELEVANCE, fuzzy=fuzzy)
+        assert len(ids) == len(set(ids))
+        assert set(ids) == live
+        assert totals == {len(live)}
+
+    ids, _ = all_pages(index, {}, "rust", RELEVANCE)
+    assert ids == [experts[1]]
+
+
+def test_refresh_adds_new_experts(index, add_expert, all_pages):
+    experts = [add_expert(number) for number in range(3)]
+    index.build()
+    version = index.version
+
+    experts.append(add_expert(3, updated_at=datetime.now(timezone.utc) + timedelta(seconds=1)))
+    add_expert(4, is_verified=False, updated_at=datetime.now(timezone.utc) + timedelta(seconds=1))
+    assert index.refresh() == 1
+    assert index.version > version
+
+    ids, totals = all_pages(index, {}, None, "hourly_rate")
+    assert ids == experts
+    assert totals == {4}
+
+
+@pytest.mark.parametrize("max_patches", [256, 0])
+def test_refresh_keeps_the_sort_orders_of_a_rebuild(index, monkeypatch, add_expert, touch, all_pages, max_patches):
+    # Small blocks so every change moves experts across several prefix bitmaps
+    monkeypatch.setattr(expert_search, "SORTED_BLOCK", 4)
+    monkeypatch.setattr(expert_search, "SORTED_MAX_PATCHES", max_patches)
+    rng = random.Random(11)
+
+    def numbers():
+        return {
+            "hourly_rate": float(rng.randint(10, 30)),
+            "rating": rng.choice([3.0, 4.0, 4.5, 5.0]),
+            "completed_sessions": rng.randint(0, 5)
+        }
+
+    experts = [add_expert(number, **numbers()) for number in range(30)]
+    index.build()
+
+    changed = rng.sample(experts, 10)
+    for expert_id in changed[:7]:
+        touch(expert_id, **numbers())
+    for expert_id in changed[7:]:
+        touch(expert_id, is_approved=False)
+    later = datetime.now(timezone.utc) + timedelta(seconds=1)
+    for number in range(30, 35):
+        add_expert(number, updated_at=later, **numbers())
+    assert index.refresh() == 15
+
+    rebuilt = ExpertSearchIndex(refresh_seconds=1e9)
+    rebuilt.build()
+    for sort in SORT_ORDERS:
+        for filters in ({}, {"min_rate": 15, "max_rate": 25}, {"min_rating": 4.5}):
+            assert all_pages(index, filters, None, sort, limit=4) == all_pages(rebuilt, filters, None, sort, limit=4)
+
+    # prefix[b] still holds the first b blocks of the order
+    state = index._state
+    for field in state.sorted.values():
+        assert len(field.prefix) == len(field.order) // 4 + 1
+        for block, bitmap in enumerate(field.prefix):
+            assert bitmap == expert_search._bitmap(field.order[:block * 4], state.size)
+
+
+def test_refresh_skips_unchanged_experts(index, add_expert):
+    add_expert(0)
+    index.build()
+    version = index.version
+
+    assert index.refresh() == 0
+    assert index.version == version
+
+
+def test_rebuild_drops_deleted_experts(index, add_expert, all_pages):
+    experts = [add_expert(number) for number in range(4)]
+    index.build()
+
+    db.experts.delete_one({"_id": experts[2]})
+    index.build()
+
+    ids, totals = all_pages(index, {}, "python", RELEVANCE)
+    assert sorted(ids) == sorted(experts[:2] + experts[3:])
+    assert totals == {3}
+    assert index.snapshot()["dead_documents"] == 0
+
+
+def test_text_search_matches_prefixes_below_exact_terms(index, add_expert):
+    exact = add_expert(0, specialty="Math", tags=[], bio="")
+    prefix = add_expert(1, specialty="Mathematics", tags=[], bio="")
+    add_expert(2, specialty="Chemistry", tags=[], bio="")
+    index.build()
+
+    page = index.find_page({}, "math", RELEVANCE, 10)
+    assert [expert_id for expert_id, _ in page.experts] == [exact, prefix]
+    assert page.total == 2
+
+
+def test_text_search_requires_every_term(index, add_expert, all_pages):
+    both = add_expert(0, specialty="Organic Chemistry", tags=["lab"], bio="")
+    add_expert(1, specialty="Organic Farming", tags=[], bio="")
+    add_expert(2, specialty="Chemistry", tags=[], bio="")
+    index.build()
+
+    ids, totals = all_pages(index, {}, "organic chemistry", RELEVANCE)
+    assert ids == [both]
+    assert totals == {1}
+    assert index.find_page({}, "organic quantum", RELEVANCE, 10).total == 0
+
+
+def test_text_search_weights_specialty_over_tags_over_bio(index, add_expert):
+    in_bio = add_expert(0, specialty="Music", tags=["guitar"], bio="Also knows calculus.")
+    in_tags = add_expert(1, specialty="Music", tags=["calculus"], bio="")
+    in_specialty = add_expert(2, specialty="Calculus", tags=["guitar"], bio="")
+    index.build()
+
+    page = index.find_page({}, "calculus", RELEVANCE, 10)
+    assert [expert_id for expert_id, _ in page.experts] == [in_specialty, in_tags, in_bio]
+    scores = [score for _, score in page.experts]
+    assert scores == sorted(scores, reverse=True)
+
+
+def matches(expert: dict, tags=None, language=None, min_rate=None, max_rate=None, min_rating=None) -> bool:
+    """The filters of find_page, checked one expert at a time"""
+    return (
+        (not tags or bool(set(tags) & set(expert["tags"])))
+        and (language is None or language in expert["languages"])
+        and (min_rate is None or expert["hourly_rate"] >= min_rate)
+        and (max_rate is None or expert["hourly_rate"] <= max_rate)
+        and (min_rating is None or expert["rating"] >= min_rating)
+    )
+
+
+def test_filters_match_a_scan_of_the_catalog(index, monkeypatch, add_expert, all_pages):
+    # Small blocks so range filters combine prefix bitmaps and edge positions
+    monkeypatch.setattr(expert_search, "SORTED_BLOCK", 4)
+    rng = random.Random(7)
+    for number in range(60):
+        add_expert(
+            number,
+            tags=rng.sample(["python", "java", "sql", "excel"], rng.randint(1, 2)),
+            languages=rng.sample(["English", "Spanish", "French"], rng.randint(1, 2)),
+            hourly_rate=float(rng.randint(10, 60)),
+            rating=rng.choice([3.0, 3.5, 4.0, 4.5, 5.0])
+        )
+    index.build()
+    catalog = list(db.experts.find())
+
+    for filters in [
+        {"tags": ["sql"]},
+        {"tags": ["sql", "excel"]},
+        {"language": "French"},
+        {"min_rate": 20, "max_rate": 40},
+        {"min_rate": 25.0, "max_rate": 25.0},
+        {"max_rate": 30},
+        {"min_rating": 4.5},
+        {"tags": ["python"], "language": "Spanish", "min_rate": 15, "min_rating": 4.0},
+        {"tags": ["cobol"]},
+        {"min_rate": 70}
+    ]:
+        expected = {expert["_id"] for expert in catalog if matches(expert, **filters)}
+        ids, totals = all_pages(index, filters, None, "hourly_rate", limit=7)
+        assert set(ids) == expected and len(ids) == len(expected), filters
+        assert totals == {len(expected)}
+        rates = [expert["hourly_rate"] for expert in db.experts.find({"_id": {"$in": ids}})]
+        assert sorted(rates) == [db.experts.find_one({"_id": expert_id})["hourly_rate"] for expert_id in ids]
+
+
+def test_specialty_filter_matches_words_and_prefixes(index, add_expert, all_pages):
+    algebra = add_expert(0, specialty="Linear Algebra")
+    add_expert(1, specialty="Linear Programming")
+    index.build()
+
+    for specialty in ("linear algebra", "Algebra", "alg"):
+        ids, _ = all_pages(index, {"specialty": specialty}, None, "rating")
+        assert ids == [algebra]
+
+
+def test_fuzzy_search_tolerates_typos(index, add_expert):
+    calculus = add_expert(0, specialty="Calculus", tags=["derivatives"], bio="")
+    python = add_expert(1, specialty="Python Programming", tags=["django"], bio="")
+    named = add_expert(2, first_name="Katherine", last_name="Johnson", specialty="Physics", tags=[], bio="")
+    index.build()
+
+    def fuzzy(q):
+        return [expert_id for expert_id, _ in index.find_page({}, q, RELEVANCE, 10, fuzzy=True).experts]
+
+    assert fuzzy("calculas") == [calculus]
+    assert fuzzy("pyhton") == [python]
+    assert fuzzy("djnago programing") == [python]
+    assert fuzzy("katherin jonson") == [named]
+    # Exact search finds none of them
+    assert index.find_page({}, "calculas", RELEVANCE, 10).total == 0
+
+
+def test_fuzzy_search_ranks_closer_terms_first(index, add_expert):
+    closer = add_expert(0, specialty="Statistics", tags=[], bio="")
+    further = add_expert(1, specialty="Statics", tags=[], bio="")
+    add_expert(2, specialty="Geography", tags=[], bio="Statistics in the bio are not searched")
+    index.build()
+
+    page = index.find_page({}, "statistcs", RELEVANCE, 10, fuzzy=True)
+    assert [expert_id for expert_id, _ in page.experts] == [closer, further]
+
+
+def test_suggestions_complete_tags_and_specialties(index, add_expert):
+    add_expert(0, specialty="Linear Algebra", tags=["algebra", "matrices"])
+    add_expert(1, specialty="Algebra", tags=["algebra"])
+    add_expert(2, specialty="Calculus", tags=["algebra", "Alchemy"])
+    index.build()
+
+    assert index.suggest("alg") == [
+        {"value": "algebra", "kind": "tag", "count": 3},
+        {"value": "Algebra", "kind": "specialty", "count": 1},
+        {"value": "Linear Algebra", "kind": "specialty", "count": 1}
+    ]
+    assert [suggestion["value"] for suggestion in index.suggest(" AL ", limit=2)] == ["algebra", "Alchemy"]
+    assert index.suggest("linear  alg") == [{"value": "Linear Algebra", "kind": "specialty", "count": 1}]
+    assert index.suggest("zzz") == []
+
+
+def test_suggestions_follow_index_changes(index, add_expert, touch):
+    experts = [add_expert(number, tags=["rust"]) for number in range(2)]
+    index.build()
+    assert index.suggest("ru") == [{"value": "rust", "kind": "tag", "count": 2}]
+
+    touch(experts[0], is_approved=False)
+    index.refresh()
+    assert index.suggest("ru") == [{"value": "rust", "kind": "tag", "count": 1}]
+
+    touch(experts[1], tags=["go"])
+    index.refresh()
+    assert index.suggest("ru") == []
@@ -0,0 +1,63 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+from app.db.mongo import db
+from app.db.user_directory import add_entry, lookup
+from app.routes.auth_routes import upgrade_password_hash
+from app.utils import hash as hashing
+from app.utils.hash import PasswordHasher, hash_password_async, verify_password_async, needs_rehash
+
+
+def test_hash_and_verify_on_the_pool():
+    async def main():
+        hashed = await hash_password_async("secret")
+        return hashed, await verify_password_async("secret", hashed), await verify_password_async("wrong", hashed)
+
+    hashed, right, wrong = asyncio.run(main())
+    assert (right, wrong) == (True, False)
+    assert not needs_rehash(hashed)
+
+
+def test_needs_rehash_on_other_costs(monkeypatch):
+    hashed = hashing.hash_password("secret")
+    monkeypatch.setattr(hashing, "BCRYPT_ROUNDS", hashing.BCRYPT_ROUNDS + 1)
+
+    assert needs_rehash(hashed)
+    assert needs_rehash("not a bcrypt hash")
+
+
+def test_saturated_pool_rejects_with_503():
+    hasher = PasswordHasher(workers=1, max_queue=1)
+    release = threading.Event()
+
+    async def main():
+        running = [asyncio.ensure_future(hasher.run(release.wait)) for _ in range(2)]
+        await asyncio.sleep(0)
+        try:
+            with pytest.raises(HTTPException) as error:
+                await hasher.run(release.wait)
+        finally:
+            release.set()
+        await asyncio.gather(*running)
+        return error.value
+
+    error = asyncio.run(main())
+    assert error.status_code == 503
+    assert hasher.snapshot()["rejected"] == 1
+    assert hasher.snapshot()["completed"] == 2
+
+
+def test_login_upgrades_hashes_of_other_costs():
+    old_hash = hashing.bcrypt.hashpw(b"secret", hashing.bcrypt.gensalt(rounds=hashing.BCRYPT_ROUNDS + 1)).decode()
+    student_id = db.students.insert_one({"email": "upgrade@example.com", "password": old_hash}).inserted_id
+    add_entry("upgrade@example.com", "student", student_id, old_hash)
+
+    asyncio.run(upgrade_password_hash(db.students, db.students.find_one({"_id": student_id}), "secret"))
+
+    new_hash = db.students.find_one({"_id": student_id})["password"]
+    assert not needs_rehash(new_hash)
+    assert hashing.verify_password("secret", new_hash)
+    assert lookup("upgrade@example.com")["password"] == new_hash
@@ -0,0 +1,76 @@
+from types import SimpleNamespace
+from contextvars import copy_context
+
+from app.db.mongo import db
+from app.db import identity_map
+from app.db.identity_map import start_identity_map, get_by_id, update_by_id, forget
+
+
+def in_request(func):
+    """Run `func` in a fresh context, like the middleware does per request"""
+    def request():
+        start_identity_map()
+        return func()
+    return copy_context().run(request)
+
+
+def count_finds(monkeypatch) -> list:
+    calls = []
+    find_one = db.students.find_one
+
+    def counted(*args, **kwargs):
+        calls.append(args)
+        return find_one(*args, **kwargs)
+
+    monkeypatch.setattr(identity_map, "db", {"students": SimpleNamespace(find_one=counted)})
+    return calls
+
+
+def test_documents_are_loaded_once_per_request(monkeypatch):
+    student_id = db.students.insert_one({"email": "map@example.com"}).inserted_id
+    calls = count_finds(monkeypatch)
+
+    def request():
+        first = get_by_id("students", student_id)
+        first["email"] = "changed by the caller"
+        return get_by_id("students", str(student_id))
+
+    assert in_request(request)["email"] == "map@example.com"
+    assert len(calls) == 1
+
+    # A new request starts empty
+    in_request(lambda: get_by_id("students", student_id))
+    assert len(calls) == 2
+
+
+def test_updates_refresh_the_cached_copy():
+    student_id = db.students.insert_one({"email": "map@example.com", "first_name": "Old"}).inserted_id
+
+    def request():
+        get_by_id("students", student_id)
+        updated = update_by_id("students", student_id, {"$set": {"first_name": "New"}})
+        return updated, get_by_id("students", student_id)
+
+    updated, cached = in_request(request)
+    assert updated["first_name"] == cached["first_name"] == "New"
+
+
+def test_forget_drops_the_cached_copy():
+    student_id = db.students.insert_one({"first_name": "Old"}).inserted_id
+
+    def request():
+        get_by_id("students", student_id)
+        db.students.update_one({"_id": student_id}, {"$set": {"first_name": "New"}})
+        forget("students", student_id)
+        return get_by_id("students", student_id)
+
+    assert in_request(request)["first_name"] == "New"
+
+
+def test_without_a_request_every_call_reads_the_database():
+    student_id = db.students.insert_one({"first_name": "Old"}).inserted_id
+    get_by_id("students", student_id)
+    db.students.update_one({"_id": student_id}, {"$set": {"first_name": "New"}})
+
+    assert get_by_id("students", student_id)["first_name"] == "New"
+    assert update_by_id("students", db.students.find_one({})["_id"], {"$set": {"x": 1}})["x"] == 1
@@ -0,0 +1,171 @@
+import asyncio
+import smtplib
+
+import pytest
+
+from app.db import email_outbox
+from app.db.email_outbox import new_message, enqueue, outbox, PENDING, SENT, FAILED
+from app.utils import mailer
+
+
+def run_workers(seconds: float = 0.3):
+    workers = mailer.OutboxWorkers(workers=1)
+
+    async def main():
+        workers.start()
+        await asyncio.sleep(seconds)
+        await workers.stop()
+
+    asyncio.run(main())
+    return workers
+
+
+def test_failed_delivery_is_retried_with_backoff(monkeypatch):
+    monkeypatch.setattr(mailer, "EMAIL_POLL_SECONDS", 0.01)
+    monkeypatch.setattr(mailer, "deliver_batch", lambda messages: [(message, "451 try later") for message in messages])
+    message_id = enqueue(new_message("retry@example.com", "Subject", "<p>Hi</p>"))
+
+    workers = run_workers()
+
+    message = outbox.find_one({"_id": message_id})
+    assert message["status"] == PENDING
+    assert message["attempts"] == 1
+    assert message["last_error"] == "451 try later"
+    assert message["next_attempt_at"] > message["last_attempt_at"]
+    assert "locked_by" not in message
+    assert workers.retried == 1
+
+
+def test_delivery_gives_up_after_max_attempts(monkeypatch):
+    message_id = enqueue(new_message("failed@example.com", "Subject", "<p>Hi</p>"))
+    message = outbox.find_one({"_id": message_id})
+    message["attempts"] = email_outbox.EMAIL_MAX_ATTEMPTS - 1
+
+    assert email_outbox.mark_failed(message, "550 no such user") == FAILED
+    assert outbox.find_one({"_id": message_id})["status"] == FAILED
+
+
+def test_delivery_loop_survives_errors(monkeypatch):
+    monkeypatch.setattr(mailer, "EMAIL_POLL_SECONDS", 0.01)
+    # Leases run out at once, so the failed batch is claimed again
+    monkeypatch.setattr(email_outbox, "EMAIL_LEASE_SECONDS", 0)
+    calls = []
+
+    def deliver_batch(messages):
+        calls.append(len(messages))
+        if len(calls) == 1:
+            raise RuntimeError("connection pool exploded")
+        return [(message, None) for message in messages]
+
+    monkeypatch.setattr(mailer, "deliver_batch", deliver_batch)
+    message_id = enqueue(new_message("survivor@example.com", "Subject", "<p>Hi</p>"))
+
+    workers = run_workers()
+
+    assert len(calls) >= 2
+    assert outbox.find_one({"_id": message_id})["status"] == SENT
+    assert workers.delivered == 1
+
+
+class FakeSMTP:
+    """smtplib.SMTP stand-in recording what the pool does with it"""
+    opened = []
+
+    def __init__(self, host, port, timeout=None):
+        self.sent = []
+        self.logins = 0
+        self.quit_called = False
+        self.closed = False
+        FakeSMTP.opened.append(self)
+
+    def starttls(self):
+        pass
+
+    def login(self, username, password):
+        self.logins += 1
+        if password == "wrong":
+            raise smtplib.SMTPAuthenticationError(535, b"authentication failed")
+
+    def send_message(self, mime):
+        if mime["To"] == "refused@example.com":
+            raise smtplib.SMTPRecipientsRefused({mime["To"]: (550, b"no such user")})
+        if mime["To"] == "broken@example.com":
+            raise smtplib.SMTPServerDisconnected("connection dropped")
+        self.sent.append(mime["To"])
+
+    def rset(self):
+        pass
+
+    def quit(self):
+        self.quit_called = True
+
+    def close(self):
+        self.closed = True
+
+
+def outbox_message(to: str) -> dict:
+    return {"_id": to, "to": to, "subject": "Subject", "html": "<p>Hi</p>"}
+
+
+@pytest.fixture
+def fake_smtp(monkeypatch):
+    FakeSMTP.opened = []
+    monkeypatch.setattr(mailer.smtplib, "SMTP", FakeSMTP)
+    return FakeSMTP
+
+
+def test_pool_reuses_connections_across_batches(fake_smtp):
+    pool = mailer.SMTPConnectionPool("smtp.example.com", 587, "user", "password")
+
+    pool.send_batch([outbox_message("a@example.com"), outbox_message("b@example.com")])
+    pool.send_batch([outbox_message("c@example.com")])
+
+    assert len(fake_smtp.opened) == 1
+    assert fake_smtp.opened[0].logins == 1
+    assert fake_smtp.opened[0].sent == ["a@example.com", "b@example.com", "c@example.com"]
+    assert pool.snapshot()["messages_per_connection"] == 3
+
+
+def test_rejected_message_keeps_the_connection(fake_smtp):
+    pool = mailer.SMTPConnectionPool("smtp.example.com", 587, "user", "password")
+
+    results = pool.send_batch([outbox_message("refused@example.com"), outbox_message("ok@example.com")])
+
+    assert [error is None for _, error in results] == [False, True]
+    assert len(fake_smtp.opened) == 1
+
+
+def test_broken_connection_is_replaced_mid_batch(fake_smtp):
+    pool = mailer.SMTPConnectionPool("smtp.example.com", 587, "user", "password")
+
+    results = pool.send_batch([outbox_message("broken@example.com"), outbox_message("ok@example.com")])
+
+    assert [error is None for _, error in results] == [False, True]
+    assert len(fake_smtp.opened) == 2
+    assert fake_smtp.opened[0].quit_called
+    assert fake_smtp.opened[1].sent == ["ok@example.com"]
+
+
+def test_connections_are_recycled(fake_smtp):
+    pool = mailer.SMTPConnectionPool("smtp.example.com", 587, "user", "password", max_messages=2)
+    pool.send_batch([outbox_message("a@example.com"), outbox_message("b@example.com")])
+    pool.send_batch([outbox_message("c@example.com")])
+    assert len(fake_smtp.opened) == 2
+
+    # Idle too long: dropped instead of reused
+    pool.idle_seconds = -1
+    pool.send_batch([outbox_message("d@example.com")])
+    assert len(fake_smtp.opened) == 3
+    assert pool.snapshot()["connections_recycled"] == 2
+
+
+def test_refused_login_fails_the_batch_and_closes_the_socket(fake_smtp):
+    pool = mailer.SMTPConnectionPool("smtp.example.com", 587, "user", "wrong")
+
+    results = pool.send_batch([outbox_message("a@example.com"), outbox_message("b@example.com")])
+
+    assert [message["to"] for message, _ in results] == ["a@example.com", "b@example.com"]
+    assert all("authentication failed" in error for _, error in results)
+    assert len(fake_smtp.opened) == 1
+    assert fake_smtp.opened[0].closed
+    assert pool.snapshot()["idle_connections"] == 0
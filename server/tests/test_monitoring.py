@@ -0,0 +1,76 @@
+from types import SimpleNamespace
+
+from fastapi.testclient import TestClient
+
+from app.db import monitoring
+from app.db.monitoring import QueryMonitor, start_request_stats, current_query_stats
+from app.routes import metrics_routes
+from main import app
+
+
+def command(monitor: QueryMonitor, request_id: int, name: str, body: dict, micros: int = 1500, failed: bool = False):
+    """Feed the listener the events pymongo emits for one command"""
+    event = SimpleNamespace(
+        command_name=name, command={name: body.pop("collection", None), **body},
+        connection_id=("localhost", 27017), request_id=request_id, duration_micros=micros
+    )
+    monitor.started(event)
+    (monitor.failed if failed else monitor.succeeded)(event)
+
+
+def test_commands_are_attributed_to_the_request():
+    monitor = QueryMonitor()
+    stats = start_request_stats()
+    try:
+        command(monitor, 1, "find", {"collection": "experts", "filter": {"_id": 1}})
+        command(monitor, 2, "find", {"collection": "experts", "filter": {"email": "a@example.com"}})
+        command(monitor, 3, "update", {"collection": "sessions", "updates": [{"q": {"_id": 2}}]})
+        command(monitor, 4, "ping", {"collection": 1})
+    finally:
+        current_query_stats.set(None)
+
+    assert stats.to_dict() == {
+        "command_count": 3,
+        "total_duration_ms": 4.5,
+        "collections": {"experts": 2, "sessions": 1},
+        "repeated_lookups": {}
+    }
+    assert monitor.snapshot()["commands"]["experts.find"] == {"count": 2, "duration_ms": 3.0, "failures": 0}
+
+
+def test_repeated_id_lookups_flag_the_request():
+    monitor = QueryMonitor()
+    stats = start_request_stats()
+    try:
+        for request_id in range(5):
+            command(monitor, request_id, "find", {"collection": "students", "filter": {"_id": request_id}})
+    finally:
+        current_query_stats.set(None)
+
+    monitor.finish_request(stats, "/api/students/sessions")
+    assert stats.repeated_lookups() == {"students": 5}
+    assert monitor.snapshot()["flagged_requests"] == 1
+
+
+def test_failures_are_counted_outside_requests():
+    monitor = QueryMonitor()
+    command(monitor, 1, "insert", {"collection": "students"}, failed=True)
+
+    assert monitor.snapshot()["commands"]["students.insert"]["failures"] == 1
+
+
+def test_metrics_and_query_headers_are_off_by_default():
+    client = TestClient(app)
+
+    assert client.get("/api/metrics/db").status_code == 404
+    assert client.get("/api/metrics/search-cache").status_code == 404
+    assert not any(header.startswith("x-db-") for header in client.get("/health").headers)
+
+
+def test_metrics_and_query_headers_can_be_turned_on(monkeypatch):
+    monkeypatch.setattr(metrics_routes, "METRICS_ENABLED", True)
+    monkeypatch.setattr(monitoring, "QUERY_STATS_HEADERS", True)
+    client = TestClient(app)
+
+    assert "commands" in client.get("/api/metrics/db").json()
+    assert client.get("/health").headers["X-DB-Query-Count"] == "0"
@@ -0,0 +1,70 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+
+from app.utils import oauth
+from app.utils.oauth import ProviderMetadata, SharedTransport
+from app.utils.oauth_stub import OAUTH_STUB_URL, stub_transport
+
+
+class CountingTransport(httpx.AsyncBaseTransport):
+    def __init__(self):
+        self.requests = 0
+        self.closed = False
+
+    async def handle_async_request(self, request):
+        self.requests += 1
+        return httpx.Response(200, json={})
+
+    async def aclose(self):
+        self.closed = True
+
+
+def test_closing_a_client_keeps_the_shared_pool_open():
+    inner = CountingTransport()
+    shared = SharedTransport(inner)
+
+    async def main():
+        for _ in range(2):
+            async with httpx.AsyncClient(transport=shared) as client:
+                await client.get("https://provider.example.com/")
+        assert not inner.closed
+        await shared.close_pool()
+
+    asyncio.run(main())
+    assert inner.requests == 2
+    assert inner.closed
+
+
+def test_metadata_is_loaded_with_jwks(monkeypatch):
+    client_app = SimpleNamespace(server_metadata={})
+    metadata = ProviderMetadata(client_app, f"{OAUTH_STUB_URL}/.well-known/openid-configuration")
+
+    async def main():
+        async with httpx.AsyncClient(transport=stub_transport()) as client:
+            monkeypatch.setattr(oauth, "http_client", client)
+            await metadata.refresh()
+
+    asyncio.run(main())
+    assert client_app.server_metadata["token_endpoint"].startswith(OAUTH_STUB_URL)
+    assert client_app.server_metadata["jwks"]["keys"]
+    # Authlib skips its own discovery request once this is set
+    assert "_loaded_at" in client_app.server_metadata
+    assert metadata.snapshot()["has_jwks"]
+
+
+def test_failed_refresh_keeps_the_previous_metadata(monkeypatch):
+    client_app = SimpleNamespace(server_metadata={"issuer": "previous"})
+    metadata = ProviderMetadata(client_app, "https://provider.example.com/discovery", refresh_seconds=60)
+
+    async def main():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(503))) as client:
+            monkeypatch.setattr(oauth, "http_client", client)
+            metadata.start()
+            await asyncio.sleep(0.05)
+            await metadata.stop()
+
+    asyncio.run(main())
+    assert metadata.failures == 1
+    assert client_app.server_metadata == {"issuer": "previous"}
@@ -0,0 +1,47 @@
+import pytest
+from bson import ObjectId
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.routes import expert_routes, student_routes
+from app.utils.JWTtoken import create_access_token, user_claims
+from app.db.queries import find_sessions_with_participants, SESSION_PAGE_MAX_LIMIT
+from app.db.archive import find_messages_page
+
+app = FastAPI()
+app.include_router(expert_routes.router)
+app.include_router(student_routes.router)
+client = TestClient(app)
+
+
+def auth_headers(role: str) -> dict:
+    user = {"_id": ObjectId(), "email": f"{role}@example.com", "is_verified": True}
+    return {"Authorization": f"Bearer {create_access_token(user_claims(user, role))}"}
+
+
+@pytest.mark.parametrize("role", ["expert", "student"])
+@pytest.mark.parametrize("params", [
+    {"skip": -1},
+    {"limit": 0},
+    {"limit": SESSION_PAGE_MAX_LIMIT + 1}
+])
+def test_sessions_reject_out_of_range_paging(role, params):
+    response = client.get(f"/api/{role}s/sessions", params=params, headers=auth_headers(role))
+    assert response.status_code == 422
+
+
+@pytest.mark.parametrize("role", ["expert", "student"])
+def test_conversation_messages_reject_out_of_range_limit(role):
+    response = client.get(
+        f"/api/{role}s/conversations/{ObjectId()}", params={"limit": 0}, headers=auth_headers(role)
+    )
+    assert response.status_code == 422
+
+
+def test_paging_helpers_reject_out_of_range_values():
+    with pytest.raises(ValueError):
+        find_sessions_with_participants({}, skip=-1)
+    with pytest.raises(ValueError):
+        find_sessions_with_participants({}, limit=0)
+    with pytest.raises(ValueError):
+        find_messages_page({}, limit=0)
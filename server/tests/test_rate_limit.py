@@ -0,0 +1,73 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from app.db.mongo import db
+from app.utils import rate_limit
+from app.utils.rate_limit import MemoryBackend, MongoBackend, RateLimiter, enforce_rate_limit, parse_limit
+
+
+def request_from(ip: str) -> Request:
+    return Request({"type": "http", "headers": [], "client": (ip, 1234)})
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # Start of a 60 second window; MongoDB TTL indexes need a current time
+    now = [float(int(time.time()) // 60 * 60)]
+    monkeypatch.setattr(rate_limit, "time", SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+def test_parse_limit():
+    assert parse_limit("30/60") == (30, 60)
+
+
+@pytest.mark.parametrize("backend", [MemoryBackend, lambda: MongoBackend(db.rate_limits)])
+def test_limit_is_enforced_per_key(clock, backend):
+    limiter = RateLimiter("test", "3/60", backend())
+
+    assert [limiter.hit("a") for _ in range(3)] == [None, None, None]
+    assert limiter.hit("a") == 60
+    assert limiter.hit("b") is None
+    assert limiter.snapshot()["rejected"] == 1
+
+
+def test_previous_window_counts_while_it_overlaps(clock):
+    limiter = RateLimiter("test", "4/60", MemoryBackend())
+    for _ in range(4):
+        limiter.hit("a")
+
+    # A quarter into the next window, 3/4 of the previous four still count
+    clock[0] += 75
+    assert limiter.hit("a") is None
+    assert limiter.hit("a") == 45
+
+    # Two windows later everything has expired
+    clock[0] += 120
+    assert limiter.hit("a") is None
+
+
+def test_backend_failures_let_requests_through():
+    class Broken:
+        def hit(self, key, window, now):
+            raise ConnectionError("database unavailable")
+
+    assert RateLimiter("test", "1/60", Broken()).hit("a") is None
+
+
+def test_enforce_rate_limit_checks_ip_and_email(clock, monkeypatch):
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_ENABLED", True)
+    backend = MemoryBackend()
+    ip_limiter = RateLimiter("ip", "10/60", backend)
+    email_limiter = RateLimiter("email", "1/60", backend)
+
+    enforce_rate_limit(request_from("1.2.3.4"), "User@Example.com", ip_limiter, email_limiter)
+    with pytest.raises(HTTPException) as error:
+        # Emails are keyed case-insensitively
+        enforce_rate_limit(request_from("5.6.7.8"), " user@example.com", ip_limiter, email_limiter)
+    assert error.value.status_code == 429
+    assert error.value.headers["Retry-After"] == "60"
@@ -0,0 +1,56 @@
+from bson import ObjectId
+
+from app.db.mongo import db
+from app.db.ids import to_object_id, ref_filter, stringify_refs
+from app.db.migrations import normalize_references
+
+
+def test_to_object_id():
+    object_id = ObjectId()
+    assert to_object_id(str(object_id)) == object_id
+    assert to_object_id(object_id) is object_id
+    assert to_object_id("not-an-id") == "not-an-id"
+    assert to_object_id(None) is None
+
+
+def test_ref_filter_matches_both_representations():
+    object_id = ObjectId()
+    db.sessions.insert_many([{"expert_id": object_id}, {"expert_id": str(object_id)}, {"expert_id": ObjectId()}])
+
+    assert db.sessions.count_documents({"expert_id": ref_filter(str(object_id))}) == 2
+    assert db.sessions.count_documents({"expert_id": ref_filter(object_id)}) == 2
+
+
+def test_stringify_refs():
+    object_id = ObjectId()
+    doc = stringify_refs({"_id": object_id, "expert_id": object_id, "note": "x"})
+
+    assert doc == {"_id": object_id, "expert_id": str(object_id), "note": "x"}
+
+
+def test_migration_converts_string_references():
+    expert_id, student_id = ObjectId(), ObjectId()
+    db.sessions.insert_many([
+        {"expert_id": str(expert_id), "student_id": str(student_id)},
+        {"expert_id": expert_id, "student_id": "legacy-id"}
+    ])
+
+    results = normalize_references.run(batch_size=1)
+
+    assert results["sessions"] == 1
+    assert db.sessions.count_documents({"expert_id": expert_id}) == 2
+    assert db.sessions.count_documents({"student_id": student_id}) == 1
+    # Values that are not ids are left alone
+    assert db.sessions.count_documents({"student_id": "legacy-id"}) == 1
+
+
+def test_migration_resumes_and_completes():
+    expert_id = ObjectId()
+    first = db.sessions.insert_one({"expert_id": str(expert_id)}).inserted_id
+    normalize_references.migrate_collection("sessions", ("expert_id",))
+
+    # Completed: later documents are left for a --restart run
+    db.sessions.insert_one({"expert_id": str(expert_id)})
+    assert normalize_references.migrate_collection("sessions", ("expert_id",)) == 0
+    assert normalize_references.run(restart=True)["sessions"] == 1
+    assert db.sessions.find_one({"_id": first})["expert_id"] == expert_id
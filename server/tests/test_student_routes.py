@@ -0,0 +1,132 @@
+import json
+import asyncio
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+from app.db.mongo import db
+from app.db.user_directory import add_entry, lookup
+from app.routes import student_routes
+from app.utils.auth import is_token_revoked
+from app.utils.JWTtoken import create_access_token, verify_token, user_claims
+from app.utils.search_cache import SearchResultCache
+from app.utils.hash import hash_password, verify_password
+
+
+@pytest.fixture
+def index(index, monkeypatch):
+    """The conftest index and a fresh result cache, serving the search route"""
+    monkeypatch.setattr(student_routes, "expert_search_index", index)
+    monkeypatch.setattr(student_routes, "search_result_cache", SearchResultCache())
+    return index
+
+
+def search(**params):
+    query = {
+        "q": None, "specialty": None, "tags": None, "min_rate": None, "max_rate": None,
+        "min_rating": None, "language": None, "sort": None, "limit": 20, "cursor": None,
+        "fuzzy": False, "current_user": {}
+    }
+    query.update(params)
+    response = asyncio.run(student_routes.search_experts(**query))
+    return json.loads(response.body), response.headers
+
+
+def test_search_leaves_out_experts_changed_since_refresh(index, add_expert):
+    experts = [add_expert(number) for number in range(4)]
+    index.build()
+
+    # Not refreshed yet: the index still lists all four
+    db.experts.update_one({"_id": experts[0]}, {"$set": {"is_approved": False}})
+    db.experts.delete_one({"_id": experts[1]})
+
+    results, _ = search(q="python")
+    assert sorted(result["id"] for result in results) == sorted(map(str, experts[2:]))
+
+
+def test_delete_account_purges_archived_data():
+    student_id = db.students.insert_one({
+        "email": "leaving@example.com", "password": hash_password("secret"), "is_verified": True
+    }).inserted_id
+    other_id = ObjectId()
+    for collection in (db.sessions, db.sessions_archive):
+        collection.insert_many([{"student_id": student_id}, {"student_id": other_id}])
+    for collection in (db.messages, db.messages_archive):
+        collection.insert_many([{"sender_id": student_id}, {"sender_id": other_id}])
+
+    user = {"id": str(student_id), "email": "leaving@example.com", "role": "student"}
+    asyncio.run(student_routes.delete_account(password="secret", current_user=user))
+
+    assert db.students.count_documents({}) == 0
+    for collection in (db.sessions, db.sessions_archive):
+        assert [session["student_id"] for session in collection.find()] == [other_id]
+    for collection in (db.messages, db.messages_archive):
+        assert [message["sender_id"] for message in collection.find()] == [other_id]
+
+
+def test_password_change_revokes_and_reissues_tokens():
+    student = {"email": "changing@example.com", "password": hash_password("old-secret"), "is_verified": True}
+    student["_id"] = db.students.insert_one(student).inserted_id
+    add_entry(student["email"], "student", student["_id"], student["password"])
+    before = create_access_token(user_claims(student, "student"))
+    user = {"id": str(student["_id"]), "email": student["email"], "role": "student"}
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(student_routes.change_password("wrong", "new-secret", user))
+    assert error.value.status_code == 400
+
+    body = asyncio.run(student_routes.change_password("old-secret", "new-secret", user))
+    assert is_token_revoked(verify_token(before))
+    assert not is_token_revoked(verify_token(body["access_token"]))
+    assert verify_password("new-secret", db.students.find_one({"_id": student["_id"]})["password"])
+    assert verify_password("new-secret", lookup(student["email"])["password"])
+
+
+def test_search_pages_follow_cursors(index, add_expert):
+    experts = [add_expert(number, rating=4.0 + number / 10) for number in range(7)]
+    index.build()
+
+    results, headers = search(sort="rating", limit=5)
+    assert headers["X-Total-Count"] == "7"
+    rest, headers = search(sort="rating", limit=5, cursor=headers["X-Next-Cursor"])
+    assert "X-Next-Cursor" not in headers
+    assert [result["id"] for result in results + rest] == [str(expert_id) for expert_id in reversed(experts)]
+
+    with pytest.raises(HTTPException) as error:
+        search(sort="hourly_rate", cursor="not-a-cursor")
+    assert error.value.status_code == 400
+
+
+def test_repeated_searches_are_served_from_the_cache(index, add_expert):
+    add_expert(0)
+    index.build()
+    cache = student_routes.search_result_cache
+
+    first = search(q="Python", tags="python")
+    # Same experts selected: same canonical query, same entry
+    assert search(q="  python ", tags="python,python") == first
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    search(q="python", sort="hourly_rate")
+    assert cache.misses == 2
+
+
+def test_expert_writes_retire_cached_searches(index, add_expert, touch):
+    expert_id = add_expert(0)
+    index.build()
+    cache = student_routes.search_result_cache
+    search(q="python")
+
+    # Written by this worker
+    touch(expert_id, first_name="Renamed")
+    index.expert_changed()
+    results, _ = search(q="python")
+    assert results[0]["first_name"] == "Renamed"
+
+    # Written by another worker, picked up by a refresh
+    touch(expert_id, first_name="Again")
+    assert index.refresh() == 1
+    results, _ = search(q="python")
+    assert results[0]["first_name"] == "Again"
+    assert (cache.hits, cache.misses) == (0, 3)
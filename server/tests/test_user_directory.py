@@ -0,0 +1,57 @@
+import pytest
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+from app.db.mongo import db
+from app.db import user_directory
+from app.db.user_directory import add_entry, lookup, find_user, set_password, remove_entry
+from app.db.migrations import backfill_user_directory
+
+
+def test_emails_are_unique_across_roles():
+    add_entry("shared@example.com", "student", ObjectId(), "hash")
+
+    with pytest.raises(DuplicateKeyError):
+        add_entry("shared@example.com", "expert", ObjectId(), "hash")
+
+
+def test_find_user_resolves_the_role_collection():
+    expert_id = db.experts.insert_one({"email": "find@example.com", "first_name": "Ada"}).inserted_id
+    add_entry("find@example.com", "expert", expert_id, "hash")
+
+    role, user = find_user("find@example.com", {"first_name": 1})
+    assert (role, user["first_name"]) == ("expert", "Ada")
+    assert find_user("nobody@example.com") == (None, None)
+
+
+def test_password_and_removal_stay_in_sync():
+    add_entry("sync@example.com", "student", ObjectId(), "old")
+    set_password("sync@example.com", "new")
+    assert lookup("sync@example.com")["password"] == "new"
+
+    remove_entry("sync@example.com")
+    assert lookup("sync@example.com") is None
+
+
+def test_lookup_falls_back_to_users_not_yet_backfilled(monkeypatch):
+    student_id = db.students.insert_one({"email": "legacy@example.com", "password": "hash"}).inserted_id
+
+    monkeypatch.setattr(user_directory, "USER_DIRECTORY_FALLBACK", False)
+    assert lookup("legacy@example.com") is None
+
+    monkeypatch.setattr(user_directory, "USER_DIRECTORY_FALLBACK", True)
+    assert lookup("legacy@example.com")["user_id"] == student_id
+    # Remembered in the directory
+    assert db.user_directory.count_documents({"email": "legacy@example.com"}) == 1
+
+
+def test_backfill_adds_every_user_once():
+    db.students.insert_many([{"email": f"student{n}@example.com", "password": "hash"} for n in range(3)])
+    expert_id = db.experts.insert_one({"email": "expert@example.com", "password": "hash"}).inserted_id
+    # Written by the auth routes before the backfill ran
+    add_entry("student0@example.com", "student", db.students.find_one({"email": "student0@example.com"})["_id"], "hash")
+
+    assert backfill_user_directory.run(batch_size=2) == {"students": 2, "experts": 1}
+    assert db.user_directory.count_documents({}) == 4
+    assert lookup("expert@example.com")["user_id"] == expert_id
+    assert backfill_user_directory.run() == {"students": 0, "experts": 0}